@@ -0,0 +1,194 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+from sales_service import (QueryError, SalesStore, query_acf, query_core_stats, query_seasonal_pivot,
+                           render_chart)
+
+# 常驻工作进程：启动一次解释器并导入一次依赖，然后从标准输入逐行读取 JSON 任务，
+# 每个任务的结果以一行 JSON 写到标准输出。调度器只需向同一个进程发送任务，
+# 不必为每个短任务重新启动 Python、导入 pandas/matplotlib；
+# 数据集（SalesMatrix）和各模块的 LRU 缓存也在任务之间保留。
+#
+# 任务格式示例（每行一个）:
+#   {"id": 1, "job": "core_stats", "dataset": "category"}
+#   {"id": 2, "job": "acf", "dataset": "sku", "item": "云南生菜", "lags": 30, "exclude": ["节假日"]}
+#   {"id": 3, "job": "acf_report", "file": "云南生菜.xlsx"}
+#   {"id": 4, "job": "chart", "dataset": "category", "item": "花叶类", "output": "花叶类.png"}
+#   {"job": "shutdown"}
+
+
+def _job_core_stats(store, job):
+    return query_core_stats(store, job.get('dataset', 'category'))
+
+
+def _job_seasonal_pivot(store, job):
+    return query_seasonal_pivot(store, job.get('dataset', 'category'), job.get('item'),
+                                tuple(job.get('exclude', ())))
+
+
+def _job_acf(store, job):
+    return query_acf(store, job.get('dataset', 'category'), job.get('item'), int(job.get('lags', 40)),
+                     tuple(job.get('exclude', ())))
+
+
+def _job_acf_report(store, job):
+    """对单个序列文件做数值化 ACF/PACF 分析（只打印统计结果，不加载绘图依赖）。"""
+    from importlib import import_module
+    script = import_module('云南生菜')
+
+    sales_data = script.load_and_prepare_data(job['file'])
+    if sales_data is None:
+        raise QueryError(f"无法加载文件: {job['file']}")
+    exclude = None
+    if job.get('exclude'):
+        exclude = ~script.calendar_index(sales_data.index).day_mask(exclude=tuple(job['exclude']))
+    script.numerical_acf_pacf_analysis(sales_data, exclude=exclude)
+    return {'file': job['file'], 'days': len(sales_data)}
+
+
+def _job_chart(store, job):
+    png = render_chart(store, job.get('dataset', 'category'), job.get('item'))
+    with open(job['output'], 'wb') as f:
+        f.write(png)
+    return {'output': job['output'], 'bytes': len(png)}
+
+
+def _job_heatmaps(store, job):
+    from 可视化 import generate_sales_heatmaps
+
+    saved = generate_sales_heatmaps(
+        job.get('file_path', 'daily_category_sales.xlsx'),
+        job.get('group_col', '分类名称'),
+        output_folder=job.get('output_folder', '.'),
+        dpi=int(job.get('dpi', 300)),
+        max_workers=job.get('max_workers', 1),
+        exclude=tuple(job['exclude']) if job.get('exclude') else None,
+    )
+    return {'saved': saved}
+
+
+def _job_decompose(store, job):
+    from seasonal_decomposition import load_or_decompose
+
+    dataset = job.get('dataset', 'category')
+    output = job.get('output', f'{dataset}_decomposition.npz')
+    decomposition = load_or_decompose(store.matrix(dataset), output)
+    strength = decomposition.strength().round(4)
+    return {'output': output, 'strength': strength.where(strength.notna(), None).to_dict(orient='index')}
+
+
+def _job_co_movement(store, job):
+    from cross_correlation import compute_co_movement
+
+    dataset = job.get('dataset', 'category')
+    index = compute_co_movement(store.matrix(dataset), max_lag=int(job.get('max_lag', 14)),
+                                top_k=int(job.get('top_k', 5)))
+    output = job.get('output')
+    if output:
+        index.save(output)
+    item = job.get('item')
+    if item is not None:
+        return {'item': item, 'partners': index.partners(item).to_dict(orient='records')}
+    return {'output': output, 'series': len(index.items)}
+
+
+JOBS = {
+    'core_stats': _job_core_stats,
+    'seasonal_pivot': _job_seasonal_pivot,
+    'acf': _job_acf,
+    'acf_report': _job_acf_report,
+    'chart': _job_chart,
+    'heatmaps': _job_heatmaps,
+    'decompose': _job_decompose,
+    'co_movement': _job_co_movement,
+}
+
+
+def run_job(store, job):
+    """
+    执行一个任务，返回可序列化为 JSON 的响应。
+
+    任务运行期间的打印输出被收集到响应的 'log' 字段中，保证标准输出上只有 JSON 行。
+
+    参数:
+    store (SalesStore): 在任务之间共享的数据集。
+    job (dict): 任务，'job' 为任务名称，其余为参数。
+
+    返回:
+    dict: 包含 id、ok、result 或 error、seconds 和 log 的响应。
+    """
+    response = {'id': job.get('id'), 'job': job.get('job')}
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        handler = JOBS.get(job.get('job'))
+        if handler is None:
+            raise QueryError(f"未知的任务 '{job.get('job')}'，可选: {', '.join(JOBS)}")
+        with contextlib.redirect_stdout(log):
+            response['result'] = handler(store, job)
+        response['ok'] = True
+    except Exception as e:
+        response['ok'] = False
+        response['error'] = f"{type(e).__name__}: {e}"
+    response['seconds'] = round(time.perf_counter() - start, 4)
+    response['log'] = log.getvalue()
+    return response
+
+
+def serve(stdin=None, stdout=None, store=None):
+    """
+    逐行读取 JSON 任务并写回结果，直到输入结束或收到 shutdown 任务。
+
+    返回:
+    int: 处理的任务数。
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    store = store or SalesStore()
+    done = 0
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = {'id': None, 'ok': False, 'error': f"无法解析任务: {e}"}
+        else:
+            if job.get('job') == 'shutdown':
+                break
+            if job.get('job') == 'ping':
+                from plotting import plotting_loaded
+                response = {'id': job.get('id'), 'ok': True,
+                            'result': {'pid': os.getpid(), 'jobs_done': done,
+                                       'plotting_loaded': plotting_loaded()}}
+            else:
+                response = run_job(store, job)
+                done += 1
+        stdout.write(json.dumps(response, ensure_ascii=False, default=str) + '\n')
+        stdout.flush()
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻分析工作进程：从标准输入读取 JSON 任务，每行一个。")
+    parser.add_argument('--base-folder', default='.', help="数据文件所在的文件夹")
+    parser.add_argument('--preload', action='store_true',
+                        help="启动时就导入绘图依赖，使第一个绘图任务也不需要等待导入")
+    args = parser.parse_args()
+
+    if args.preload:
+        from plotting import get_pyplot, get_seaborn
+        get_pyplot('Agg')
+        get_seaborn()
+    done = serve(store=SalesStore(base_folder=args.base_folder))
+    print(f"工作进程退出，共处理 {done} 个任务。", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from sales_matrix import build_sales_matrix
+
+# MAD 换算为正态分布标准差的系数
+MAD_TO_STD = 1.4826
+
+
+def _robust_baseline(history, min_periods):
+    """
+    在最后一个维度上计算历史值的中位数和 MAD。
+
+    参数:
+    history (np.ndarray): 最后一维为历史窗口的数组，缺失值为 NaN。
+    min_periods (int): 有效历史值少于该数目时基线记为 NaN。
+
+    返回:
+    tuple: (median, mad)，形状为 history.shape[:-1]。
+    """
+    valid = np.sum(~np.isnan(history), axis=-1)
+    with warnings.catch_warnings():
+        # 全为 NaN 的窗口会触发 "All-NaN slice" 警告，这些位置随后会被置为 NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(history, axis=-1)
+        mad = np.nanmedian(np.abs(history - median[..., None]), axis=-1)
+    insufficient = valid < min_periods
+    median[insufficient] = np.nan
+    mad[insufficient] = np.nan
+    return median, mad
+
+
+def _score(values, median, mad, threshold, min_scale):
+    """根据基线计算稳健 z 分数、异常标记和替换值。"""
+    scale = np.maximum(MAD_TO_STD * mad, min_scale)
+    score = (values - median) / scale
+    flag = np.abs(score) > threshold
+    flag &= ~np.isnan(score)
+    replacement = np.where(flag, median, values)
+    return score, flag, replacement
+
+
+def detect_anomalies(matrix, window=8, threshold=3.5, min_periods=4, min_scale=0.5, use_mask=True):
+    """
+    以"同星期几"的滚动中位数/MAD为季节性基线，对所有 (日期, 单品) 点打分。
+
+    每个点只与此前 window 个相同星期几的销量比较（例如本周三只与前8个周三比较），
+    因此周末高峰不会被当成异常；所有单品、所有星期几在一次向量化计算中完成。
+    与 remove_outliers_by_group 不同，这里不删除任何行，而是给出异常标记和替换值。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×单品 矩阵（日期轴逐日连续）。
+    window (int): 每个星期几参与基线计算的历史周数。
+    threshold (float): 稳健 z 分数的绝对值超过该阈值即标记为异常。
+    min_periods (int): 有效历史值不足该数目时不打分（视为正常）。
+    min_scale (float): MAD 换算后的最小尺度（千克），避免长期零销量单品的尺度为0。
+    use_mask (bool): 为 True 时原始数据中不存在的日期不参与基线计算，也不打分。
+
+    返回:
+    dict: 'score'（稳健z分数）、'flag'（是否异常）、'baseline'（基线中位数）、
+          'replacement'（异常点替换为基线后的销量），均为与 matrix.values 同形状的数组。
+    """
+    values = matrix.values.astype(np.float64)
+    if use_mask and matrix.mask is not None:
+        values = np.where(matrix.mask, values, np.nan)
+
+    n_dates, n_items = values.shape
+    n_weeks = -(-n_dates // 7)
+
+    # 日期轴连续，因此补齐到整周后 reshape 为 (周, 7, 单品)，同一列位置即同一星期几
+    padded = np.full((n_weeks * 7, n_items), np.nan)
+    padded[:n_dates] = values
+    weekly = padded.reshape(n_weeks, 7, n_items)
+
+    # 在周轴前面补 window 个空周，第 j 周的窗口正好覆盖原始的 j-window .. j-1 周
+    history = np.concatenate([np.full((window, 7, n_items), np.nan), weekly], axis=0)
+    windows = np.lib.stride_tricks.sliding_window_view(history, window, axis=0)[:n_weeks]
+    median, mad = _robust_baseline(windows, min_periods)
+
+    median = median.reshape(n_weeks * 7, n_items)[:n_dates]
+    mad = mad.reshape(n_weeks * 7, n_items)[:n_dates]
+    score, flag, replacement = _score(values, median, mad, threshold, min_scale)
+
+    # 被 mask 掉的日期保持原矩阵中的值（补0）
+    replacement = np.where(np.isnan(values), matrix.values, replacement)
+
+    return {
+        'score': score,
+        'flag': flag,
+        'baseline': median,
+        'replacement': replacement.astype(np.float32),
+    }
+
+
+class AnomalyStream:
+    """
+    流式的季节性异常检测：每到一天的数据调用一次 update。
+
+    为每个星期几维护最近 window 个观测值的环形缓冲区（形状为 7×window×单品数），
+    打分规则与 detect_anomalies 完全一致，逐日喂入同一矩阵的数据会得到相同的结果。
+
+    参数:
+    items: 单品编码/名称列表，决定每天传入数组的列顺序。
+    其余参数含义同 detect_anomalies。
+    """
+
+    def __init__(self, items, window=8, threshold=3.5, min_periods=4, min_scale=0.5):
+        self.items = pd.Index(items)
+        self.window = window
+        self.threshold = threshold
+        self.min_periods = min_periods
+        self.min_scale = min_scale
+        self._history = np.full((7, window, len(self.items)), np.nan)
+        self._cursor = np.zeros(7, dtype=np.int64)
+
+    def update(self, date, day_values):
+        """
+        对某一天所有单品的销量打分，并把该天的数据写入历史。
+
+        参数:
+        date: 日期。
+        day_values (array-like): 长度等于单品数的销量，缺失记录用 NaN 表示。
+
+        返回:
+        dict: 'score'、'flag'、'baseline'、'replacement'，均为长度等于单品数的数组。
+        """
+        weekday = pd.Timestamp(date).dayofweek
+        day_values = np.asarray(day_values, dtype=np.float64)
+        if day_values.shape != (len(self.items),):
+            raise ValueError(f"每天的销量数组长度应为 {len(self.items)}，实际为 {day_values.shape}")
+
+        # 环形缓冲区中的顺序不影响中位数，直接按 (单品, 窗口) 计算
+        median, mad = _robust_baseline(self._history[weekday].T, self.min_periods)
+        score, flag, replacement = _score(day_values, median, mad, self.threshold, self.min_scale)
+
+        slot = self._cursor[weekday] % self.window
+        self._history[weekday, slot] = day_values
+        self._cursor[weekday] += 1
+
+        return {
+            'score': score,
+            'flag': flag,
+            'baseline': median,
+            'replacement': np.where(np.isnan(day_values), 0.0, replacement),
+        }
+
+
+def replace_anomalies_by_group(df, group_col, value_col, date_col='销售日期', **kwargs):
+    """
+    按分组检测季节性异常值，并用基线值替换，而不是删除整行。
+
+    参数:
+    df (pd.DataFrame): 包含数据的DataFrame。
+    group_col (str): 用于分组的列名 (例如 '分类名称' 或 '单品名称')。
+    value_col (str): 需要检测异常值的数值列名 (例如 '销量(千克)')。
+    date_col (str): 日期列名。
+    **kwargs: 传给 detect_anomalies 的参数（window、threshold 等）。
+
+    返回:
+    pd.DataFrame: 行数与输入相同的新DataFrame，value_col 中的异常值已替换为基线
+                  （同一天同一分组有多行时按各行占当日合计的比例分摊），并新增 '原始销量'、'异常得分' 和 '是否异常' 三列。
+    """
+    print(f"开始处理文件中的 '{group_col}'...")
+    print(f"原始数据行数: {len(df)}")
+
+    matrix = build_sales_matrix(df, group_col, value_col, date_col)
+    result = detect_anomalies(matrix, **kwargs)
+
+    dates = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
+    rows = matrix.dates.get_indexer(dates)
+    cols = matrix.items.get_indexer(df[group_col])
+    # 日期或分组缺失的行不在矩阵中（get_indexer 返回 -1），不打分并保留原值
+    valid = (rows >= 0) & (cols >= 0)
+    rows, cols = np.where(valid, rows, 0), np.where(valid, cols, 0)
+
+    # 矩阵中的一个单元格是同一 (日期, 分组) 所有行的合计，基线也是针对日合计的；
+    # 有重复行时按各行占当日合计的比例分摊基线，合计不为正时平均分摊，使替换后的日合计等于基线
+    values = pd.to_numeric(df[value_col], errors='coerce')
+    keys = [dates, df[group_col]]
+    day_total = values.groupby(keys, dropna=False).transform('sum').to_numpy(dtype=np.float64)
+    day_rows = values.groupby(keys, dropna=False).transform('size').to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(day_total > 0, values.to_numpy(dtype=np.float64) / day_total, 1.0 / day_rows)
+
+    df_flagged = df.copy()
+    df_flagged['原始销量'] = df[value_col]
+    df_flagged['异常得分'] = np.where(valid, result['score'][rows, cols], np.nan)
+    df_flagged['是否异常'] = valid & result['flag'][rows, cols]
+    df_flagged[value_col] = np.where(
+        df_flagged['是否异常'],
+        result['baseline'][rows, cols] * share,
+        df[value_col],
+    )
+
+    n_flagged = int(df_flagged['是否异常'].sum())
+    print(f"处理后数据行数: {len(df_flagged)}")
+    print(f"标记并替换了 {n_flagged} 个异常值。\n")
+
+    return df_flagged
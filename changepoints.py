@@ -0,0 +1,301 @@
+import numpy as np
+import pandas as pd
+
+from sales_matrix import SalesMatrix, load_sales_matrix
+from shared_arrays import SharedSalesMatrix, get_worker_data, shared_process_pool
+
+# 默认惩罚为 PENALTY_FACTOR·ln(n)（标准化后的序列）。BIC 对应的系数为2，
+# 但销量序列有明显的自相关，按 BIC 会切出大量只持续一两周的“段”
+PENALTY_FACTOR = 5
+
+
+def _noise_scale(x, lag=1):
+    """
+    用滞后差分的中位数绝对偏差稳健地估计噪声标准差。
+
+    均值突变只影响少数差分，因此 MAD 基本不受突变本身的影响。
+
+    返回:
+    float: 噪声标准差，序列为常数时返回1。
+    """
+    if len(x) <= lag:
+        diffs = np.diff(x)
+    else:
+        diffs = x[lag:] - x[:-lag]
+    if len(diffs) == 0:
+        return 1.0
+    mad = np.median(np.abs(diffs - np.median(diffs)))
+    sigma = mad / 0.6745 / np.sqrt(2)
+    if sigma <= 0:
+        sigma = np.std(diffs) / np.sqrt(2)
+    return sigma if sigma > 0 else 1.0
+
+
+def _segment_costs(csum, csum2, starts, end):
+    """
+    区间 [start, end) 的均值突变代价（残差平方和），对所有 start 一次算出。
+
+    csum / csum2 为前面补0的累积和与累积平方和，任意区间的代价都是 O(1)。
+    """
+    length = end - starts
+    total = csum[end] - csum[starts]
+    return (csum2[end] - csum2[starts]) - total ** 2 / length
+
+
+def pelt(x, penalty, min_size=8):
+    """
+    PELT 算法求均值突变点（精确最优分段，剪枝后平均复杂度 O(n)）。
+
+    F(t) = min_s [F(s) + C(s, t) + penalty]，每一步对所有候选起点做向量运算；
+    若某个起点满足 F(s) + C(s, t) > F(t)，则对 T >= t + min_size 它都不可能比“在 t 处切分”更优。
+    由于最短长度的限制，t 在 T < t + min_size 时还不能作为切分点，
+    因此剪枝推迟 min_size 步生效，在此之前该起点仍保留在候选中。
+
+    参数:
+    x (np.ndarray): 已标准化的一维序列。
+    penalty (float): 每增加一个突变点的惩罚。
+    min_size (int): 每段的最短长度。
+
+    返回:
+    np.ndarray: 各段的起点位置（不含0），升序。
+    """
+    n = len(x)
+    if n < 2 * min_size:
+        return np.array([], dtype=np.int64)
+    csum = np.concatenate([[0.0], np.cumsum(x)])
+    csum2 = np.concatenate([[0.0], np.cumsum(x ** 2)])
+
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+    # 每个候选起点被剪掉的时刻，尚未满足剪枝条件的为 n+1
+    prune_at = np.array([n + 1], dtype=np.int64)
+    for t in range(min_size, n + 1):
+        # 新候选起点 s = t - min_size：此时 s 之前的最优值已经算出，且 [s, t) 恰好满足最短长度
+        new_start = t - min_size
+        if new_start >= min_size:
+            candidates = np.append(candidates, new_start)
+            prune_at = np.append(prune_at, n + 1)
+        keep = prune_at > t
+        candidates, prune_at = candidates[keep], prune_at[keep]
+
+        values = best[candidates] + _segment_costs(csum, csum2, candidates, t)
+        k = values.argmin()
+        best[t] = values[k] + penalty
+        last[t] = candidates[k]
+        prune_at = np.where(values > best[t], np.minimum(prune_at, t + min_size), prune_at)
+
+    boundaries = []
+    t = n
+    while t > 0:
+        t = last[t]
+        if t > 0:
+            boundaries.append(t)
+    return np.array(boundaries[::-1], dtype=np.int64)
+
+
+def binary_segmentation(x, penalty, min_size=8, max_changepoints=None):
+    """
+    二分分段求均值突变点：每次在某一段内找代价下降最多的切分点，下降超过 penalty 才切分。
+
+    每段内所有切分位置的代价由累积和一次算出，复杂度约 O(n log n)。
+
+    参数:
+    x (np.ndarray): 已标准化的一维序列。
+    penalty (float): 切分所需的最小代价下降。
+    min_size (int): 每段的最短长度。
+    max_changepoints (int 或 None): 最多保留的突变点个数。
+
+    返回:
+    np.ndarray: 各段的起点位置（不含0），升序。
+    """
+    n = len(x)
+    csum = np.concatenate([[0.0], np.cumsum(x)])
+    csum2 = np.concatenate([[0.0], np.cumsum(x ** 2)])
+
+    boundaries = []
+    pending = [(0, n)]
+    while pending:
+        start, end = pending.pop()
+        if end - start < 2 * min_size:
+            continue
+        splits = np.arange(start + min_size, end - min_size + 1)
+        whole = _segment_costs(csum, csum2, np.array([start]), end)[0]
+        left = (csum2[splits] - csum2[start]) - (csum[splits] - csum[start]) ** 2 / (splits - start)
+        right = _segment_costs(csum, csum2, splits, end)
+        gain = whole - left - right
+        k = gain.argmax()
+        if gain[k] > penalty:
+            boundaries.append(int(splits[k]))
+            pending.extend([(start, int(splits[k])), (int(splits[k]), end)])
+            if max_changepoints is not None and len(boundaries) >= max_changepoints:
+                break
+    return np.array(sorted(boundaries), dtype=np.int64)
+
+
+def detect_changepoints(x, method='pelt', penalty=None, min_size=8, noise_lag=1):
+    """
+    对单个序列检测均值突变点。
+
+    序列先除以稳健噪声尺度，使惩罚与销量大小无关。
+
+    参数:
+    x (array-like): 一维序列。
+    method (str): 'pelt' 或 'binseg'。
+    penalty (float 或 None): 标准化后的惩罚，默认 PENALTY_FACTOR·ln(n)。
+    min_size (int): 每段的最短长度（点数）。
+    noise_lag (int): 估计噪声尺度所用差分的滞后，日度序列取7可避开周内波动。
+
+    返回:
+    np.ndarray: 各段的起点位置（不含0）。
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if penalty is None:
+        penalty = PENALTY_FACTOR * np.log(max(len(x), 2))
+    scaled = (x - x.mean()) / _noise_scale(x, noise_lag)
+    if method == 'pelt':
+        return pelt(scaled, penalty, min_size)
+    if method == 'binseg':
+        return binary_segmentation(scaled, penalty, min_size)
+    raise ValueError(f"不支持的 method: {method}，可选 'pelt' 或 'binseg'")
+
+
+class ChangepointResult:
+    """
+    所有序列的分段结果。
+
+    属性:
+    dates (pd.DatetimeIndex): 日期轴。
+    items (pd.Index): 序列名称轴。
+    boundaries (list): 每个序列各段起点位置（不含0）的 int64 数组。
+    method (str): 检测方法。
+    """
+
+    def __init__(self, dates, items, boundaries, method):
+        self.dates = pd.DatetimeIndex(dates)
+        self.items = pd.Index(items)
+        self.boundaries = [np.asarray(b, dtype=np.int64) for b in boundaries]
+        self.method = method
+
+    def __repr__(self):
+        counts = np.array([len(b) for b in self.boundaries])
+        return (f"ChangepointResult({self.method}, {len(self.items)} 个序列, "
+                f"共 {int(counts.sum())} 个突变点, {int((counts > 0).sum())} 个序列至少有1个)")
+
+    def current_regime_start(self):
+        """各序列当前（最后一段）的起始日期。"""
+        starts = [b[-1] if len(b) else 0 for b in self.boundaries]
+        return pd.Series(self.dates[starts], index=self.items, name='当前段起始日期')
+
+    def regime_mask(self):
+        """
+        与 (日期, 序列) 对齐的布尔数组，True 表示该日期属于序列的当前段。
+
+        返回:
+        np.ndarray: (日期数, 序列数) 的布尔数组。
+        """
+        starts = np.array([b[-1] if len(b) else 0 for b in self.boundaries])
+        return np.arange(len(self.dates))[:, None] >= starts[None, :]
+
+    def segments_frame(self, matrix=None):
+        """
+        展开为每段一行的表。
+
+        参数:
+        matrix (SalesMatrix 或 None): 给出时附加每段的日均销量。
+
+        返回:
+        pd.DataFrame: 列为 序列、段、开始日期、结束日期、天数（和 日均销量）。
+        """
+        rows = []
+        for col, (item, boundaries) in enumerate(zip(self.items, self.boundaries)):
+            edges = np.concatenate([[0], boundaries, [len(self.dates)]])
+            for segment, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+                row = {'序列': item, '段': segment, '开始日期': self.dates[start],
+                       '结束日期': self.dates[end - 1], '天数': int(end - start)}
+                if matrix is not None:
+                    row['日均销量'] = float(matrix.values[start:end, col].mean())
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def _detect_columns(columns, method, penalty, min_size, noise_lag):
+    """进程池任务：在已挂载的共享矩阵上检测一组列。"""
+    matrix, _ = get_worker_data()
+    return [detect_changepoints(matrix.values[:, col], method, penalty, min_size, noise_lag)
+            for col in columns]
+
+
+def detect_all(matrix, method='pelt', freq='W', penalty=None, min_size=8, max_workers=1, chunk_size=16):
+    """
+    对矩阵中的所有序列检测突变点。
+
+    默认在周销量上检测（周内波动和日度噪声被汇总掉），再把每段的起点换算回日期轴上该周的第一天。
+    max_workers 不为1时，矩阵通过 SharedSalesMatrix 发布到共享内存，
+    各工作进程按列分块处理，只传递列号。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×序列 矩阵（缺失日期为0，单品上市/下架本身也是突变）。
+    method / penalty: 见 detect_changepoints。
+    freq (str 或 None): 检测前重采样的频率，None 表示直接在日度序列上检测。
+    min_size (int): 每段的最短长度（重采样后的周期数）。
+    max_workers (int 或 None): 进程数，1 表示串行，None 表示使用全部CPU核心。
+    chunk_size (int): 每个任务处理的列数。
+
+    返回:
+    ChangepointResult: 日期轴上的分段结果。
+    """
+    series = matrix if freq is None else matrix.resample(freq)
+    noise_lag = 7 if freq is None else 1
+    n_items = series.shape[1]
+    if max_workers == 1:
+        boundaries = [detect_changepoints(series.values[:, col], method, penalty, min_size, noise_lag)
+                      for col in range(n_items)]
+    else:
+        chunks = [range(start, min(start + chunk_size, n_items)) for start in range(0, n_items, chunk_size)]
+        n = len(chunks)
+        with SharedSalesMatrix(series) as handle, shared_process_pool(handle, max_workers) as executor:
+            results = executor.map(_detect_columns, chunks, [method] * n, [penalty] * n,
+                                   [min_size] * n, [noise_lag] * n)
+            boundaries = [b for chunk in results for b in chunk]
+
+    if freq is not None:
+        # 第 k 个周期从上一个周期标签之后的第一天开始
+        boundaries = [matrix.dates.searchsorted(series.dates[b - 1], side='right') for b in boundaries]
+    return ChangepointResult(matrix.dates, matrix.items, boundaries, method)
+
+
+def restrict_to_current_regime(matrix, result):
+    """
+    把每个序列当前段之前的日期从 mask 中去掉（销量值保持不变），
+    之后基于 mask 的统计（分位数边界、ACF、分解等）只使用当前段的数据。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×序列 矩阵。
+    result (ChangepointResult): 同一矩阵的分段结果。
+
+    返回:
+    SalesMatrix: mask 更新后的新矩阵。
+    """
+    if not result.dates.equals(matrix.dates) or not result.items.equals(matrix.items):
+        raise ValueError("分段结果的坐标轴与矩阵不一致")
+    regime = result.regime_mask()
+    mask = regime if matrix.mask is None else matrix.mask & regime
+    return SalesMatrix(matrix.values, matrix.dates, matrix.items, mask)
+
+
+if __name__ == '__main__':
+    import time
+
+    category_matrix = load_sales_matrix('daily_category_sales.xlsx', '分类名称')
+    category_result = detect_all(category_matrix)
+    print(category_result)
+    print(category_result.segments_frame(category_matrix).round(2).to_string(index=False))
+
+    sku_matrix = load_sales_matrix('cleaned_daily_sku_sales.xlsx', '单品名称')
+    start = time.perf_counter()
+    sku_result = detect_all(sku_matrix, max_workers=None)
+    print(f"\n{sku_result}，耗时 {time.perf_counter() - start:.2f} 秒")
+    sku_result.segments_frame(sku_matrix).to_excel('sku_changepoints.xlsx', index=False)
+    print("单品分段结果已保存到 'sku_changepoints.xlsx'。")
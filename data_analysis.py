@@ -1,13 +1,16 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 from datetime import datetime
 import os
 
-# 设置中文字体,以正确显示图表中的中文标签
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+from feature_store import calendar_features, rolling_features
+from plotting import get_pyplot, get_seaborn
+from holiday_calendar import row_day_mask
+from sales_matrix import build_sales_matrix
+from sales_stats import describe_groups
+from quantile_sketch import group_quantiles
+from sales_rollups import (RESOLUTION_NAMES, axes_pixel_width, build_rollups, minmax_downsample,
+                           plot_rollup)
 
 # 创建保存图片的文件夹
 def create_output_folder(folder_name="销售数据分析图表"):
@@ -37,7 +40,7 @@ HIGH_CONTRAST_COLORS = [
     '#4169E1'   # 宝蓝色
 ]
 
-def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)', date_column='销售日期', output_folder="销售数据分析图表"):
+def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)', date_column='销售日期', output_folder="销售数据分析图表", quantile_method='exact'):
     """
     加载销售数据,计算核心统计量,并绘制时间序列分布图。
      
@@ -47,7 +50,9 @@ def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)'
     - value_column (str): 需要分析的数值列名。
     - date_column (str): 销售日期列名。
     - output_folder (str): 保存图片的文件夹名称。
+    - quantile_method (str): 中位数的计算方式，'exact' 为精确值，'sketch' 使用 KLL 分位数草图近似。
     """
+    plt = get_pyplot()
     # --- 1. 加载数据 ---
     try:
         df = pd.read_excel(file_path)
@@ -85,8 +90,12 @@ def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)'
     df = df.sort_values(date_column)
  
     # --- 2. 计算核心统计量 ---
-    # 使用 agg 一次性计算均值、中位数和标准差
-    core_stats = df.groupby(group_by_column)[value_column].agg(['mean', 'median', 'std']).round(2)
+    # 从统计引擎的描述性统计中取均值、中位数和标准差（结果有缓存）
+    # date_col=None 表示按行统计，与原先 groupby().agg() 的口径一致
+    core_stats = describe_groups(df, group_by_column, value_column, date_col=None)[['mean', 'median', 'std']]
+    if quantile_method == 'sketch':
+        core_stats['median'] = group_quantiles(df, group_by_column, value_column, (0.5,), method='sketch')[0.5]
+    core_stats = core_stats.round(2)
     
     # 重命名列以便更好地显示
     core_stats.columns = ['均值', '中位数', '标准差']
@@ -97,6 +106,12 @@ def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)'
     print("=" * 50)
  
     # --- 3. 绘制时间序列分布图形 ---
+    # 一次性生成 日期×品类/单品 矩阵及其 日/周/月 预聚合，绘图时按图宽选择粒度
+    matrix = build_sales_matrix(df, group_by_column, value_column, date_column)
+    rollups = build_rollups(matrix)
+    observed = matrix.masked_values().astype(np.float64)
+    moving_avg_all = rolling_features(matrix, window=7, center=True)['rolling_mean']
+
     # 获取所有唯一的品类/单品名称
     unique_items = df[group_by_column].unique()
     num_items = len(unique_items)
@@ -138,38 +153,36 @@ def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)'
         if i >= len(axes):
             break
             
-        # 筛选当前品类/单品的数据
-        item_data = df[df[group_by_column] == item].copy()
+        # 取出当前品类/单品在矩阵中的列
+        col = matrix.column(item)
+        item_observed = observed[:, col]
         
-        if len(item_data) == 0:
+        if np.isnan(item_observed).all():
             axes[i].text(0.5, 0.5, '无数据', ha='center', va='center', transform=axes[i].transAxes)
             axes[i].set_title(f'{item}\n(无数据)')
             continue
         
-        # 按日期分组，计算每日销量（如果同一天有多条记录）
-        daily_sales = item_data.groupby(date_column)[value_column].sum().reset_index()
-        
         # 使用高对比度颜色
         line_color = HIGH_CONTRAST_COLORS[i % len(HIGH_CONTRAST_COLORS)]
         
-        # 绘制时间序列线图
-        axes[i].plot(daily_sales[date_column], daily_sales[value_column], 
-                    marker='o', markersize=3, linewidth=2, alpha=0.8, color=line_color)
+        # 绘制时间序列线图（按图宽选择日/周/月粒度，并做保留极值的降采样）
+        resolution = plot_rollup(axes[i], rollups, item, dpi=300,
+                                 linewidth=2, alpha=0.8, color=line_color)
         
-        # 添加趋势线（移动平均）
-        if len(daily_sales) >= 7:
-            window_size = min(7, len(daily_sales)//3)  # 7天移动平均或数据量的1/3
-            moving_avg = daily_sales[value_column].rolling(window=window_size, center=True).mean()
-            axes[i].plot(daily_sales[date_column], moving_avg, 
+        # 添加趋势线（7日移动平均，同样降采样到图宽）
+        if len(matrix.dates) >= 7:
+            ma_x, ma_y = minmax_downsample(matrix.dates.to_numpy(), moving_avg_all[:, col],
+                                           axes_pixel_width(axes[i], dpi=300))
+            axes[i].plot(ma_x, ma_y, 
                         color='black', linewidth=3, alpha=0.8, 
-                        label=f'{window_size}日移动平均', linestyle='--')
+                        label='7日移动平均', linestyle='--')
             axes[i].legend()
         
         # 设置标题和标签
-        mean_val = daily_sales[value_column].mean()
-        std_val = daily_sales[value_column].std()
+        mean_val = np.nanmean(item_observed)
+        std_val = np.nanstd(item_observed, ddof=1)
         axes[i].set_title(f'{item}\n均值: {mean_val:.2f}, 标准差: {std_val:.2f}', fontsize=10, fontweight='bold')
-        axes[i].set_xlabel('销售日期')
+        axes[i].set_xlabel(f'销售日期（{RESOLUTION_NAMES[resolution]}粒度）')
         axes[i].set_ylabel(f'{value_column}')
         axes[i].grid(True, alpha=0.3)
         
@@ -177,7 +190,7 @@ def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)'
         axes[i].tick_params(axis='x', rotation=45)
         
         # 设置y轴从0开始（如果所有值都是正数）
-        if daily_sales[value_column].min() >= 0:
+        if np.nanmin(item_observed) >= 0:
             axes[i].set_ylim(bottom=0)
     
     # 隐藏多余的子图
@@ -200,20 +213,12 @@ def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)'
     plt.figure(figsize=(15, 8))
     
     for i, item in enumerate(unique_items):
-        item_data = df[df[group_by_column] == item].copy()
-        if len(item_data) == 0:
-            continue
-            
-        # 按日期分组，计算每日销量
-        daily_sales = item_data.groupby(date_column)[value_column].sum().reset_index()
-        
         # 使用高对比度颜色
         line_color = HIGH_CONTRAST_COLORS[i % len(HIGH_CONTRAST_COLORS)]
         
-        # 绘制时间序列线图
-        plt.plot(daily_sales[date_column], daily_sales[value_column], 
-                marker='o', markersize=3, linewidth=2.5, alpha=0.8, 
-                color=line_color, label=item)
+        # 绘制时间序列线图（按图宽选择粒度并降采样）
+        plot_rollup(plt.gca(), rollups, item, dpi=300,
+                    linewidth=2.5, alpha=0.8, color=line_color, label=item)
     
     plt.title(f'所有{group_by_column}销量时间序列对比', fontsize=16, fontweight='bold')
     plt.xlabel('销售日期', fontsize=12)
@@ -233,19 +238,29 @@ def analyze_sales_data(file_path, group_by_column, value_column='销量(千克)'
     
     return core_stats
 
-def analyze_seasonal_patterns(df, group_by_column, value_column='销量(千克)', date_column='销售日期', output_folder="销售数据分析图表"):
+def analyze_seasonal_patterns(df, group_by_column, value_column='销量(千克)', date_column='销售日期', output_folder="销售数据分析图表", exclude=None):
     """
     分析季节性模式（按月份、星期几等）
+    exclude 为不参与统计的日期类型，例如 ('节假日', '促销')
     """
+    plt = get_pyplot()
+    sns = get_seaborn()
     print(f"\n--- 季节性模式分析 ---")
     
     # 确保销售日期列是datetime格式
     df[date_column] = pd.to_datetime(df[date_column])
     
-    # 添加时间特征
-    df['月份'] = df[date_column].dt.month
-    df['星期几'] = df[date_column].dt.dayofweek  # 0=周一, 6=周日
-    df['星期几名称'] = df[date_column].dt.day_name()
+    # 按节假日/促销日历剔除指定类型的日期（标记在去重后的日期轴上计算，再按行展开）
+    if exclude:
+        keep = row_day_mask(df[date_column], exclude=exclude)
+        print(f"已剔除 {'、'.join(exclude)} 的记录 {int((~keep).sum())} 条")
+        df = df[keep].copy()
+    
+    # 添加时间特征（日历特征按日期轴缓存，同一批日期只计算一次）
+    features = calendar_features(df[date_column])
+    df['月份'] = features['月份']
+    df['星期几'] = features['星期几']  # 0=周一, 6=周日
+    df['星期几名称'] = features['星期几名称']
     
     # 按月份分析
     plt.figure(figsize=(16, 12))
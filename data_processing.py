@@ -1,12 +1,10 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+from quantile_sketch import group_quantiles
+# 绘图依赖在生成图表前才导入（中文字体在首次导入时设置）
+from plotting import get_pyplot
 
-def remove_outliers_by_group(df, group_col, value_col):
+def remove_outliers_by_group(df, group_col, value_col, method='exact', sketch_k=200):
     """
     一个简便的函数，用于按分组去除数据中的异常值。
     它会为每个组（如每个品类或每个单品）计算IQR边界，
@@ -16,6 +14,9 @@ def remove_outliers_by_group(df, group_col, value_col):
     df (pd.DataFrame): 包含数据的DataFrame。
     group_col (str): 用于分组的列名 (例如 '分类名称' 或 '单品名称')。
     value_col (str): 需要检测异常值的数值列名 (例如 '销量(千克)')。
+    method (str): 'exact' 按每组完整排序计算精确四分位数；
+                  'sketch' 使用 KLL 分位数草图近似，适合很长的历史或需要增量更新的场合。
+    sketch_k (int): method='sketch' 时草图的精度参数。
 
     返回:
     pd.DataFrame: 一个已经剔除了异常值的新DataFrame。
@@ -23,8 +24,13 @@ def remove_outliers_by_group(df, group_col, value_col):
     print(f"开始处理文件中的 '{group_col}'...")
     print(f"原始数据行数: {len(df)}")
     
-    Q1 = df.groupby(group_col)[value_col].transform('quantile', 0.25)
-    Q3 = df.groupby(group_col)[value_col].transform('quantile', 0.75)
+    if method == 'sketch':
+        bounds = group_quantiles(df, group_col, value_col, (0.25, 0.75), method='sketch', k=sketch_k)
+        Q1 = df[group_col].map(bounds[0.25])
+        Q3 = df[group_col].map(bounds[0.75])
+    else:
+        Q1 = df.groupby(group_col)[value_col].transform('quantile', 0.25)
+        Q3 = df.groupby(group_col)[value_col].transform('quantile', 0.75)
     IQR = Q3 - Q1
 
     lower_bound = Q1 - 1.5 * IQR
@@ -42,6 +48,9 @@ def remove_outliers_by_group(df, group_col, value_col):
 
 # 导入库
 import pandas as pd
+from sales_matrix import build_sales_matrix
+from anomaly_detection import replace_anomalies_by_group
+from sales_stats import describe_groups
 
 # 读取文件
 try:
@@ -52,9 +61,10 @@ try:
     df_sku['销售日期'] = pd.to_datetime(df_sku['销售日期'])
     df_category['销售日期'] = pd.to_datetime(df_category['销售日期'])
 
-    # 应用函数
-    df_category_cleaned = remove_outliers_by_group(df_category, '分类名称', '销量(千克)')
-    df_sku_cleaned = remove_outliers_by_group(df_sku, '单品名称', '销量(千克)')
+    # 应用函数：按"同星期几"的滚动基线标记异常值并替换，不再删除整行，
+    # 避免在时间序列中留下缺口（remove_outliers_by_group 仍保留供对比使用）
+    df_category_cleaned = replace_anomalies_by_group(df_category, '分类名称', '销量(千克)')
+    df_sku_cleaned = replace_anomalies_by_group(df_sku, '单品名称', '销量(千克)')
 
     # 保存结果
     df_category_cleaned.to_excel('daily_category_sales_cleaned.xlsx', index=False)
@@ -64,20 +74,25 @@ try:
 
     # --- 可视化部分 ---
 
+    # 一次性生成稠密的 日期×品类 / 日期×单品 矩阵，周重采样直接在矩阵上完成
+    category_matrix_orig = build_sales_matrix(df_category, '分类名称')
+    category_matrix_cleaned = build_sales_matrix(df_category_cleaned, '分类名称')
+    sku_matrix_orig = build_sales_matrix(df_sku, '单品名称')
+    sku_matrix_cleaned = build_sales_matrix(df_sku_cleaned, '单品名称')
+
     # 找出总销量最大的品类
-    total_sales_category = df_category.groupby('分类名称')['销量(千克)'].sum().idxmax()
+    total_sales_category = describe_groups(df_category, '分类名称')['sum'].idxmax()
     print(f"总销量最大的品类是: {total_sales_category}")
 
     # 找出总销量最大的单品
-    total_sales_sku = df_sku.groupby('单品名称')['销量(千克)'].sum().idxmax()
+    total_sales_sku = describe_groups(df_sku, '单品名称')['sum'].idxmax()
     print(f"总销量最大的单品是: {total_sales_sku}")
 
     # 筛选最大品类和单品的数据
     df_max_category_orig = df_category[df_category['分类名称'] == total_sales_category]
-    df_max_category_cleaned = df_category_cleaned[df_category_cleaned['分类名称'] == total_sales_category]
-    
     df_max_sku_orig = df_sku[df_sku['单品名称'] == total_sales_sku]
-    df_max_sku_cleaned = df_sku_cleaned[df_sku_cleaned['单品名称'] == total_sales_sku]
+
+    plt = get_pyplot()
 
     # --- 为最大品类生成图表 ---
 
@@ -93,8 +108,8 @@ try:
     print(f'图表 "{total_sales_category}_before_boxplot.png" 已保存。')
 
     # 2. 品类 - 数据预处理前后周销量时间序列对比图
-    weekly_sales_category_orig = df_max_category_orig.set_index('销售日期').resample('W')['销量(千克)'].sum()
-    weekly_sales_category_cleaned = df_max_category_cleaned.set_index('销售日期').resample('W')['销量(千克)'].sum()
+    weekly_sales_category_orig = category_matrix_orig.resample('W').series(total_sales_category)
+    weekly_sales_category_cleaned = category_matrix_cleaned.resample('W').series(total_sales_category)
 
     plt.figure(figsize=(15, 7))
     plt.plot(weekly_sales_category_orig.index, weekly_sales_category_orig.values, marker='o', linestyle='-', label='处理前')
@@ -122,8 +137,8 @@ try:
     print(f'图表 "{total_sales_sku}_before_boxplot.png" 已保存。')
 
     # 4. 单品 - 数据预处理前后周销量时间序列对比图
-    weekly_sales_sku_orig = df_max_sku_orig.set_index('销售日期').resample('W')['销量(千克)'].sum()
-    weekly_sales_sku_cleaned = df_max_sku_cleaned.set_index('销售日期').resample('W')['销量(千克)'].sum()
+    weekly_sales_sku_orig = sku_matrix_orig.resample('W').series(total_sales_sku)
+    weekly_sales_sku_cleaned = sku_matrix_cleaned.resample('W').series(total_sales_sku)
 
     plt.figure(figsize=(15, 7))
     plt.plot(weekly_sales_sku_orig.index, weekly_sales_sku_orig.values, marker='o', linestyle='-', label='处理前')
@@ -0,0 +1,208 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# 星期几名称，与 data_analysis.py 中的 weekday_names 顺序一致（0=周一）
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+class LRUCache:
+    """
+    按最近使用顺序淘汰的简单缓存。
+
+    get / put 由锁保护，可以在线程池的多个线程之间共享
+    （例如 SalesService 在 run_in_executor 中并发处理请求）。
+
+    参数:
+    max_entries (int): 最多保留的条目数，超出时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def data_hash(*arrays):
+    """
+    计算若干数组内容的哈希值，作为缓存键。
+    数组的形状和类型也参与哈希，避免不同形状但字节相同的数组冲突。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            array = np.asarray([str(x) for x in array.ravel()], dtype=str)
+        digest.update(str((array.shape, array.dtype.str)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def matrix_hash(matrix):
+    """计算 SalesMatrix 的内容哈希（销量、日期轴和单品轴）。"""
+    return data_hash(matrix.values, matrix.dates.asi8, np.asarray(matrix.items))
+
+
+_calendar_cache = LRUCache(max_entries=16)
+_rolling_cache = LRUCache(max_entries=32)
+
+
+def calendar_features(dates):
+    """
+    计算日期对应的日历特征：月份、星期几、星期几名称和日。
+
+    特征只在去重后的日期轴上计算一次，并按日期轴哈希缓存；
+    传入逐行的日期列时，结果按原顺序展开，可直接赋值给 DataFrame 的列。
+
+    参数:
+    dates: 日期序列（pd.Series、DatetimeIndex 或任意可转换为日期的数组）。
+
+    返回:
+    pd.DataFrame: 列为 '月份'、'星期几'（0=周一）、'星期几名称'、'日期'，
+                  行数和顺序与输入一致。
+    """
+    date_values = pd.to_datetime(pd.Series(np.asarray(dates))).to_numpy(dtype='datetime64[ns]')
+    axis, inverse = np.unique(date_values, return_inverse=True)
+
+    key = data_hash(axis.view(np.int64))
+    features = _calendar_cache.get(key)
+    if features is None:
+        axis_index = pd.DatetimeIndex(axis)
+        weekday = np.asarray(axis_index.dayofweek)
+        features = pd.DataFrame({
+            '月份': np.asarray(axis_index.month),
+            '星期几': weekday,
+            '星期几名称': np.asarray(WEEKDAY_NAMES)[weekday],
+            '日期': np.asarray(axis_index.day),
+        })
+        _calendar_cache.put(key, features)
+
+    result = features.iloc[inverse.ravel()].reset_index(drop=True)
+    if isinstance(dates, pd.Series):
+        result.index = dates.index
+    return result
+
+
+def _window_sums(values, window):
+    """沿日期轴（第0维）计算长度为 window 的滑动窗口和，前 window-1 行为 NaN。"""
+    cumsum = np.cumsum(values, axis=0)
+    sums = np.full(values.shape, np.nan)
+    sums[window - 1:] = cumsum[window - 1:]
+    sums[window:] -= cumsum[:-window]
+    return sums
+
+
+def _rolling_mean_std(values, window):
+    """用累积和一次性计算所有序列的滑动均值和样本标准差（ddof=1）。"""
+    values = values.astype(np.float64)
+    # 先减去每列均值，降低累积平方和的数值误差
+    values = values - values.mean(axis=0, keepdims=True)
+    sums = _window_sums(values, window)
+    sq_sums = _window_sums(values ** 2, window)
+    mean = sums / window
+    if window > 1:
+        var = (sq_sums - window * mean ** 2) / (window - 1)
+        std = np.sqrt(np.clip(var, 0, None))
+    else:
+        std = np.full(values.shape, np.nan)
+    return mean, std
+
+
+def _shift(values, periods):
+    """沿日期轴平移，空出的位置填 NaN（periods>0 表示取过去的值）。"""
+    shifted = np.full(values.shape, np.nan)
+    if periods > 0:
+        shifted[periods:] = values[:-periods]
+    elif periods < 0:
+        shifted[:periods] = values[-periods:]
+    else:
+        shifted[:] = values
+    return shifted
+
+
+def rolling_features(matrix, window=7, lags=(1, 7), center=False):
+    """
+    为 SalesMatrix 中的所有序列计算滑动均值、滑动标准差和滞后值。
+
+    计算基于累积和，对所有单品一次完成；结果按矩阵内容哈希和参数缓存，
+    绘图、分析和预测对同一份数据重复调用时直接返回缓存的数组。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×单品 矩阵。
+    window (int): 滑动窗口长度（天）。
+    lags (tuple): 需要生成的滞后天数。
+    center (bool): 为 True 时窗口居中，与 pandas rolling(center=True) 一致。
+
+    返回:
+    dict: 键为 'rolling_mean'、'rolling_std' 和 'lag_{k}'，
+          值为与 matrix.values 同形状的 float64 数组，不足窗口的位置为 NaN。
+          返回的数组为只读，需要修改时请先复制。
+    """
+    key = (matrix_hash(matrix), window, tuple(lags), center)
+    features = _rolling_cache.get(key)
+    if features is not None:
+        return features
+
+    values = matrix.values.astype(np.float64)
+    mean, std = _rolling_mean_std(values, window)
+    # _rolling_mean_std 在去均值后的数据上计算，这里把列均值加回来
+    mean += values.mean(axis=0, keepdims=True)
+
+    if center:
+        offset = (window - 1) // 2
+        mean = _shift(mean, -offset)
+        std = _shift(std, -offset)
+
+    features = {'rolling_mean': mean, 'rolling_std': std}
+    for lag in lags:
+        features[f'lag_{lag}'] = _shift(values, lag)
+    for array in features.values():
+        array.flags.writeable = False
+
+    _rolling_cache.put(key, features)
+    return features
+
+
+def rolling_feature_series(matrix, item, name='rolling_mean', **kwargs):
+    """取出单个单品的某个滑动特征，返回以日期为索引的 pd.Series。"""
+    features = rolling_features(matrix, **kwargs)
+    return pd.Series(features[name][:, matrix.column(item)], index=matrix.dates, name=item)
+
+
+def clear_feature_cache():
+    """清空日历特征和滑动特征缓存。"""
+    _calendar_cache.clear()
+    _rolling_cache.clear()
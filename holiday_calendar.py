@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import LRUCache, data_hash
+from sales_matrix import SalesMatrix
+
+# 本地保存的节假日/促销日历表：每行一个日期区间，列为 开始日期、结束日期、名称、类型。
+# 自定义促销活动直接追加 类型 为 '促销' 的行即可。
+CALENDAR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'holiday_calendar.csv')
+
+# 日历中的日期类型：节假日为法定放假日，调休为周末补班日，促销为自定义的促销活动日
+KINDS = ('节假日', '调休', '促销')
+
+# 透视表、ACF 等默认剔除的日期类型
+DEFAULT_EXCLUDE = ('节假日', '促销')
+
+_calendar_cache = LRUCache(max_entries=16)
+
+
+def load_calendar_table(file_path=CALENDAR_FILE):
+    """
+    读取节假日/促销日历表。
+
+    参数:
+    file_path (str): 日历表 CSV 文件路径。
+
+    返回:
+    pd.DataFrame: 列为 开始日期、结束日期（datetime）、名称、类型 的表。
+    """
+    table = pd.read_csv(file_path, parse_dates=['开始日期', '结束日期'])
+    unknown = set(table['类型']) - set(KINDS)
+    if unknown:
+        raise ValueError(f"日历表中存在未知的类型: {sorted(unknown)}，可选 {list(KINDS)}")
+    return table
+
+
+class CalendarIndex:
+    """
+    与日期轴对齐的节假日/促销标记。
+
+    日历表只有几十行，构建时对每一行做一次二分查找并给对应的日期区间赋值；
+    之后所有筛选都是对布尔数组的向量化运算，不需要逐行查日期。
+
+    属性:
+    dates (pd.DatetimeIndex): 日期轴（升序）。
+    flags (dict): 类型 -> 与 dates 对齐的布尔数组。
+    event_codes (np.ndarray): 与 dates 对齐的 int16 事件编号，-1 表示普通日。
+    event_names (pd.Index): 事件编号对应的名称。
+    """
+
+    def __init__(self, dates, table):
+        self.dates = pd.DatetimeIndex(dates)
+        if not self.dates.is_monotonic_increasing:
+            raise ValueError("CalendarIndex 的日期轴必须为升序")
+        self.event_names = pd.Index(pd.unique(table['名称']))
+        self.flags = {kind: np.zeros(len(self.dates), dtype=bool) for kind in KINDS}
+        self.event_codes = np.full(len(self.dates), -1, dtype=np.int16)
+
+        lo = self.dates.searchsorted(table['开始日期'].to_numpy(), side='left')
+        hi = self.dates.searchsorted(table['结束日期'].to_numpy(), side='right')
+        codes = self.event_names.get_indexer(table['名称'])
+        for start, end, kind, code in zip(lo, hi, table['类型'], codes):
+            self.flags[kind][start:end] = True
+            self.event_codes[start:end] = code
+
+        for array in (*self.flags.values(), self.event_codes):
+            array.flags.writeable = False
+
+    def __repr__(self):
+        counts = ', '.join(f"{kind} {int(flag.sum())} 天" for kind, flag in self.flags.items())
+        return f"CalendarIndex({len(self.dates)} 天: {counts})"
+
+    def day_mask(self, exclude=DEFAULT_EXCLUDE, include=None):
+        """
+        返回需要保留的日期的布尔数组。
+
+        参数:
+        exclude (tuple): 需要剔除的日期类型，例如 ('节假日', '促销')。
+        include (tuple 或 None): 给出时只保留这些类型的日期（例如只看节假日），
+                                 之后再应用 exclude。
+
+        返回:
+        np.ndarray: 与 dates 对齐的布尔数组，True 表示保留。
+        """
+        if include is None:
+            keep = np.ones(len(self.dates), dtype=bool)
+        else:
+            keep = np.zeros(len(self.dates), dtype=bool)
+            for kind in include:
+                keep |= self._flag(kind)
+        for kind in exclude or ():
+            keep &= ~self._flag(kind)
+        return keep
+
+    def _flag(self, kind):
+        if kind not in self.flags:
+            raise ValueError(f"未知的日期类型: {kind}，可选 {list(KINDS)}")
+        return self.flags[kind]
+
+    def event_labels(self):
+        """每个日期的事件名称（分类类型），普通日为缺失值。"""
+        return pd.Categorical.from_codes(self.event_codes, categories=self.event_names)
+
+    def to_frame(self):
+        """把所有标记展开为以日期为索引的表，便于检查或与其它特征拼接。"""
+        frame = pd.DataFrame({f'是否{kind}': flag for kind, flag in self.flags.items()}, index=self.dates)
+        frame['事件'] = self.event_labels()
+        return frame
+
+
+def calendar_index(dates, file_path=CALENDAR_FILE):
+    """
+    为日期轴构建 CalendarIndex，按日期轴内容和日历表文件缓存。
+
+    参数:
+    dates (array-like): 升序的日期轴（例如 SalesMatrix.dates）。
+    file_path (str): 日历表 CSV 文件路径。
+
+    返回:
+    CalendarIndex: 与日期轴对齐的标记。
+    """
+    dates = pd.DatetimeIndex(dates)
+    stat = os.stat(file_path)
+    key = (data_hash(dates.to_numpy(dtype='datetime64[ns]')), file_path, stat.st_mtime_ns, stat.st_size)
+    index = _calendar_cache.get(key)
+    if index is None:
+        index = CalendarIndex(dates, load_calendar_table(file_path))
+        _calendar_cache.put(key, index)
+    return index
+
+
+def row_day_mask(row_dates, exclude=DEFAULT_EXCLUDE, include=None, file_path=CALENDAR_FILE):
+    """
+    为长表的逐行日期计算保留标记：先在去重后的日期轴上计算，再按逆索引展开。
+
+    参数:
+    row_dates (array-like): 每行的日期（可重复、可无序）。
+    exclude / include: 含义同 CalendarIndex.day_mask。
+
+    返回:
+    np.ndarray: 与 row_dates 等长的布尔数组，True 表示保留该行。
+    """
+    row_days = pd.to_datetime(pd.Series(row_dates)).dt.normalize().to_numpy()
+    unique_days, inverse = np.unique(row_days, return_inverse=True)
+    keep = calendar_index(unique_days, file_path).day_mask(exclude, include)
+    return keep[inverse]
+
+
+def exclude_days(matrix, exclude=DEFAULT_EXCLUDE, include=None, file_path=CALENDAR_FILE):
+    """
+    把指定类型的日期从 SalesMatrix 的 mask 中去掉（销量值保持不变）。
+
+    基于 mask 的计算（masked_values、月份×星期几透视、异常检测、分解、互相关等）
+    随后都会自动跳过这些日期。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×单品 矩阵。
+    exclude / include: 含义同 CalendarIndex.day_mask。
+
+    返回:
+    SalesMatrix: mask 更新后的新矩阵。
+    """
+    keep = calendar_index(matrix.dates, file_path).day_mask(exclude, include)
+    if matrix.mask is None:
+        mask = np.repeat(keep[:, None], matrix.shape[1], axis=1)
+    else:
+        mask = matrix.mask & keep[:, None]
+    return SalesMatrix(matrix.values, matrix.dates, matrix.items, mask)
@@ -0,0 +1,253 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import WEEKDAY_NAMES
+from sales_ledger import LEDGER_COLUMNS, sales_components
+
+# 日内分析需要额外读取的扫码时间列（格式如 09:15:07.924）
+SCAN_TIME_COL = '扫码销售时间'
+INTRADAY_LEDGER_COLUMNS = [*LEDGER_COLUMNS, SCAN_TIME_COL]
+
+# 默认的时段长度（分钟）
+BUCKET_MINUTES = 60
+
+
+def time_buckets(scan_times, bucket_minutes=BUCKET_MINUTES):
+    """
+    把扫码时间向量化地转换为时段编号（0 点起每 bucket_minutes 分钟一个时段）。
+
+    参数:
+    scan_times (array-like): 扫码时间，字符串 'HH:MM:SS.fff' 或 datetime.time。
+    bucket_minutes (int): 时段长度，必须能整除 1440。
+
+    返回:
+    np.ndarray: int64 时段编号，无法解析的时间为 -1。
+    """
+    if 1440 % bucket_minutes != 0:
+        raise ValueError(f"bucket_minutes 必须能整除 1440，当前为 {bucket_minutes}")
+    offsets = pd.to_timedelta(pd.Series(scan_times).astype(str), errors='coerce')
+    minutes = (offsets // pd.Timedelta(minutes=1)).to_numpy(dtype=np.float64)
+    buckets = np.where(np.isnan(minutes), -1, minutes // bucket_minutes)
+    return buckets.astype(np.int64)
+
+
+class IntradayCube:
+    """
+    日期×时段×实体 的日内销量数组。
+
+    流水只扫描一次就汇总到这个紧凑数组中，之后的日内曲线、星期几×时段热力图
+    都是对数组的切片和求和，不需要重新读取附件2。
+
+    属性:
+    dates (pd.DatetimeIndex): 连续的日历日期轴。
+    entities (pd.Index): 实体（品类或单品名称）轴。
+    bucket_minutes (int): 时段长度（分钟）。
+    volume (np.ndarray): (日期数, 时段数, 实体数) 的 float32 销量（千克）。
+    transactions (np.ndarray): 同形状的 int32 流水条数。
+    """
+
+    def __init__(self, dates, entities, bucket_minutes, volume, transactions):
+        self.dates = pd.DatetimeIndex(dates)
+        self.entities = pd.Index(entities)
+        self.bucket_minutes = int(bucket_minutes)
+        self.volume = np.asarray(volume, dtype=np.float32)
+        self.transactions = np.asarray(transactions, dtype=np.int32)
+        expected = (len(self.dates), 1440 // self.bucket_minutes, len(self.entities))
+        if self.volume.shape != expected or self.transactions.shape != expected:
+            raise ValueError(f"数组形状 {self.volume.shape} 与坐标轴长度 {expected} 不一致")
+
+    def __repr__(self):
+        return (f"IntradayCube({len(self.dates)} 天 × {self.volume.shape[1]} 个{self.bucket_minutes}分钟时段 × "
+                f"{len(self.entities)} 个实体)")
+
+    def bucket_labels(self):
+        """各时段的起始时间标签，例如 '09:00'。"""
+        starts = np.arange(self.volume.shape[1]) * self.bucket_minutes
+        return [f'{m // 60:02d}:{m % 60:02d}' for m in starts]
+
+    def active_buckets(self):
+        """有任何销量的时段位置（营业时间），用于绘图时去掉夜间的空时段。"""
+        active = np.flatnonzero(self.transactions.sum(axis=(0, 2)) > 0)
+        if len(active) == 0:
+            return np.arange(0)
+        return np.arange(active[0], active[-1] + 1)
+
+    def resample(self, bucket_minutes):
+        """把时段合并为更长的 bucket_minutes（必须是当前时段长度的整数倍），例如合并为小时。"""
+        if bucket_minutes % self.bucket_minutes != 0 or 1440 % bucket_minutes != 0:
+            raise ValueError(f"无法把 {self.bucket_minutes} 分钟时段合并为 {bucket_minutes} 分钟")
+        factor = bucket_minutes // self.bucket_minutes
+        n_dates, n_buckets, n_entities = self.volume.shape
+        shape = (n_dates, n_buckets // factor, factor, n_entities)
+        return IntradayCube(self.dates, self.entities, bucket_minutes,
+                            self.volume.reshape(shape).sum(axis=2),
+                            self.transactions.reshape(shape).sum(axis=2))
+
+    def _day_selection(self, weekday=None, day_mask=None):
+        keep = np.ones(len(self.dates), dtype=bool)
+        if weekday is not None:
+            keep &= self.dates.dayofweek.to_numpy() == weekday
+        if day_mask is not None:
+            keep &= np.asarray(day_mask, dtype=bool)
+        return keep
+
+    def profile(self, weekday=None, day_mask=None, normalize=True):
+        """
+        各实体的日内销量曲线。
+
+        参数:
+        weekday (int 或 None): 只统计某个星期几（0=周一）。
+        day_mask (np.ndarray 或 None): 与 dates 对齐的布尔数组，例如
+                                       calendar_index(cube.dates).day_mask() 剔除节假日。
+        normalize (bool): 为 True 时输出各时段销量占全天的比例，否则输出日均销量（千克）。
+
+        返回:
+        pd.DataFrame: 行为时段标签，列为实体。
+        """
+        keep = self._day_selection(weekday, day_mask)
+        totals = self.volume[keep].sum(axis=0, dtype=np.float64)
+        if normalize:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = totals / totals.sum(axis=0, keepdims=True)
+        else:
+            values = totals / max(int(keep.sum()), 1)
+        return pd.DataFrame(values, index=self.bucket_labels(), columns=self.entities)
+
+    def weekday_table(self, entity, day_mask=None, normalize=True):
+        """
+        单个实体的 星期几×时段 表，用于热力图。
+
+        返回:
+        np.ndarray: 形状为 (7, 时段数) 的数组，normalize=True 时每行为各时段占当天销量的比例。
+        """
+        col = self.entities.get_loc(entity)
+        keep = self._day_selection(day_mask=day_mask)
+        volume = self.volume[keep, :, col].astype(np.float64)
+        weekday = self.dates.dayofweek.to_numpy()[keep]
+        table = np.zeros((7, volume.shape[1]))
+        np.add.at(table, weekday, volume)
+        if normalize:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                table = table / table.sum(axis=1, keepdims=True)
+        else:
+            table = table / np.maximum(np.bincount(weekday, minlength=7), 1)[:, None]
+        return table
+
+    def save(self, file_path):
+        """保存为 .npz 文件。"""
+        np.savez_compressed(
+            file_path,
+            dates=self.dates.to_numpy(dtype='datetime64[ns]').view(np.int64),
+            entities=np.asarray(self.entities, dtype=str),
+            bucket_minutes=np.int64(self.bucket_minutes),
+            volume=self.volume,
+            transactions=self.transactions,
+        )
+
+    @classmethod
+    def load(cls, file_path):
+        """从 save 生成的 .npz 文件读取。"""
+        with np.load(file_path) as data:
+            return cls(pd.DatetimeIndex(data['dates'].view('datetime64[ns]')), data['entities'],
+                       int(data['bucket_minutes']), data['volume'], data['transactions'])
+
+
+def build_intraday_cube(ledger, master, level='category', bucket_minutes=BUCKET_MINUTES):
+    """
+    一次扫描流水，把每条销售按 (日期, 时段, 实体) 用 bincount 累加为 IntradayCube。
+
+    只统计销售流水的销量（退货不计入日内需求，见 sales_components）。
+
+    参数:
+    ledger (pd.DataFrame): 含扫码销售时间的流水表（load_ledger(columns=INTRADAY_LEDGER_COLUMNS)）。
+    master (ProductMaster): 商品主数据，用于把单品编码映射为品类或单品名称。
+    level (str): 'category' 按品类名称汇总，'sku' 按单品名称汇总。
+    bucket_minutes (int): 时段长度（分钟）。
+
+    返回:
+    IntradayCube: 日内销量数组。
+    """
+    codes = ledger['单品编码'].to_numpy()
+    if level == 'category':
+        labels = master.category_names_for(codes, missing='未知')
+    elif level == 'sku':
+        labels = master.names_for(codes, missing='未知')
+    else:
+        raise ValueError(f"不支持的汇总级别: {level}，可选 'sku' 或 'category'")
+
+    buckets = time_buckets(ledger[SCAN_TIME_COL], bucket_minutes)
+    valid = buckets >= 0
+    if not valid.all():
+        print(f"警告：{int((~valid).sum())} 条流水的扫码时间无法解析，已跳过")
+
+    entity_codes, entities = pd.factorize(pd.Series(labels)[valid], sort=True)
+    days = pd.DatetimeIndex(ledger['销售日期'][valid])
+    calendar = pd.date_range(days.min(), days.max(), freq='D')
+    day_codes = ((days - calendar[0]) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+
+    n_buckets = 1440 // bucket_minutes
+    shape = (len(calendar), n_buckets, len(entities))
+    flat_idx = (day_codes * n_buckets + buckets[valid]) * len(entities) + entity_codes
+    quantity = sales_components(ledger)['销量(千克)'].to_numpy()[valid]
+    size = int(np.prod(shape))
+    volume = np.bincount(flat_idx, weights=quantity, minlength=size).reshape(shape)
+    transactions = np.bincount(flat_idx[quantity > 0], minlength=size).reshape(shape)
+    return IntradayCube(calendar, entities, bucket_minutes, volume, transactions)
+
+
+def save_intraday_heatmaps(cube, output_folder='.', entities=None, dpi=100, day_mask=None):
+    """
+    为每个实体保存 星期几×时段 的日内销量占比热力图（复用同一个 HeatmapTemplate）。
+
+    参数:
+    cube (IntradayCube): 日内销量数组。
+    output_folder (str): 保存图片的文件夹。
+    entities (list 或 None): 需要绘制的实体，为 None 时绘制全部。
+    dpi (int): 输出分辨率。
+    day_mask (np.ndarray 或 None): 与 cube.dates 对齐的布尔数组，含义同 IntradayCube.profile。
+
+    返回:
+    list: 保存的图片路径。
+    """
+    from plotting import HeatmapTemplate, get_pyplot, get_template
+
+    get_pyplot('Agg')
+    columns = cube.active_buckets()
+    labels = cube.bucket_labels()
+    template = get_template(
+        HeatmapTemplate,
+        row_labels=tuple(WEEKDAY_NAMES),
+        col_labels=tuple(labels[i] for i in columns),
+        cbar_label='占当天销量比例 (%)',
+        xlabel='时段',
+        ylabel='星期几',
+        figsize=(max(12, len(columns) * 0.9), 6),
+        cmap='YlOrRd',
+    )
+    os.makedirs(output_folder, exist_ok=True)
+    saved = []
+    for entity in (cube.entities if entities is None else entities):
+        table = cube.weekday_table(entity, day_mask=day_mask)[:, columns] * 100
+        template.update(table, f'{entity} 日内销量分布（星期几×时段）', fmt='{:.0f}')
+        output_path = os.path.join(output_folder, f'{entity}_日内销量热力图.png')
+        template.save(output_path, dpi=dpi)
+        saved.append(output_path)
+    return saved
+
+
+if __name__ == '__main__':
+    from product_master import load_product_master
+    from sales_ledger import load_ledger
+
+    master = load_product_master()
+    ledger = load_ledger('附件2.xlsx', columns=INTRADAY_LEDGER_COLUMNS)
+    category_cube = build_intraday_cube(ledger, master, level='category')
+    category_cube.save('intraday_category.npz')
+    print(category_cube)
+    print("\n各品类日内销量占比（%）:")
+    print((category_cube.profile().iloc[category_cube.active_buckets()] * 100).round(1).to_string())
+
+    saved = save_intraday_heatmaps(category_cube, output_folder='日内销量热力图')
+    print(f"\n已保存 {len(saved)} 张日内销量热力图到 '日内销量热力图' 文件夹。")
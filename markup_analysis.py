@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from wholesale_prices import PRICE_COL, load_price_matrix
+
+UNIT_PRICE_COL = '销售单价(元/千克)'
+MARKUP_COL = '加成率'
+
+
+def wholesale_lookup(price_matrix, dates, codes):
+    """
+    按 (日期, 单品编码) 逐行查找批发价格，用稠密下标直接取值，不做表合并。
+
+    日期下标 = 与价格矩阵首日相差的天数，单品下标由升序编码轴二分查找得到；
+    价格矩阵已前向填充，当天没有报价时取最近一次报价。
+
+    参数:
+    price_matrix (PriceMatrix): 批发价格矩阵。
+    dates (array-like): 每行的销售日期。
+    codes (array-like): 每行的整数单品编码。
+
+    返回:
+    np.ndarray: 与输入等长的 float64 批发价格，日期超出范围、编码不在附件3中或尚未报价的行为 NaN。
+    """
+    days = pd.DatetimeIndex(pd.to_datetime(np.asarray(dates))).normalize()
+    date_pos = ((days - price_matrix.dates[0]) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+    codes = np.asarray(codes, dtype=np.int64)
+    code_axis = price_matrix.codes.to_numpy()
+    code_pos = np.minimum(np.searchsorted(code_axis, codes), len(code_axis) - 1)
+
+    valid = (date_pos >= 0) & (date_pos < len(price_matrix.dates)) & (code_axis[code_pos] == codes)
+    prices = np.full(len(codes), np.nan)
+    prices[valid] = price_matrix.prices[date_pos[valid], code_pos[valid]]
+    return prices
+
+
+def attach_markup(ledger, price_matrix=None):
+    """
+    为每条流水附加当天的批发价格和加成率（销售单价 / 批发价格 - 1）。
+
+    参数:
+    ledger (pd.DataFrame): 含 销售日期、单品编码、销量(千克)、销售单价(元/千克) 的流水表。
+    price_matrix (PriceMatrix 或 None): 批发价格矩阵，为 None 时读取附件3。
+
+    返回:
+    pd.DataFrame: 增加了 批发价格(元/千克)、加成率、销售金额、批发金额 列的新表。
+    """
+    if price_matrix is None:
+        price_matrix = load_price_matrix()
+    result = ledger.copy()
+    wholesale = wholesale_lookup(price_matrix, result['销售日期'], result['单品编码'])
+    unit_price = result[UNIT_PRICE_COL].to_numpy(dtype=np.float64)
+    quantity = result['销量(千克)'].to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result[PRICE_COL] = wholesale
+        result[MARKUP_COL] = unit_price / wholesale - 1
+    result['销售金额'] = unit_price * quantity
+    result['批发金额'] = wholesale * quantity
+
+    missing = int(np.isnan(wholesale).sum())
+    if missing:
+        print(f"警告：{missing} 条流水在附件3中找不到批发价格，加成率记为缺失")
+    return result
+
+
+def _group_quantiles(groups, values, n_groups, quantiles):
+    """
+    对每个分组计算若干分位数（线性插值，与 np.quantile 默认口径一致）。
+
+    先按 (分组, 数值) 一次排序，再由每组的起始位置和长度直接算出分位点下标，
+    不需要对每个分组单独调用 np.quantile。
+
+    返回:
+    np.ndarray: 形状为 (分组数, 分位数个数) 的数组，空分组为 NaN。
+    """
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    has_data = counts > 0
+    for j, q in enumerate(quantiles):
+        position = q * (counts[has_data] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, counts[has_data] - 1)
+        frac = position - lower
+        base = starts[has_data]
+        result[has_data, j] = (sorted_values[base + lower] * (1 - frac)
+                               + sorted_values[base + upper] * frac)
+    return result
+
+
+def daily_markup_distribution(ledger, master=None, level='category', quantiles=(0.1, 0.5, 0.9)):
+    """
+    按天、按品类（或单品）汇总加成率分布。
+
+    综合加成率 = Σ销售金额 / Σ批发金额 - 1（按销量加权，退货同时冲减两项）；
+    分位数只基于销量为正、且能找到批发价格的流水。
+
+    参数:
+    ledger (pd.DataFrame): attach_markup 返回的流水表。
+    master (ProductMaster 或 None): level='category' 时用于把单品编码映射为分类编码。
+    level (str): 'category' 或 'sku'。
+    quantiles (tuple): 需要输出的分位数。
+
+    返回:
+    pd.DataFrame: 列为 销售日期、分类编码/单品编码、加成率、各分位数列（如 加成率P50）和 流水条数。
+    """
+    if level == 'sku':
+        key_col = '单品编码'
+        keys = ledger[key_col].to_numpy(dtype=np.int64)
+    elif level == 'category':
+        if master is None:
+            raise ValueError("按品类汇总需要提供商品主数据 master")
+        key_col = '分类编码'
+        keys = master.category_codes_for(ledger['单品编码'].to_numpy())
+    else:
+        raise ValueError(f"不支持的汇总级别: {level}，可选 'sku' 或 'category'")
+
+    # (日期, 键) 组合编码为一个整数分组号
+    day_codes, days = pd.factorize(ledger['销售日期'], sort=True)
+    key_codes, key_values = pd.factorize(keys, sort=True)
+    pair = day_codes.astype(np.int64) * len(key_values) + key_codes
+    groups, pair_values = pd.factorize(pair, sort=True)
+    n_groups = len(pair_values)
+
+    wholesale = ledger[PRICE_COL].to_numpy(dtype=np.float64)
+    priced = ~np.isnan(wholesale)
+    revenue = np.bincount(groups[priced], weights=ledger['销售金额'].to_numpy()[priced], minlength=n_groups)
+    cost = np.bincount(groups[priced], weights=ledger['批发金额'].to_numpy()[priced], minlength=n_groups)
+
+    sold = priced & (ledger['销量(千克)'].to_numpy() > 0)
+    markup = ledger[MARKUP_COL].to_numpy(dtype=np.float64)
+    quantile_values = _group_quantiles(groups[sold], markup[sold], n_groups, quantiles)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        overall = np.where(cost > 0, revenue / cost - 1, np.nan)
+    result = pd.DataFrame({
+        '销售日期': days[pair_values // len(key_values)],
+        key_col: key_values[pair_values % len(key_values)],
+        MARKUP_COL: overall,
+    })
+    for j, q in enumerate(quantiles):
+        result[f'{MARKUP_COL}P{round(q * 100)}'] = quantile_values[:, j]
+    result['流水条数'] = np.bincount(groups, minlength=n_groups)
+    return result
+
+
+if __name__ == '__main__':
+    from product_master import load_product_master
+    from sales_ledger import load_ledger
+
+    master = load_product_master()
+    ledger = attach_markup(load_ledger('附件2.xlsx'))
+    category_markup = daily_markup_distribution(ledger, master, level='category')
+    category_markup['分类名称'] = category_markup['分类编码'].map(master.category_name_map())
+    category_markup.to_excel('daily_category_markup.xlsx', index=False)
+    print("各品类每日加成率分布（部分）：")
+    print(category_markup.head(12).round(3).to_string(index=False))
+    print("\n品类每日加成率已保存到 'daily_category_markup.xlsx'。")
@@ -0,0 +1,350 @@
+import glob
+import os
+import sys
+
+import numpy as np
+
+# matplotlib 和 seaborn 的导入开销远大于 numpy/pandas（实测约1.3秒，numpy+pandas 约0.4秒），
+# 只打印统计结果的任务不需要它们。各分析脚本通过下面的函数在真正绘图时才导入。
+_pyplot = None
+_seaborn = None
+
+# 中文字体候选，按优先级排列：Windows 的黑体/微软雅黑，Linux 的思源/Noto/文泉驿，macOS 的苹方/华文黑体
+CJK_FONT_CANDIDATES = [
+    'SimHei', 'Microsoft YaHei',
+    'Noto Sans CJK SC', 'Noto Sans SC', 'Source Han Sans SC', 'Source Han Sans CN',
+    'WenQuanYi Micro Hei', 'WenQuanYi Zen Hei',
+    'PingFang SC', 'Heiti SC', 'STHeiti', 'Arial Unicode MS',
+]
+
+# 项目本身不附带字体文件。系统中没有上面的候选字体时（例如 Linux 服务器上没有 SimHei），
+# 可以自行把中文字体文件（.ttf/.otf/.ttc，例如 Noto Sans CJK SC）放到 fonts 文件夹中，
+# 或用环境变量 CJK_FONT_PATH 指定字体文件（多个用路径分隔符分开）。
+FONT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+
+_resolved_font = None
+_templates = {}
+
+
+def _user_font_files():
+    paths = []
+    for pattern in ('*.ttf', '*.otf', '*.ttc'):
+        paths.extend(sorted(glob.glob(os.path.join(FONT_FOLDER, pattern))))
+    paths.extend(path for path in os.environ.get('CJK_FONT_PATH', '').split(os.pathsep) if path)
+    return paths
+
+
+def resolve_cjk_font():
+    """
+    解析可用的中文字体名称，每个进程只解析一次。
+
+    先在系统字体中按 CJK_FONT_CANDIDATES 的顺序查找，找不到时注册并使用 fonts 文件夹
+    或 CJK_FONT_PATH 中由用户提供的字体文件。
+
+    返回:
+    str 或 None: 字体名称；没有任何可用的中文字体时返回 None（图中的中文会显示为方框）。
+    """
+    global _resolved_font
+    if _resolved_font is None:
+        from matplotlib import font_manager
+
+        available = {font.name for font in font_manager.fontManager.ttflist}
+        chosen = next((name for name in CJK_FONT_CANDIDATES if name in available), None)
+        if chosen is None:
+            for path in _user_font_files():
+                try:
+                    font_manager.fontManager.addfont(path)
+                    chosen = font_manager.FontProperties(fname=path).get_name()
+                    break
+                except (OSError, RuntimeError) as e:
+                    print(f"无法加载字体文件 '{path}': {e}")
+        if chosen is None:
+            print(f"警告：没有找到中文字体，中文会显示为方框。请安装 SimHei 等字体，"
+                  f"或把中文字体文件放到 '{FONT_FOLDER}'，或用环境变量 CJK_FONT_PATH 指定。")
+        _resolved_font = chosen or ''
+    return _resolved_font or None
+
+
+def configure_fonts(rc):
+    """
+    设置中文字体和负号显示。
+
+    只把实际存在的字体写入 font.sans-serif，避免 matplotlib 在每次绘制文字时
+    都去查找不存在的 SimHei 并输出 findfont 警告。
+    """
+    font = resolve_cjk_font()
+    rc['font.sans-serif'] = ([font] if font else []) + ['DejaVu Sans']
+    rc['axes.unicode_minus'] = False
+
+
+def get_pyplot(backend=None):
+    """
+    返回 matplotlib.pyplot，首次调用时才导入并设置中文字体。
+
+    参数:
+    backend (str 或 None): 首次导入时使用的后端，例如批量出图的工作进程使用 'Agg'；
+                           为 None 时使用 matplotlib 的默认后端（或 MPLBACKEND 环境变量）。
+
+    返回:
+    module: matplotlib.pyplot。
+    """
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        if backend is not None:
+            matplotlib.use(backend)
+        import matplotlib.pyplot as plt
+        configure_fonts(plt.rcParams)
+        _pyplot = plt
+    return _pyplot
+
+
+def get_seaborn():
+    """返回 seaborn，首次调用时才导入（seaborn 会连带导入 pyplot，因此先设置字体）。"""
+    global _seaborn
+    if _seaborn is None:
+        get_pyplot()
+        import seaborn as sns
+        _seaborn = sns
+    return _seaborn
+
+
+def plotting_loaded():
+    """当前进程是否已经导入了 matplotlib，便于检查纯统计任务没有加载绘图依赖。"""
+    return 'matplotlib' in sys.modules
+
+
+class FigureTemplate:
+    """
+    可复用的图形模板。
+
+    子类在 _build 中创建图形、坐标轴和需要更新的艺术家对象（线、文字、图像等），
+    之后每张图只在 update 中通过 set_data / set_text / set_clim 修改数据再保存，
+    不重新创建坐标轴，版面也只在第一次保存前计算一次。
+
+    参数:
+    figsize (tuple): 图形尺寸（英寸）。
+    """
+
+    def __init__(self, figsize):
+        self.figsize = figsize
+        self.figure = None
+        self._laid_out = False
+        self._build_figure()
+
+    def _build_figure(self):
+        plt = get_pyplot()
+        self.figure = plt.figure(figsize=self.figsize)
+        self._laid_out = False
+        self._build(self.figure)
+
+    def _build(self, figure):
+        raise NotImplementedError
+
+    def ensure_open(self):
+        """图形窗口被关闭（pyplot 已销毁该图形）后重新创建。"""
+        if not get_pyplot().fignum_exists(self.figure.number):
+            self._build_figure()
+
+    def save(self, output_path, dpi=100):
+        """保存当前内容；第一次保存前按当前内容排版一次，之后复用同一版面。"""
+        if not self._laid_out:
+            # 直接执行一次紧凑排版：figure.tight_layout() 会在图形上留下占位的布局引擎，
+            # 而 savefig 见到布局引擎就会在保存前额外完整绘制一遍
+            from matplotlib.layout_engine import TightLayoutEngine
+            TightLayoutEngine().execute(self.figure)
+            self._laid_out = True
+        self.figure.savefig(output_path, dpi=dpi)
+
+
+def get_template(template_class, **layout):
+    """
+    返回指定类型和版面参数的模板，同一进程内相同参数的模板只创建一次。
+
+    参数:
+    template_class (type): FigureTemplate 的子类。
+    **layout: 传给模板构造函数的版面参数（必须可哈希）。
+
+    返回:
+    FigureTemplate: 模板实例。
+    """
+    key = (template_class, tuple(sorted(layout.items())))
+    template = _templates.get(key)
+    if template is None:
+        template = template_class(**layout)
+        _templates[key] = template
+    else:
+        template.ensure_open()
+    return template
+
+
+def clear_templates():
+    """关闭并丢弃所有模板。"""
+    plt = get_pyplot()
+    for template in _templates.values():
+        plt.close(template.figure)
+    _templates.clear()
+
+
+# ACF/PACF 图上标记的周期：(滞后天数, 颜色, 图例)
+PERIOD_MARKERS = [(7, 'orange', '周循环(7天)'), (30, 'green', '月循环(30天)'), (90, 'purple', '季度循环(90天)')]
+
+
+class CorrelogramGridTemplate(FigureTemplate):
+    """
+    n_rows×2 的 ACF/PACF 网格模板（左列ACF，右列PACF），每个子图包含火柴杆、
+    零线、±置信区间线和周期标记线。
+
+    参数:
+    n_rows (int): 行数（分析周期的个数）。
+    figsize (tuple): 图形尺寸。
+    """
+
+    def __init__(self, n_rows=4, figsize=(16, 20)):
+        self.n_rows = n_rows
+        super().__init__(figsize)
+
+    def _build(self, figure):
+        axes = figure.subplots(self.n_rows, 2, squeeze=False)
+        self.suptitle = figure.suptitle('', fontsize=18, fontweight='bold', y=0.98)
+        self.panels = []
+        for row in range(self.n_rows):
+            for col, ylabel in enumerate(['自相关系数', '偏自相关系数']):
+                ax = axes[row, col]
+                stem = ax.stem([0], [0], basefmt=' ')
+                ax.axhline(y=0, color='black', linestyle='-', alpha=0.5)
+                upper = ax.axhline(y=0, color='red', linestyle='--', alpha=0.7, label='95% 置信区间')
+                lower = ax.axhline(y=0, color='red', linestyle='--', alpha=0.7)
+                markers = [ax.axvline(x=lag, color=color, linestyle=':', alpha=0.8, linewidth=2, label=label)
+                           for lag, color, label in PERIOD_MARKERS]
+                ax.set_xlabel('滞后期')
+                ax.set_ylabel(ylabel)
+                ax.grid(True, alpha=0.3)
+                self.panels.append({'ax': ax, 'stem': stem, 'bounds': (upper, lower), 'markers': markers})
+
+    def update(self, title, rows, conf_bound):
+        """
+        更新所有子图的数据。
+
+        参数:
+        title (str): 总标题。
+        rows (list): 每行一个 (ACF标题, ACF值, PACF标题, PACF值)，值的下标即滞后期。
+        conf_bound (float): 置信区间半宽。
+        """
+        self.suptitle.set_text(title)
+        flat = []
+        for acf_title, acf_values, pacf_title, pacf_values in rows:
+            flat.extend([(acf_title, acf_values), (pacf_title, pacf_values)])
+        for panel, (panel_title, values) in zip(self.panels, flat):
+            values = np.asarray(values, dtype=np.float64)
+            lags = np.arange(len(values))
+            max_lag = max(len(values) - 1, 1)
+            ax = panel['ax']
+
+            markerline, stemlines, _ = panel['stem']
+            markerline.set_data(lags, values)
+            stemlines.set_segments(np.stack([np.column_stack([lags, np.zeros_like(values)]),
+                                             np.column_stack([lags, values])], axis=1))
+            panel['bounds'][0].set_ydata([conf_bound, conf_bound])
+            panel['bounds'][1].set_ydata([-conf_bound, -conf_bound])
+
+            handles = [panel['bounds'][0]]
+            for line, (lag, _, _) in zip(panel['markers'], PERIOD_MARKERS):
+                line.set_visible(max_lag >= lag)
+                if max_lag >= lag:
+                    handles.append(line)
+
+            ax.set_title(panel_title, fontweight='bold')
+            margin = 0.05 * max_lag
+            ax.set_xlim(-margin, max_lag + margin)
+            low = min(np.nanmin(values), -conf_bound)
+            high = max(np.nanmax(values), conf_bound)
+            pad = 0.05 * (high - low)
+            ax.set_ylim(low - pad, high + pad)
+            ax.legend(handles=handles)
+
+
+class HeatmapTemplate(FigureTemplate):
+    """
+    固定行列标签的带数值标注热力图模板（替代逐张调用 seaborn.heatmap）。
+
+    参数:
+    row_labels (tuple): 行标签。
+    col_labels (tuple): 列标签。
+    annot (bool): 是否在单元格上标注数值。
+    cbar_label (str): 色阶条标签。
+    xlabel / ylabel (str): 坐标轴标签。
+    figsize (tuple): 图形尺寸。
+    cmap (str): 色阶。
+    """
+
+    def __init__(self, row_labels, col_labels, annot=True, cbar_label='', xlabel='', ylabel='',
+                 figsize=(12, 8), cmap='coolwarm'):
+        self.row_labels = row_labels
+        self.col_labels = col_labels
+        self.annot = annot
+        self.cbar_label = cbar_label
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.cmap = cmap
+        super().__init__(figsize)
+
+    def _build(self, figure):
+        n_rows, n_cols = len(self.row_labels), len(self.col_labels)
+        ax = figure.add_subplot()
+        self.ax = ax
+        # 单元格之间的白色分隔线由网格自身的边线绘制，与 seaborn 的 linewidths 一致
+        self.image = ax.pcolormesh(np.zeros((n_rows, n_cols)), cmap=self.cmap,
+                                   edgecolors='white', linewidth=0.5)
+        self.image.get_cmap().set_bad('white')
+        figure.colorbar(self.image, ax=ax, label=self.cbar_label)
+
+        ax.set_xlim(0, n_cols)
+        ax.set_ylim(n_rows, 0)
+        ax.set_xticks(np.arange(n_cols) + 0.5, labels=list(self.col_labels))
+        ax.set_yticks(np.arange(n_rows) + 0.5, labels=list(self.row_labels))
+        ax.tick_params(length=0)
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+        ax.set_xlabel(self.xlabel, fontsize=12)
+        ax.set_ylabel(self.ylabel, fontsize=12)
+        self.title = ax.set_title('', fontsize=18)
+
+        self.texts = None
+        if self.annot:
+            self.texts = [[ax.text(j + 0.5, i + 0.5, '', ha='center', va='center', fontsize=10)
+                           for j in range(n_cols)]
+                          for i in range(n_rows)]
+
+    def update(self, table, title, fmt='{:.1f}', vmin=None, vmax=None):
+        """
+        更新热力图数据，NaN 单元格显示为空白。
+
+        参数:
+        table (np.ndarray): 形状为 (行数, 列数) 的数值。
+        title (str): 标题。
+        fmt (str): 标注数值的格式。
+        vmin / vmax (float 或 None): 色阶范围，为 None 时取数据的最小/最大值。
+        """
+        table = np.asarray(table, dtype=np.float64)
+        valid = ~np.isnan(table)
+        if vmin is None:
+            vmin = np.nanmin(table) if valid.any() else 0.0
+        if vmax is None:
+            vmax = np.nanmax(table) if valid.any() else 1.0
+        self.image.set_array(np.ma.masked_invalid(table))
+        self.image.set_clim(vmin, vmax)
+        self.title.set_text(title)
+
+        if self.texts is not None:
+            # 深色单元格用白字，浅色单元格用深灰字（相对亮度阈值与 seaborn 相同）
+            rgb = self.image.to_rgba(np.nan_to_num(table, nan=vmin))[..., :3]
+            rgb = np.where(rgb <= 0.03928, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+            luminance = rgb @ np.array([0.2126, 0.7152, 0.0722])
+            for i, row in enumerate(self.texts):
+                for j, text in enumerate(row):
+                    if valid[i, j]:
+                        text.set_text(fmt.format(table[i, j]))
+                        text.set_color('.15' if luminance[i, j] > 0.408 else 'w')
+                    else:
+                        text.set_text('')
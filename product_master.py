@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+class ProductMaster:
+    """
+    以整数单品编码为索引的商品主数据（附件1）。
+
+    单品编码按升序存放在 codes 中，其余属性是与之对齐的数组，
+    查找时用 np.searchsorted 二分定位，不需要按字符串合并表格。
+    交易流水只保留整数编码，名称和品类在展示时再通过 attach_names 附加。
+
+    属性:
+    codes (np.ndarray): 升序的单品编码 (int64)。
+    names (np.ndarray): 单品名称。
+    category_codes (np.ndarray): 分类编码 (int64)。
+    category_names (np.ndarray): 分类名称。
+    """
+
+    def __init__(self, codes, names, category_codes, category_names):
+        codes = np.asarray(codes, dtype=np.int64)
+        order = np.argsort(codes, kind='stable')
+        self.codes = codes[order]
+        self.names = np.asarray(names, dtype=object)[order]
+        self.category_codes = np.asarray(category_codes, dtype=np.int64)[order]
+        self.category_names = np.asarray(category_names, dtype=object)[order]
+        if len(self.codes) > 1 and (np.diff(self.codes) == 0).any():
+            raise ValueError("附件1中存在重复的单品编码")
+
+    def __len__(self):
+        return len(self.codes)
+
+    def positions(self, codes):
+        """
+        返回单品编码在主数据中的位置，主数据中不存在的编码返回 -1。
+
+        参数:
+        codes (array-like): 单品编码。
+
+        返回:
+        np.ndarray: int64 位置数组。
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        pos = np.searchsorted(self.codes, codes)
+        pos_clipped = np.minimum(pos, len(self.codes) - 1)
+        found = self.codes[pos_clipped] == codes
+        return np.where(found, pos_clipped, -1)
+
+    def _take(self, array, codes, missing):
+        pos = self.positions(codes)
+        result = array[np.maximum(pos, 0)]
+        if (pos < 0).any():
+            result = result.astype(object)
+            result[pos < 0] = missing
+        return result
+
+    def names_for(self, codes, missing=None):
+        """按单品编码查找单品名称。"""
+        return self._take(self.names, codes, missing)
+
+    def category_names_for(self, codes, missing=None):
+        """按单品编码查找分类名称。"""
+        return self._take(self.category_names, codes, missing)
+
+    def category_codes_for(self, codes, missing=-1):
+        """按单品编码查找分类编码。"""
+        return self._take(self.category_codes, codes, missing).astype(np.int64)
+
+    def category_name_map(self):
+        """分类编码 -> 分类名称 的字典。"""
+        return dict(zip(self.category_codes.tolist(), self.category_names.tolist()))
+
+    def attach_names(self, df, code_col='单品编码', name_col='单品名称', category_col='分类名称'):
+        """
+        在展示前为结果表附加单品名称和分类名称。
+
+        参数:
+        df (pd.DataFrame): 含有整数单品编码列的表（通常是聚合后的小表）。
+        name_col / category_col (str 或 None): 附加的列名，为 None 时不附加该列。
+
+        返回:
+        pd.DataFrame: 附加了名称列的新表。
+        """
+        result = df.copy()
+        codes = result[code_col].to_numpy()
+        if name_col is not None:
+            result[name_col] = self.names_for(codes)
+        if category_col is not None:
+            result[category_col] = self.category_names_for(codes)
+        return result
+
+
+def load_product_master(file_path='附件1.xlsx'):
+    """
+    读取附件1并构建 ProductMaster。
+
+    参数:
+    file_path (str): 附件1的路径。
+
+    返回:
+    ProductMaster: 商品主数据。
+    """
+    df = pd.read_excel(file_path, dtype={'单品编码': np.int64, '分类编码': np.int64})
+    master = ProductMaster(df['单品编码'], df['单品名称'], df['分类编码'], df['分类名称'])
+    print(f"已加载商品主数据: {len(master)} 个单品, {len(set(master.category_codes.tolist()))} 个品类")
+    return master
@@ -0,0 +1,219 @@
+import math
+import random
+
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    """
+    KLL 分位数草图：用 O(k) 的内存近似任意长度数据流的分位数。
+
+    数据按层存放在若干"压缩器"中，第 h 层的每个元素代表 2^h 个原始观测。
+    某层满了就排序后随机保留一半元素提升到上一层，因此单次 update 的均摊代价为 O(1)；
+    两个草图可以直接合并（例如不同门店、不同日期的草图），合并结果与对合并后的数据流
+    建草图的误差保证相同。
+
+    参数:
+    k (int): 精度参数。k 越大误差越小、内存越大，归一化秩误差约为 2.3 / k^0.97。
+    seed (int 或 None): 随机数种子，便于复现结果。
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.c = 2.0 / 3.0
+        self.n = 0
+        self._rng = random.Random(seed)
+        self._compactors = []
+        self._size = 0
+        self._max_size = 0
+        self._grow()
+
+    def _grow(self):
+        self._compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self._compactors)))
+
+    def _capacity(self, height):
+        depth = len(self._compactors) - height - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _compress(self):
+        for h, compactor in enumerate(self._compactors):
+            if len(compactor) >= self._capacity(h):
+                if h + 1 >= len(self._compactors):
+                    self._grow()
+                compactor.sort()
+                # 元素个数为奇数时保留最大的一个在本层，其余随机取奇数位或偶数位提升
+                keep = compactor.pop() if len(compactor) % 2 else None
+                offset = self._rng.random() < 0.5
+                self._compactors[h + 1].extend(compactor[offset::2])
+                compactor.clear()
+                if keep is not None:
+                    compactor.append(keep)
+                self._size = sum(len(c) for c in self._compactors)
+                break
+
+    def update(self, value):
+        """加入一个观测值，均摊 O(1)。"""
+        self._compactors[0].append(float(value))
+        self._size += 1
+        self.n += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values):
+        """依次加入一批观测值。"""
+        for value in np.asarray(values, dtype=np.float64).ravel():
+            self.update(value)
+
+    def merge(self, other):
+        """把另一个草图合并到当前草图中（原地修改并返回自身）。"""
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+        for h, compactor in enumerate(other._compactors):
+            self._compactors[h].extend(compactor)
+        self.n += other.n
+        self._size = sum(len(c) for c in self._compactors)
+        while self._size >= self._max_size:
+            self._compress()
+        return self
+
+    def _weighted_items(self):
+        values = np.concatenate([np.asarray(c, dtype=np.float64) for c in self._compactors])
+        weights = np.concatenate([np.full(len(c), 2.0 ** h) for h, c in enumerate(self._compactors)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """
+        返回近似分位数。
+
+        参数:
+        q (float 或 array-like): 0~1 之间的分位点。
+
+        返回:
+        float 或 np.ndarray: 对应的近似分位数；草图为空时返回 NaN。
+        """
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        values, cum_weights = self._weighted_items()
+        targets = np.asarray(q, dtype=np.float64) * cum_weights[-1]
+        idx = np.searchsorted(cum_weights, targets, side='left')
+        result = values[np.minimum(idx, len(values) - 1)]
+        return result if np.ndim(q) else float(result)
+
+    def rank(self, value):
+        """返回小于等于 value 的观测值所占的近似比例。"""
+        if self.n == 0:
+            return np.nan
+        values, cum_weights = self._weighted_items()
+        idx = np.searchsorted(values, value, side='right')
+        return float(cum_weights[idx - 1] / cum_weights[-1]) if idx > 0 else 0.0
+
+    def rank_error_bound(self):
+        """草图的近似归一化秩误差（单个分位数查询，约99%置信度）。"""
+        return 2.296 / self.k ** 0.9723
+
+    def __len__(self):
+        return self._size
+
+
+def build_group_sketches(df, group_col, value_col, k=200, seed=None):
+    """
+    为每个分组建立一个 KLL 草图。
+
+    参数:
+    df (pd.DataFrame): 包含数据的DataFrame。
+    group_col (str): 分组列名 (例如 '分类名称' 或 '单品名称')。
+    value_col (str): 数值列名。
+    k (int): 草图精度参数。
+    seed (int 或 None): 随机数种子。
+
+    返回:
+    dict: 分组名称 -> KLLSketch。
+    """
+    sketches = {}
+    for name, values in df.groupby(group_col)[value_col]:
+        sketch = KLLSketch(k=k, seed=seed)
+        sketch.update_many(values.dropna().to_numpy())
+        sketches[name] = sketch
+    return sketches
+
+
+def merge_group_sketches(*sketch_dicts):
+    """
+    合并多份按分组建立的草图（例如多个门店或多个时间段），同名分组的草图合并为一个。
+
+    返回:
+    dict: 分组名称 -> 合并后的 KLLSketch（新对象，不修改输入）。
+    """
+    merged = {}
+    for sketches in sketch_dicts:
+        for name, sketch in sketches.items():
+            if name not in merged:
+                merged[name] = KLLSketch(k=sketch.k)
+            merged[name].merge(sketch)
+    return merged
+
+
+def group_quantiles(df, group_col, value_col, quantiles=(0.25, 0.5, 0.75), method='exact', k=200, seed=None):
+    """
+    计算各分组的分位数。
+
+    参数:
+    quantiles (tuple): 需要的分位点。
+    method (str): 'exact' 使用 pandas 精确分位数（需要对每组完整排序），
+                  'sketch' 使用 KLL 草图近似。
+
+    返回:
+    pd.DataFrame: 以分组名称为索引、分位点为列的表。
+    """
+    if method == 'exact':
+        table = df.groupby(group_col)[value_col].quantile(list(quantiles)).unstack()
+        table.columns = list(quantiles)
+        return table
+    if method == 'sketch':
+        sketches = build_group_sketches(df, group_col, value_col, k=k, seed=seed)
+        return pd.DataFrame(
+            {name: sketch.quantile(list(quantiles)) for name, sketch in sketches.items()},
+            index=list(quantiles),
+        ).T.rename_axis(group_col)
+    raise ValueError(f"不支持的 method: {method}，可选 'exact' 或 'sketch'")
+
+
+def compare_with_exact(df, group_col, value_col, quantiles=(0.25, 0.5, 0.75), k=200, seed=None):
+    """
+    对比草图模式与精确模式的分位数，报告每个分组的误差。
+
+    返回:
+    pd.DataFrame: 每个 (分组, 分位点) 一行，包含精确值、草图值、绝对误差，
+                  以及草图值在该组真实数据中的秩与目标分位点之差（秩误差）。
+    """
+    exact = group_quantiles(df, group_col, value_col, quantiles, method='exact')
+    approx = group_quantiles(df, group_col, value_col, quantiles, method='sketch', k=k, seed=seed)
+    sorted_values = {name: np.sort(values.dropna().to_numpy())
+                     for name, values in df.groupby(group_col)[value_col]}
+
+    rows = []
+    for name in exact.index:
+        values = sorted_values[name]
+        for q in quantiles:
+            exact_value = exact.loc[name, q]
+            sketch_value = approx.loc[name, q]
+            # 草图值在真实数据中的秩取 [左秩, 右秩] 区间内离目标最近的位置
+            lo = np.searchsorted(values, sketch_value, side='left') / len(values)
+            hi = np.searchsorted(values, sketch_value, side='right') / len(values)
+            rank_error = 0.0 if lo <= q <= hi else min(abs(q - lo), abs(q - hi))
+            rows.append({
+                group_col: name,
+                '分位点': q,
+                '精确值': exact_value,
+                '草图值': sketch_value,
+                '绝对误差': abs(sketch_value - exact_value),
+                '秩误差': rank_error,
+            })
+
+    report = pd.DataFrame(rows)
+    print(f"KLL草图 (k={k}) 与精确分位数对比: 最大秩误差 {report['秩误差'].max():.4f}，"
+          f"理论误差约 {KLLSketch(k=k).rank_error_bound():.4f}")
+    return report
@@ -0,0 +1,294 @@
+import numpy as np
+import pandas as pd
+
+from product_master import load_product_master
+from sales_matrix import load_sales_matrix
+from seasonal_decomposition import PERIOD, decompose
+from wholesale_prices import PRICE_COL, WHOLESALE_PRICE_FILE, load_price_matrix
+
+# 附件4：各品类的平均损耗率（%）
+LOSS_RATE_FILE = '附件4.xlsx'
+# 成本加成定价的默认加成率：售价 = 批发价 × (1 + 加成率)
+DEFAULT_MARKUP = 0.3
+
+
+def load_loss_rates(file_path=LOSS_RATE_FILE):
+    """
+    读取附件4中各品类的平均损耗率。
+
+    参数:
+    file_path (str): 附件4的路径。
+
+    返回:
+    pd.Series: 以分类名称为索引的损耗率（0~1 的小数）。
+    """
+    df = pd.read_excel(file_path)
+    rate_col = [col for col in df.columns if str(col).startswith('平均损耗率')][0]
+    rates = pd.Series(df[rate_col].to_numpy(dtype=np.float64) / 100, index=pd.Index(df['小分类名称'], name='分类名称'))
+    return rates.rename('损耗率')
+
+
+def category_wholesale_cost(price_file=WHOLESALE_PRICE_FILE, master=None, window=7, horizon=None):
+    """
+    按品类计算补货的单位成本：各单品批发价格的品类均值。
+
+    参数:
+    price_file (str): 附件3的路径。
+    master (ProductMaster 或 None): 商品主数据，为 None 时读取附件1。
+    window (int): 取附件3中最后多少天的真实报价求平均。
+    horizon (int 或 None): 给出时改用未来 horizon 天的批发价格预测均值（见 PriceMatrix.forecast），
+                           只统计最近 window 天内有报价的单品。
+
+    返回:
+    pd.Series: 以分类名称为索引的平均批发价格（元/千克）。
+    """
+    if master is None:
+        master = load_product_master()
+    price_matrix = load_price_matrix(price_file)
+    sku_cost = price_matrix.recent_mean(window)
+    if horizon is not None:
+        sku_cost = price_matrix.forecast(horizon).mean_cost().where(sku_cost.notna())
+    sku_cost = sku_cost.dropna()
+    categories = master.category_names_for(sku_cost.index.to_numpy(), missing='未知')
+    cost = sku_cost.groupby(categories).mean()
+    cost.index.name = '分类名称'
+    return cost.rename(PRICE_COL)
+
+
+def _history_rows(matrix, history_days):
+    """返回用于抽样的历史行号：最近 history_days 天内所有序列都有记录的日期。"""
+    rows = np.arange(len(matrix.dates))
+    if history_days is not None:
+        rows = rows[-int(history_days):]
+    if matrix.mask is not None:
+        complete = matrix.mask[rows].all(axis=1)
+        if complete.any():
+            rows = rows[complete]
+    return rows
+
+
+def sample_demand(matrix, n_paths=10000, horizon=7, method='empirical', history_days=None, seed=None):
+    """
+    为矩阵中的所有序列一次性抽取 n_paths 条未来 horizon 天的需求路径。
+
+    抽样以整天为单位：同一条路径的同一天，所有品类取自同一个历史日期（或同一天的残差），
+    因此品类之间的同期相关性得以保留。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×品类 日销量矩阵。
+    n_paths (int): 路径数。
+    horizon (int): 模拟天数，从矩阵最后一天的下一天开始。
+    method (str): 'empirical' 从历史上同一星期几的日销量中有放回抽样；
+                  'residual' 以最近一周的趋势水平 + 星期几季节因子为均值，
+                  再叠加从分解残差中有放回抽取的整天残差（负需求截断为0）。
+    history_days (int 或 None): 只使用最近多少天的历史，为 None 时使用全部历史。
+    seed (int 或 None): 随机数种子。
+
+    返回:
+    tuple: (demand, dates)，demand 为形状 (n_paths, horizon, 序列数) 的 float32 数组，
+           dates 为模拟的日期轴。
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(matrix.dates.max() + pd.Timedelta(days=1), periods=horizon, freq='D')
+    phase = dates.dayofweek.to_numpy()
+    rows = _history_rows(matrix, history_days)
+    demand = np.empty((n_paths, horizon, matrix.shape[1]), dtype=np.float32)
+
+    if method == 'empirical':
+        row_phase = matrix.dates.dayofweek.to_numpy()[rows]
+        for day in range(horizon):
+            pool = rows[row_phase == phase[day]]
+            if len(pool) == 0:
+                pool = rows
+            demand[:, day] = matrix.values[rng.choice(pool, size=n_paths)]
+    elif method == 'residual':
+        decomposition = decompose(matrix)
+        level = decomposition.trend[-PERIOD:].mean(axis=0)
+        residual = decomposition.residual[rows]
+        residual = residual[~np.isnan(residual).any(axis=1)]
+        if len(residual) == 0:
+            raise ValueError("历史中没有所有序列都有记录的日期，无法抽取残差")
+        mean = level[None, :] + decomposition.weekday_factors[phase]
+        draws = residual[rng.integers(len(residual), size=(n_paths, horizon))]
+        np.maximum(mean[None] + draws, 0, out=demand)
+    else:
+        raise ValueError(f"不支持的 method: {method}，可选 'empirical' 或 'residual'")
+    return demand, dates
+
+
+def newsvendor_order(demand, loss_rate, cost, price):
+    """
+    按报童模型为每个品类、每一天给出补货量。
+
+    可售量 a = q·(1 - 损耗率)，单位可售量的实际成本为 c / (1 - 损耗率)，
+    最优可售量为需求分布的 (p - c') / p 分位数，补货量再除以 (1 - 损耗率) 折回进货量。
+
+    参数:
+    demand (np.ndarray): sample_demand 得到的 (路径数, 天数, 序列数) 需求。
+    loss_rate / cost / price (np.ndarray): 与序列轴对齐的损耗率、单位成本和售价。
+
+    返回:
+    np.ndarray: 形状为 (天数, 序列数) 的补货量。
+    """
+    loss_rate = np.asarray(loss_rate, dtype=np.float64)
+    effective_cost = np.asarray(cost, dtype=np.float64) / (1 - loss_rate)
+    price = np.asarray(price, dtype=np.float64)
+    critical_ratio = np.clip((price - effective_cost) / price, 0, 1)
+    # 每个品类的分位点不同，先对路径轴排序再按位置取值
+    ordered = np.sort(demand, axis=0)
+    position = np.minimum((critical_ratio * len(demand)).astype(np.int64), len(demand) - 1)
+    available = ordered[position, :, np.arange(demand.shape[2])].T
+    return available / (1 - loss_rate)
+
+
+class SimulationResult:
+    """
+    补货方案在所有需求路径上的模拟结果，所有数组形状均为 (路径数, 天数, 序列数)。
+
+    属性:
+    items (pd.Index): 序列名称轴。
+    dates (pd.DatetimeIndex): 模拟的日期轴。
+    order_qty (np.ndarray): (天数, 序列数) 的补货量。
+    demand / sold / stockout / waste / profit (np.ndarray): 需求、销量、缺货量、损耗量（含运输
+        损耗和当日未售出的部分）和利润。
+    """
+
+    def __init__(self, items, dates, order_qty, demand, sold, stockout, waste, profit):
+        self.items = pd.Index(items)
+        self.dates = pd.DatetimeIndex(dates)
+        self.order_qty = order_qty
+        self.demand = demand
+        self.sold = sold
+        self.stockout = stockout
+        self.waste = waste
+        self.profit = profit
+
+    def __repr__(self):
+        return (f"SimulationResult({self.demand.shape[0]} 条路径 × {len(self.dates)} 天 × "
+                f"{len(self.items)} 个序列)")
+
+    def summary(self, alpha=0.05):
+        """
+        各序列在整个模拟期内的汇总指标。
+
+        参数:
+        alpha (float): 利润下分位点（风险价值）的概率。
+
+        返回:
+        pd.DataFrame: 以序列名称为索引，列为 补货量、期望需求、期望销量、满足率、
+                      缺货概率、期望缺货量、期望损耗量、期望利润 和利润下分位点。
+        """
+        demand = self.demand.sum(axis=1, dtype=np.float64)
+        sold = self.sold.sum(axis=1, dtype=np.float64)
+        profit = self.profit.sum(axis=1, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fill_rate = sold.sum(axis=0) / demand.sum(axis=0)
+        return pd.DataFrame({
+            '补货量': self.order_qty.sum(axis=0, dtype=np.float64),
+            '期望需求': demand.mean(axis=0),
+            '期望销量': sold.mean(axis=0),
+            '满足率': fill_rate,
+            '缺货概率': (self.stockout > 1e-6).any(axis=1).mean(axis=0),
+            '期望缺货量': self.stockout.sum(axis=1, dtype=np.float64).mean(axis=0),
+            '期望损耗量': self.waste.sum(axis=1, dtype=np.float64).mean(axis=0),
+            '期望利润': profit.mean(axis=0),
+            f'利润{alpha:.0%}分位': np.quantile(profit, alpha, axis=0),
+        }, index=self.items)
+
+    def total_profit(self):
+        """每条路径上所有序列、所有天的总利润，形状为 (路径数,)。"""
+        return self.profit.sum(axis=(1, 2), dtype=np.float64)
+
+
+def simulate_replenishment(demand, order_qty, loss_rate, cost, price, items=None, dates=None):
+    """
+    在所有需求路径上同时模拟补货方案的销量、缺货、损耗和利润。
+
+    蔬菜当日进货当日销售，不跨天结转库存：进货量中按损耗率折损，
+    剩余的可售量满足需求，未售出的部分在当天计入损耗。
+
+    参数:
+    demand (np.ndarray): (路径数, 天数, 序列数) 的需求。
+    order_qty (array-like): 可广播到 (天数, 序列数) 的补货量。
+    loss_rate / cost / price (array-like): 与序列轴对齐的损耗率（小数）、单位成本和售价。
+    items / dates: 结果的序列名称轴和日期轴。
+
+    返回:
+    SimulationResult: 模拟结果。
+    """
+    n_paths, horizon, m = demand.shape
+    order_qty = np.broadcast_to(np.asarray(order_qty, dtype=np.float32), (horizon, m))
+    loss_rate = np.asarray(loss_rate, dtype=np.float32)
+    cost = np.asarray(cost, dtype=np.float32)
+    price = np.asarray(price, dtype=np.float32)
+
+    available = order_qty * (1 - loss_rate)
+    sold = np.minimum(demand, available)
+    stockout = demand - sold
+    waste = order_qty - sold
+    profit = sold * price - order_qty * cost
+
+    items = items if items is not None else pd.RangeIndex(m)
+    dates = dates if dates is not None else pd.RangeIndex(horizon)
+    return SimulationResult(items, dates, np.array(order_qty), demand, sold, stockout, waste, profit)
+
+
+def stress_test(matrix, order_qty=None, n_paths=10000, horizon=7, method='empirical', markup=DEFAULT_MARKUP,
+                history_days=None, seed=None, loss_rates=None, cost=None):
+    """
+    用附件4的损耗率和成本加成定价，对品类补货方案做蒙特卡洛压力测试。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×品类 日销量矩阵。
+    order_qty (array-like 或 None): 可广播到 (天数, 品类数) 的补货量，为 None 时使用报童模型的补货量。
+    n_paths / horizon / method / history_days / seed: 见 sample_demand。
+    markup (float): 成本加成率。
+    loss_rates / cost (pd.Series 或 None): 以分类名称为索引的损耗率和单位成本，
+                                          为 None 时分别读取附件4和附件3。
+
+    返回:
+    SimulationResult: 模拟结果。
+    """
+    loss_rates = load_loss_rates() if loss_rates is None else loss_rates
+    cost = category_wholesale_cost() if cost is None else cost
+    missing = matrix.items.difference(loss_rates.index).union(matrix.items.difference(cost.index))
+    if len(missing) > 0:
+        raise ValueError(f"以下品类缺少损耗率或批发价格: {list(missing)}")
+    loss = loss_rates.reindex(matrix.items).to_numpy()
+    unit_cost = cost.reindex(matrix.items).to_numpy()
+    price = unit_cost * (1 + markup)
+
+    demand, dates = sample_demand(matrix, n_paths, horizon, method, history_days, seed)
+    if order_qty is None:
+        order_qty = newsvendor_order(demand, loss, unit_cost, price)
+    return simulate_replenishment(demand, order_qty, loss, unit_cost, price, matrix.items, dates)
+
+
+if __name__ == '__main__':
+    import time
+
+    category_matrix = load_sales_matrix('daily_category_sales.xlsx', '分类名称')
+    loss_rates = load_loss_rates()
+    cost = category_wholesale_cost()
+    print("各品类损耗率与最近一周平均批发价格:")
+    print(pd.concat([loss_rates, cost], axis=1).round(4))
+
+    for method in ('empirical', 'residual'):
+        start = time.perf_counter()
+        result = stress_test(category_matrix, method=method, history_days=91, seed=0,
+                             loss_rates=loss_rates, cost=cost)
+        elapsed = time.perf_counter() - start
+        print(f"\n{result}（{method}，耗时 {elapsed:.2f} 秒）")
+        print(result.summary().round(2).to_string())
+        total = result.total_profit()
+        print(f"总利润: 均值 {total.mean():.0f} 元, 5%分位 {np.quantile(total, 0.05):.0f} 元")
+
+    # 以最近四周同一星期几的平均销量作为补货量，对比报童补货量
+    recent = category_matrix.values[-28:]
+    phase = category_matrix.dates[-28:].dayofweek.to_numpy()
+    dates = pd.date_range(category_matrix.dates.max() + pd.Timedelta(days=1), periods=7, freq='D')
+    naive_qty = np.stack([recent[phase == day].mean(axis=0) for day in dates.dayofweek])
+    naive = stress_test(category_matrix, order_qty=naive_qty, history_days=91, seed=0,
+                        loss_rates=loss_rates, cost=cost)
+    print("\n按近四周均值补货的模拟结果:")
+    print(naive.summary().round(2).to_string())
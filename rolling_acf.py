@@ -0,0 +1,214 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from sales_matrix import load_sales_matrix
+
+
+class RollingACF:
+    """
+    所有序列的滚动窗口ACF。
+
+    属性:
+    dates (pd.DatetimeIndex): 各窗口的结束日期。
+    items (pd.Index): 序列名称轴。
+    window (int): 窗口长度（天）。
+    step (int): 相邻窗口的间隔（天）。
+    acf (np.ndarray): (窗口数, 滞后数+1, 序列数) 的 float32 ACF，第0阶为1；
+                      窗口内方差为0或有记录的天数不足时为 NaN。
+    """
+
+    def __init__(self, dates, items, window, step, acf):
+        self.dates = pd.DatetimeIndex(dates)
+        self.items = pd.Index(items)
+        self.window = int(window)
+        self.step = int(step)
+        self.acf = np.asarray(acf, dtype=np.float32)
+        if self.acf.shape[0] != len(self.dates) or self.acf.shape[2] != len(self.items):
+            raise ValueError(f"ACF 数组形状 {self.acf.shape} 与坐标轴长度不一致")
+
+    def __repr__(self):
+        return (f"RollingACF({len(self.dates)} 个窗口 × {self.acf.shape[1] - 1} 阶 × {len(self.items)} 个序列, "
+                f"窗口 {self.window} 天, 步长 {self.step} 天)")
+
+    @property
+    def max_lags(self):
+        return self.acf.shape[1] - 1
+
+    def strip(self, item):
+        """
+        单个序列的 滞后×时间 表。
+
+        返回:
+        pd.DataFrame: 行为滞后阶数（1 起），列为窗口结束日期。
+        """
+        col = self.items.get_loc(item)
+        return pd.DataFrame(self.acf[:, 1:, col].T, index=np.arange(1, self.max_lags + 1), columns=self.dates)
+
+    def lag_series(self, lag=7):
+        """
+        所有序列某一阶ACF随时间的变化。
+
+        返回:
+        pd.DataFrame: 行为窗口结束日期，列为序列。
+        """
+        return pd.DataFrame(self.acf[:, lag, :], index=self.dates, columns=self.items)
+
+    def trend(self, lag=7):
+        """
+        各序列某一阶ACF的变化趋势：首末窗口的值、最大最小值和线性趋势斜率（每90天）。
+
+        返回:
+        pd.DataFrame: 以序列为索引。
+        """
+        values = self.acf[:, lag, :].astype(np.float64)
+        valid = ~np.isnan(values)
+        days = ((self.dates - self.dates[0]) / pd.Timedelta(days=1)).to_numpy()[:, None]
+        counts = valid.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_t = np.where(valid, days, 0).sum(axis=0) / counts
+            mean_v = np.nansum(values, axis=0) / counts
+            dt = np.where(valid, days - mean_t, 0)
+            slope = (dt * np.nan_to_num(values - mean_v)).sum(axis=0) / (dt ** 2).sum(axis=0)
+        first = values[valid.argmax(axis=0), np.arange(values.shape[1])]
+        last = values[len(values) - 1 - valid[::-1].argmax(axis=0), np.arange(values.shape[1])]
+        return pd.DataFrame({
+            f'首窗口ACF({lag})': np.where(counts > 0, first, np.nan),
+            f'末窗口ACF({lag})': np.where(counts > 0, last, np.nan),
+            f'最大ACF({lag})': np.nanmax(np.where(valid, values, -np.inf), axis=0),
+            f'最小ACF({lag})': np.nanmin(np.where(valid, values, np.inf), axis=0),
+            '每90天变化': slope * 90,
+            '有效窗口数': counts,
+        }, index=self.items).replace([np.inf, -np.inf], np.nan)
+
+
+def rolling_acf(matrix, window=90, step=7, max_lags=28, min_observed=0.5):
+    """
+    对矩阵中的所有序列计算滚动窗口ACF，口径与 calculate_acf 对单个窗口的结果一致。
+
+    窗口每右移一天，只更新进出窗口的一项：Σx、Σx² 各加减一项，
+    每个滞后 k 的滞后乘积和 Σx_t·x_{t+k} 减去离开窗口的一对、加上进入窗口的一对，
+    窗口首尾 k 项的部分和用于去均值修正；因此每一步的代价为 O(滞后数)，
+    与窗口长度无关，所有序列和所有滞后在同一次数组运算中更新。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×序列 矩阵。
+    window (int): 窗口长度（天）。
+    step (int): 输出窗口的间隔（天）。
+    max_lags (int): 最高滞后阶数。
+    min_observed (float): 窗口内有原始记录的天数占比低于该值时（上市前、下架后）结果记为 NaN。
+
+    返回:
+    RollingACF: 滚动ACF结果。
+    """
+    n_dates, n_items = matrix.shape
+    if not max_lags < window <= n_dates:
+        raise ValueError(f"需要满足 max_lags < window <= 日期数，当前为 {max_lags}, {window}, {n_dates}")
+    x = matrix.values.astype(np.float64)
+    mask = matrix.mask
+    lags = np.arange(1, max_lags + 1)[:, None]
+
+    # 第一个窗口直接求和，之后全部增量更新
+    s1 = x[:window].sum(axis=0)
+    s2 = (x[:window] ** 2).sum(axis=0)
+    products = np.stack([(x[:window - k] * x[k:window]).sum(axis=0) for k in range(1, max_lags + 1)])
+    if mask is None:
+        n_observed = np.full(n_items, float(window))
+    else:
+        n_observed = mask[:window].sum(axis=0).astype(np.float64)
+
+    starts = np.arange(0, n_dates - window + 1, step)
+    acf = np.full((len(starts), max_lags + 1, n_items), np.nan, dtype=np.float32)
+    acf[:, 0] = 1.0
+    out = 0
+    for start in range(n_dates - window + 1):
+        if start > 0:
+            leaving, entering = x[start - 1], x[start + window - 1]
+            s1 += entering - leaving
+            s2 += entering ** 2 - leaving ** 2
+            # 离开的一对 (x[start-1], x[start-1+k])，进入的一对 (x[end-k], x[end])
+            products -= leaving * x[start:start + max_lags]
+            products += entering * x[start + window - 1 - lags[:, 0]]
+            if mask is not None:
+                n_observed += mask[start + window - 1].astype(np.float64) - mask[start - 1]
+        if start % step:
+            continue
+
+        mean = s1 / window
+        head_tail = np.cumsum(x[start:start + max_lags], axis=0)
+        tail_head = np.cumsum(x[start + window - 1:start + window - 1 - max_lags:-1], axis=0)
+        # Σ_{t≤end-k} x_t = s1 - 最后 k 项；Σ_{t≥start+k} x_t = s1 - 最前 k 项
+        numerator = products - mean * (2 * s1 - head_tail - tail_head) + (window - lags) * mean ** 2
+        denominator = s2 - window * mean ** 2
+        valid = (denominator > 1e-9 * np.maximum(s2, 1.0)) & (n_observed >= min_observed * window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            acf[out, 1:] = np.where(valid, numerator / denominator, np.nan)
+        out += 1
+
+    end_dates = matrix.dates[starts + window - 1]
+    return RollingACF(end_dates, matrix.items, window, step, acf)
+
+
+def save_acf_strips(result, output_folder='.', items=None, dpi=100, label_every=90):
+    """
+    为每个序列保存 滞后×时间 的滚动ACF热力条（复用同一个 HeatmapTemplate，色阶固定为 -1~1）。
+
+    参数:
+    result (RollingACF): 滚动ACF结果。
+    output_folder (str): 保存图片的文件夹。
+    items (list 或 None): 需要绘制的序列，为 None 时绘制全部。
+    dpi (int): 输出分辨率。
+    label_every (int): 时间轴标签的大致间隔（天）。
+
+    返回:
+    list: 保存的图片路径。
+    """
+    from plotting import HeatmapTemplate, get_pyplot, get_template
+
+    get_pyplot('Agg')
+    every = max(1, label_every // result.step)
+    col_labels = tuple(date.strftime('%Y-%m') if i % every == 0 else ''
+                       for i, date in enumerate(result.dates))
+    template = get_template(
+        HeatmapTemplate,
+        row_labels=tuple(str(lag) for lag in range(1, result.max_lags + 1)),
+        col_labels=col_labels,
+        annot=False,
+        cbar_label='ACF',
+        xlabel=f'窗口结束日期（窗口 {result.window} 天，步长 {result.step} 天）',
+        ylabel='滞后（天）',
+        figsize=(16, 6),
+        cmap='coolwarm',
+    )
+    os.makedirs(output_folder, exist_ok=True)
+    saved = []
+    for item in (result.items if items is None else items):
+        template.update(result.strip(item).to_numpy(), f'{item} 滚动窗口ACF', vmin=-1.0, vmax=1.0)
+        output_path = os.path.join(output_folder, f'{item}_滚动ACF.png')
+        template.save(output_path, dpi=dpi)
+        saved.append(output_path)
+    return saved
+
+
+if __name__ == '__main__':
+    import time
+
+    category_matrix = load_sales_matrix('daily_category_sales.xlsx', '分类名称')
+    sku_matrix = load_sales_matrix('cleaned_daily_sku_sales.xlsx', '单品名称')
+
+    start = time.perf_counter()
+    sku_result = rolling_acf(sku_matrix)
+    print(f"{sku_result}，耗时 {time.perf_counter() - start:.2f} 秒")
+    print("\n周循环（7阶ACF）变化最大的单品（有效窗口不少于半年）:")
+    trend = sku_result.trend(7)
+    trend = trend[trend['有效窗口数'] >= 26]
+    print(trend.reindex(trend['每90天变化'].abs().sort_values(ascending=False).index).head(10).round(3).to_string())
+
+    category_result = rolling_acf(category_matrix)
+    print(f"\n{category_result}")
+    print(category_result.trend(7).round(3).to_string())
+
+    saved = save_acf_strips(category_result, output_folder='滚动ACF热力图')
+    saved += save_acf_strips(sku_result, output_folder='滚动ACF热力图', items=['云南生菜'])
+    print(f"\n已保存 {len(saved)} 张滚动ACF热力图到 '滚动ACF热力图' 文件夹。")
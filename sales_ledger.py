@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+# 从附件2（销售流水明细）中读取的列；单品名称和分类名称不进入流水，展示时再由附件1附加
+LEDGER_COLUMNS = ['销售日期', '单品编码', '销量(千克)', '销售单价(元/千克)', '销售类型', '是否打折销售']
+
+# aggregate_sales 输出的数值列：
+# 销量为销售类型为“销售”的流水之和（不被退货冲减），退货量为退货流水销量的绝对值，
+# 净销量 = 销量 - 退货量，打折销量为打折销售的销量，销售金额为 单价×销量 之和（退货为负）
+SALES_COMPONENTS = ['销量(千克)', '退货量(千克)', '净销量(千克)', '打折销量(千克)', '销售金额']
+
+
+def load_ledger(file_path='附件2.xlsx', columns=LEDGER_COLUMNS):
+    """
+    读取附件2销售流水，只保留需要的列，并把单品编码转换为整数。
+
+    参数:
+    file_path (str): 附件2的路径。
+    columns (list): 需要读取的列名。
+
+    返回:
+    pd.DataFrame: 精简后的流水表，'销售日期' 为日期（不含时间），'单品编码' 为 int64。
+    """
+    ledger = pd.read_excel(file_path, usecols=list(columns))
+    ledger['销售日期'] = pd.to_datetime(ledger['销售日期']).dt.normalize()
+    ledger['单品编码'] = ledger['单品编码'].astype(np.int64)
+    for col in ('销量(千克)', '销售单价(元/千克)'):
+        if col in ledger.columns:
+            ledger[col] = pd.to_numeric(ledger[col])
+    for col in ('销售类型', '是否打折销售'):
+        if col in ledger.columns:
+            ledger[col] = ledger[col].astype('category')
+    print(f"已加载销售流水: {len(ledger)} 条记录, 内存占用 {ledger.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+    return ledger
+
+
+def aggregate_daily(ledger, master=None, level='sku', value_col='销量(千克)'):
+    """
+    按天汇总流水，分组键全部是整数编码。
+
+    参数:
+    ledger (pd.DataFrame): load_ledger 返回的流水表。
+    master (ProductMaster 或 None): level='category' 时用于把单品编码映射为分类编码。
+    level (str): 'sku' 按 (销售日期, 单品编码) 汇总，'category' 按 (销售日期, 分类编码) 汇总。
+    value_col (str 或 list): 需要求和的数值列，给出列表时在同一次分组中对多列求和。
+
+    返回:
+    pd.DataFrame: 列为 销售日期、单品编码/分类编码 和 value_col 的日汇总表。
+    """
+    if level == 'sku':
+        key_col = '单品编码'
+        keys = ledger[key_col].to_numpy()
+    elif level == 'category':
+        if master is None:
+            raise ValueError("按品类汇总需要提供商品主数据 master")
+        key_col = '分类编码'
+        keys = master.category_codes_for(ledger['单品编码'].to_numpy())
+    else:
+        raise ValueError(f"不支持的汇总级别: {level}，可选 'sku' 或 'category'")
+
+    daily = (ledger[value_col]
+             .groupby([ledger['销售日期'].to_numpy(), keys])
+             .sum()
+             .rename_axis(['销售日期', key_col])
+             .reset_index())
+    return daily
+
+
+def sales_components(ledger):
+    """
+    由流水逐行计算 SALES_COMPONENTS 中的各个分量（向量化，不修改原表）。
+
+    退货流水在附件2中销量为负；这里把它们拆到退货量中，销量只统计销售流水，
+    这样汇总后的销量不会因为退货出现负数。
+
+    参数:
+    ledger (pd.DataFrame): 含 销量(千克)、销售单价(元/千克)、销售类型、是否打折销售 的流水表。
+
+    返回:
+    pd.DataFrame: 与 ledger 行对齐、列为 SALES_COMPONENTS 的 float64 表。
+    """
+    quantity = ledger['销量(千克)'].to_numpy(dtype=np.float64)
+    is_return = (ledger['销售类型'] == '退货').to_numpy(dtype=bool)
+    is_discount = (ledger['是否打折销售'] == '是').to_numpy(dtype=bool)
+    gross = np.where(is_return, 0.0, quantity)
+    returned = np.where(is_return, np.abs(quantity), 0.0)
+    return pd.DataFrame({
+        '销量(千克)': gross,
+        '退货量(千克)': returned,
+        '净销量(千克)': gross - returned,
+        '打折销量(千克)': np.where(is_discount, gross, 0.0),
+        '销售金额': quantity * ledger['销售单价(元/千克)'].to_numpy(dtype=np.float64),
+    }, index=ledger.index)
+
+
+def aggregate_sales(ledger, master=None, level='sku', extra_cols=()):
+    """
+    按天汇总流水的销量、退货量、净销量、打折销量和销售金额，所有列在同一次分组中求和。
+
+    参数:
+    ledger (pd.DataFrame): load_ledger 返回的流水表。
+    master / level: 含义同 aggregate_daily。
+    extra_cols (tuple): 需要一并求和的其它流水列（例如 attach_markup 附加的 批发金额）。
+
+    返回:
+    pd.DataFrame: 列为 销售日期、单品编码/分类编码、SALES_COMPONENTS 和 extra_cols 的日汇总表。
+    """
+    components = sales_components(ledger)
+    for col in extra_cols:
+        components[col] = ledger[col]
+    components.insert(0, '销售日期', ledger['销售日期'])
+    components.insert(1, '单品编码', ledger['单品编码'])
+    return aggregate_daily(components, master, level, value_col=[*SALES_COMPONENTS, *extra_cols])
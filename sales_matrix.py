@@ -0,0 +1,199 @@
+import numpy as np
+import pandas as pd
+
+
+class SalesMatrix:
+    """
+    稠密的 日期×单品 销量矩阵。
+
+    长表格式的日销量数据中，没有销售（或被剔除）的日期直接缺行，
+    按行号计算ACF、按周重采样时都需要重新补齐日历。
+    本类把数据一次性转换为连续日历上的二维 float32 数组：
+    行为日期轴（逐日、无缺口），列为单品编码/名称轴，缺失的日期显式补0，
+    mask 记录哪些位置在原始数据中真实出现过。
+
+    属性:
+    values (np.ndarray): 形状为 (日期数, 单品数) 的 float32 销量矩阵。
+    dates (pd.DatetimeIndex): 连续的日历日期轴。
+    items (pd.Index): 单品编码/名称轴。
+    mask (np.ndarray 或 None): 与 values 同形状的布尔数组，True 表示该日有原始记录。
+    """
+
+    def __init__(self, values, dates, items, mask=None):
+        self.values = np.asarray(values, dtype=np.float32)
+        self.dates = pd.DatetimeIndex(dates)
+        self.items = pd.Index(items)
+        self.mask = None if mask is None else np.asarray(mask, dtype=bool)
+
+        if self.values.shape != (len(self.dates), len(self.items)):
+            raise ValueError(
+                f"矩阵形状 {self.values.shape} 与坐标轴长度 "
+                f"({len(self.dates)}, {len(self.items)}) 不一致"
+            )
+        if self.mask is not None and self.mask.shape != self.values.shape:
+            raise ValueError("mask 的形状必须与 values 一致")
+
+    @classmethod
+    def from_series(cls, series):
+        """把单个以日期为索引的销量序列包装为单列矩阵（日期轴需已连续）。"""
+        name = series.name if series.name is not None else '销量'
+        return cls(series.to_numpy(dtype=np.float32)[:, None], series.index, [name])
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __repr__(self):
+        return (f"SalesMatrix({len(self.dates)} 天 × {len(self.items)} 个单品, "
+                f"{self.dates.min().date()} 至 {self.dates.max().date()})")
+
+    def column(self, item):
+        """返回单品在列轴上的位置。"""
+        return self.items.get_loc(item)
+
+    def masked_values(self):
+        """返回未出现的位置为 NaN 的副本，用于只统计真实记录的场合。"""
+        if self.mask is None:
+            return self.values.copy()
+        return np.where(self.mask, self.values, np.float32(np.nan))
+
+    def series(self, item, observed_only=False):
+        """
+        取出单个单品在完整日历上的销量序列。
+
+        参数:
+        item: 单品编码或名称。
+        observed_only (bool): 为 True 时只保留原始数据中出现过的日期。
+
+        返回:
+        pd.Series: 以日期为索引的销量序列。
+        """
+        col = self.column(item)
+        sales = pd.Series(self.values[:, col], index=self.dates, name=item)
+        if observed_only and self.mask is not None:
+            sales = sales[self.mask[:, col]]
+        return sales
+
+    def select(self, items):
+        """按单品列表切出子矩阵（向量化的列索引）。"""
+        cols = self.items.get_indexer(items)
+        if (cols < 0).any():
+            missing = [item for item, col in zip(items, cols) if col < 0]
+            raise KeyError(f"以下单品不在矩阵中: {missing}")
+        mask = None if self.mask is None else self.mask[:, cols]
+        return SalesMatrix(self.values[:, cols], self.dates, self.items[cols], mask)
+
+    def slice_dates(self, start=None, end=None):
+        """按日期区间 [start, end] 切出子矩阵（行轴连续，只需二分查找）。"""
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        mask = None if self.mask is None else self.mask[lo:hi]
+        return SalesMatrix(self.values[lo:hi], self.dates[lo:hi], self.items, mask)
+
+    def resample(self, freq='W'):
+        """
+        将所有单品一次性重采样为更粗的时间粒度（求和）。
+
+        参数:
+        freq (str): pandas 频率字符串，例如 'W'（周，周日结束）或 'MS'（月初）。
+
+        返回:
+        SalesMatrix: 日期轴为各周期标签的新矩阵，mask 表示该周期内是否有任何原始记录。
+        """
+        frame = pd.DataFrame(self.values, index=self.dates)
+        summed = frame.resample(freq).sum()
+        mask = None
+        if self.mask is not None:
+            mask = pd.DataFrame(self.mask, index=self.dates).resample(freq).max().to_numpy(dtype=bool)
+        return SalesMatrix(summed.to_numpy(dtype=np.float32), summed.index, self.items, mask)
+
+    def to_frame(self, item_col='单品名称', value_col='销量(千克)', date_col='销售日期', observed_only=True):
+        """
+        转换回长表格式的 DataFrame。
+
+        参数:
+        observed_only (bool): 为 True 时只输出原始数据中出现过的 (日期, 单品) 组合，
+                              否则输出补0后的完整日历。
+        """
+        n_dates, n_items = self.values.shape
+        date_idx = np.repeat(np.arange(n_dates), n_items)
+        item_idx = np.tile(np.arange(n_items), n_dates)
+        flat_values = self.values.ravel()
+        if observed_only and self.mask is not None:
+            keep = self.mask.ravel()
+            date_idx, item_idx, flat_values = date_idx[keep], item_idx[keep], flat_values[keep]
+        return pd.DataFrame({
+            date_col: self.dates[date_idx],
+            item_col: self.items[item_idx],
+            value_col: flat_values.astype(np.float64),
+        })
+
+
+def build_sales_matrix(df, item_col, value_col='销量(千克)', date_col='销售日期'):
+    """
+    将长表格式的日销量数据转换为 SalesMatrix。
+
+    同一天同一单品的多条记录会被累加；日历从最早日期连续铺到最晚日期，
+    缺失的日期补0，并在 mask 中标记为 False。日期或单品为空的行会被跳过。
+
+    参数:
+    df (pd.DataFrame): 包含日期、单品和销量列的数据。
+    item_col (str 或 None): 单品编码/名称列名；为 None 时整张表视为一个序列，
+                           列轴标签取 value_col。
+    value_col (str): 销量列名。
+    date_col (str): 日期列名。
+
+    返回:
+    SalesMatrix: 稠密的 日期×单品 矩阵。
+    """
+    dates = pd.to_datetime(df[date_col], errors='coerce').dt.normalize()
+    # 日期或单品缺失的行无法定位到矩阵中的格子（factorize 会给缺失单品编码 -1，
+    # 展平下标会落到相邻的格子上），直接丢弃并提示
+    invalid = dates.isna().to_numpy()
+    if item_col is not None:
+        invalid = invalid | df[item_col].isna().to_numpy()
+    if invalid.any():
+        print(f"警告：{int(invalid.sum())} 行的日期或{item_col or '单品'}缺失，已跳过")
+        df = df.loc[~invalid]
+        dates = dates.loc[~invalid]
+    if len(df) == 0:
+        raise ValueError("没有日期和单品都有效的记录，无法构建销量矩阵")
+    sales = pd.to_numeric(df[value_col], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    if item_col is None:
+        item_codes = np.zeros(len(df), dtype=np.int64)
+        items = pd.Index([value_col])
+    else:
+        item_codes, items = pd.factorize(df[item_col], sort=True)
+        items = pd.Index(items)
+
+    calendar = pd.date_range(dates.min(), dates.max(), freq='D')
+    date_codes = ((dates - calendar[0]).dt.days).to_numpy(dtype=np.int64)
+
+    # 展平后的位置 = 日期位置 × 单品数 + 单品位置，用 bincount 一次性完成累加
+    n_dates, n_items = len(calendar), len(items)
+    flat_idx = date_codes * n_items + item_codes
+    size = n_dates * n_items
+    values = np.bincount(flat_idx, weights=sales, minlength=size).reshape(n_dates, n_items)
+    mask = np.bincount(flat_idx, minlength=size).reshape(n_dates, n_items) > 0
+
+    return SalesMatrix(values.astype(np.float32), calendar, items, mask)
+
+
+def load_sales_matrix(file_path, item_col, value_col='销量(千克)', date_col='销售日期'):
+    """
+    读取日销量 Excel 文件并直接生成 SalesMatrix。
+
+    参数:
+    file_path (str): Excel文件的路径。
+    item_col (str 或 None): 单品编码/名称列名，含义同 build_sales_matrix。
+
+    返回:
+    SalesMatrix: 稠密的 日期×单品 矩阵。
+    """
+    df = pd.read_excel(file_path)
+    matrix = build_sales_matrix(df, item_col, value_col, date_col)
+    missing_days = int((~matrix.mask).sum())
+    print(f"已加载 {file_path}: {matrix.shape[0]} 天 × {matrix.shape[1]} 个{item_col or '序列'}，"
+          f"补0的 (日期, 单品) 组合 {missing_days} 个")
+    return matrix
@@ -2,6 +2,10 @@ import pandas as pd
 import re
 import os
 
+from sales_stats import describe_groups
+from product_master import load_product_master
+from sales_sql import SalesDatabase
+
 def clean_item_name(name):
     """
     清洗单品名称，去除括号及括号内的内容
@@ -19,7 +23,8 @@ def get_representative_samples():
     完整的代表性样本筛选流程
     """
     # 文件路径
-    merged_file = r"D:\ObsidianLearning\数模\2023C\merged_data.xlsx"
+    master_file = r"D:\ObsidianLearning\数模\2023C\附件1.xlsx"
+    ledger_file = r"D:\ObsidianLearning\数模\2023C\附件2.xlsx"
     original_file = r"D:\ObsidianLearning\数模\2023C\cleaned_daily_sku_sales_cleaned.xlsx"
     
     print("="*60)
@@ -32,14 +37,22 @@ def get_representative_samples():
     print("\n【第一步】读取数据并进行分组聚合...")
     
     try:
-        # 读取合并后的数据
-        df_merged = pd.read_excel(merged_file)
-        print(f"成功读取文件: {merged_file}")
-        print(f"原始数据形状: {df_merged.shape}")
-        print(f"原始列名: {df_merged.columns.tolist()}")
+        # 商品主数据以整数单品编码为索引，销售流水只带整数编码
+        master = load_product_master(master_file)
+        
+        # 按整数单品编码汇总总销量的 groupby 下推到 SQL 引擎执行；
+        # 附件2只在文件变化后导入一次，之后的运行不再读取整个流水表
+        with SalesDatabase(os.path.dirname(ledger_file)) as db:
+            db.refresh(['ledger'])
+            sku_totals = db.aggregate('ledger', ['单品编码'], {'销量(千克)': 'SUM("销量(千克)")'})
+        print(f"成功读取文件: {master_file}, {ledger_file}")
+        
+        # 为汇总后的小表附加单品名称和分类名称
+        df_merged = master.attach_names(sku_totals)
+        print(f"单品汇总数据形状: {df_merged.shape}")
         
-        # 显示原始数据的前几行
-        print("\n原始数据示例（前5行）:")
+        # 显示汇总数据的前几行
+        print("\n单品汇总数据示例（前5行）:")
         print(df_merged.head())
         
     except Exception as e:
@@ -79,13 +92,9 @@ def get_representative_samples():
     
     # 显示每个品类的销量分布
     print("\n各品类销量统计:")
-    category_stats = sorted_sales.groupby('分类名称')['累计总销量(千克)'].agg([
-        ('单品数量', 'count'),
-        ('总销量', 'sum'),
-        ('平均销量', 'mean'),
-        ('最大销量', 'max'),
-        ('最小销量', 'min')
-    ]).round(2)
+    category_stats = describe_groups(sorted_sales, '分类名称', '累计总销量(千克)', date_col=None)
+    category_stats = category_stats[['count', 'sum', 'mean', 'max', 'min']].round(2)
+    category_stats.columns = ['单品数量', '总销量', '平均销量', '最大销量', '最小销量']
     print(category_stats)
     
     # =====================
@@ -211,7 +220,8 @@ def check_files():
     检查所需文件是否存在
     """
     files_to_check = [
-        r"D:\ObsidianLearning\数模\2023C\merged_data.xlsx",
+        r"D:\ObsidianLearning\数模\2023C\附件1.xlsx",
+        r"D:\ObsidianLearning\数模\2023C\附件2.xlsx",
         r"D:\ObsidianLearning\数模\2023C\cleaned_daily_sku_sales_cleaned.xlsx"
     ]
     
@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+from sales_matrix import SalesMatrix
+from feature_store import LRUCache, matrix_hash
+
+# 从粗到细的预聚合粒度：月、周、日
+RESOLUTIONS = ('MS', 'W', 'D')
+RESOLUTION_NAMES = {'MS': '月', 'W': '周', 'D': '日'}
+
+_rollup_cache = LRUCache(max_entries=16)
+
+
+def group_items(matrix, groups):
+    """
+    把单品列按分组标签汇总为新的矩阵（例如 单品 -> 品类）。
+
+    参数:
+    matrix (SalesMatrix): 日期×单品 矩阵。
+    groups (dict 或 pd.Series): 单品 -> 分组名称 的映射，未出现在映射中的单品被忽略。
+
+    返回:
+    SalesMatrix: 日期×分组 矩阵，mask 表示分组内当天是否有任何单品有记录。
+    """
+    labels = pd.Series(matrix.items).map(pd.Series(groups)).to_numpy()
+    keep = ~pd.isna(labels)
+    codes, group_names = pd.factorize(labels[keep], sort=True)
+
+    # 用 0/1 指示矩阵做一次矩阵乘法完成所有分组的求和
+    indicator = np.zeros((keep.sum(), len(group_names)), dtype=np.float64)
+    indicator[np.arange(len(codes)), codes] = 1.0
+    values = matrix.values[:, keep].astype(np.float64) @ indicator
+
+    mask = None
+    if matrix.mask is not None:
+        mask = (matrix.mask[:, keep].astype(np.float64) @ indicator) > 0
+    return SalesMatrix(values.astype(np.float32), matrix.dates, group_names, mask)
+
+
+def build_rollups(matrix):
+    """
+    为矩阵中所有序列预先计算 日/周/月 三个粒度的汇总，结果按矩阵内容缓存。
+
+    参数:
+    matrix (SalesMatrix): 日粒度的 日期×单品（或品类）矩阵。
+
+    返回:
+    dict: 键为 'D'、'W'、'MS'，值为 {'total': SalesMatrix（周期内销量合计），
+          'days': np.ndarray（每个周期包含的天数，用于换算为日均销量）}。
+    """
+    key = matrix_hash(matrix)
+    rollups = _rollup_cache.get(key)
+    if rollups is not None:
+        return rollups
+
+    rollups = {'D': {'total': matrix, 'days': np.ones(len(matrix.dates))}}
+    day_counts = pd.Series(1, index=matrix.dates)
+    for freq in ('W', 'MS'):
+        rollups[freq] = {
+            'total': matrix.resample(freq),
+            'days': day_counts.resample(freq).sum().to_numpy(dtype=np.float64),
+        }
+    _rollup_cache.put(key, rollups)
+    return rollups
+
+
+def choose_resolution(rollups, pixel_width):
+    """
+    选择仍能铺满图宽的最粗粒度：数据点数不少于像素宽度的最粗粒度，
+    如果日粒度都不够铺满，则使用日粒度。
+
+    参数:
+    rollups (dict): build_rollups 的结果。
+    pixel_width (float): 绘图区域的像素宽度。
+
+    返回:
+    str: 'MS'、'W' 或 'D'。
+    """
+    for freq in RESOLUTIONS:
+        if len(rollups[freq]['total'].dates) >= pixel_width:
+            return freq
+    return 'D'
+
+
+def minmax_downsample(x, y, n_buckets):
+    """
+    保留极值的降采样：把序列均分为 n_buckets 段，每段只保留最小值和最大值两个点
+    （按原顺序），尖峰和低谷在图上不会丢失。
+
+    参数:
+    x (array-like): 横坐标（日期或数值）。
+    y (array-like): 纵坐标。
+    n_buckets (int): 分段数，通常取绘图区域的像素宽度。
+
+    返回:
+    tuple: (x, y) 降采样后的数组；序列不超过 2×n_buckets 个点时原样返回。
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    n_buckets = int(n_buckets)
+    if n_buckets <= 0 or n <= 2 * n_buckets:
+        return x, y
+
+    bucket_size = -(-n // n_buckets)
+    padded_len = bucket_size * n_buckets
+    # 末段不足时用该段第一个值填充，不影响该段的极值
+    padded = np.empty(padded_len)
+    padded[:n] = y
+    last_start = (n - 1) // bucket_size * bucket_size
+    padded[n:] = y[last_start]
+
+    buckets = padded.reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    idx_min = offsets + buckets.argmin(axis=1)
+    idx_max = offsets + buckets.argmax(axis=1)
+
+    idx = np.sort(np.concatenate([idx_min, idx_max]))
+    idx = np.unique(np.minimum(idx, n - 1))
+    return x[idx], y[idx]
+
+
+def axes_pixel_width(ax, dpi=None):
+    """返回坐标轴绘图区域在输出分辨率下的像素宽度。"""
+    width_inches = ax.get_position().width * ax.figure.get_figwidth()
+    return width_inches * (dpi or ax.figure.dpi)
+
+
+def plot_rollup(ax, rollups, item, dpi=None, per_day=True, **plot_kwargs):
+    """
+    在坐标轴上按合适的粒度绘制单个序列。
+
+    先根据绘图区域的像素宽度选择最粗的预聚合粒度，再对超出像素宽度的部分做
+    保留极值的降采样，因此无论历史多长，绘制的点数都不超过像素宽度的两倍。
+
+    参数:
+    ax: matplotlib 坐标轴。
+    rollups (dict): build_rollups 的结果。
+    item: 单品/品类名称。
+    dpi (int 或 None): 输出分辨率，默认取 figure 的 dpi。
+    per_day (bool): 为 True 时把周/月合计换算为日均销量，保持纵轴单位不变。
+    **plot_kwargs: 传给 ax.plot 的参数。
+
+    返回:
+    str: 实际使用的粒度。
+    """
+    pixel_width = axes_pixel_width(ax, dpi)
+    freq = choose_resolution(rollups, pixel_width)
+    total = rollups[freq]['total']
+    values = total.values[:, total.column(item)].astype(np.float64)
+    if per_day:
+        values = values / rollups[freq]['days']
+
+    x, y = minmax_downsample(total.dates.to_numpy(), values, pixel_width)
+    ax.plot(x, y, **plot_kwargs)
+    return freq
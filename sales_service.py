@@ -0,0 +1,305 @@
+import asyncio
+import io
+import json
+import os
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from sales_matrix import load_sales_matrix
+from feature_store import LRUCache
+from holiday_calendar import KINDS, calendar_index, exclude_days
+
+# 服务可查询的数据集：名称 -> (文件路径, 分组列)
+DATASETS = {
+    'category': ('daily_category_sales.xlsx', '分类名称'),
+    'sku': ('cleaned_daily_sku_sales.xlsx', '单品名称'),
+    'representative': ('representative_daily_sales_final.xlsx', '单品名称'),
+}
+
+JSON_TYPE = 'application/json; charset=utf-8'
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+
+class QueryError(Exception):
+    """查询参数错误，返回给客户端的 4xx 响应。"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class SalesStore:
+    """
+    按需加载的日销量数据集。
+
+    每个数据集以 SalesMatrix 的形式常驻内存，数据版本由文件的修改时间和大小决定，
+    文件被重新生成后下一次查询会自动重新加载。
+    """
+
+    def __init__(self, datasets=None, base_folder='.'):
+        self.datasets = datasets or DATASETS
+        self.base_folder = base_folder
+        self._matrices = {}
+        self._lock = threading.Lock()
+
+    def version(self, dataset):
+        """返回数据集的版本号（文件修改时间和大小），用作缓存键的一部分。"""
+        path = self._path(dataset)
+        stat = os.stat(path)
+        return f'{stat.st_mtime_ns}-{stat.st_size}'
+
+    def _path(self, dataset):
+        if dataset not in self.datasets:
+            raise QueryError(f"未知的数据集 '{dataset}'，可选: {', '.join(self.datasets)}", 404)
+        path = os.path.join(self.base_folder, self.datasets[dataset][0])
+        if not os.path.exists(path):
+            raise QueryError(f"数据文件不存在: {path}", 404)
+        return path
+
+    def matrix(self, dataset):
+        """返回数据集的 SalesMatrix，文件有更新时重新加载。"""
+        version = self.version(dataset)
+        with self._lock:
+            cached = self._matrices.get(dataset)
+            if cached is None or cached[0] != version:
+                group_col = self.datasets[dataset][1]
+                cached = (version, load_sales_matrix(self._path(dataset), group_col))
+                self._matrices[dataset] = cached
+        return cached[1]
+
+
+def _item_column(matrix, item):
+    if item is None:
+        raise QueryError("缺少参数 item")
+    if item not in matrix.items:
+        raise QueryError(f"数据集中没有 '{item}'", 404)
+    return matrix.column(item)
+
+
+def query_core_stats(store, dataset):
+    """各分组的均值、中位数和标准差，口径与 analyze_sales_data 的核心统计量一致。"""
+    matrix = store.matrix(dataset)
+    observed = matrix.masked_values().astype(np.float64)
+    stats = pd.DataFrame({
+        '均值': np.nanmean(observed, axis=0),
+        '中位数': np.nanmedian(observed, axis=0),
+        '标准差': np.nanstd(observed, axis=0, ddof=1),
+    }, index=matrix.items).round(2)
+    return {'dataset': dataset, 'core_stats': stats.to_dict(orient='index')}
+
+
+def query_seasonal_pivot(store, dataset, item, exclude=()):
+    """单个分组的 月份×星期几 平均日销量，exclude 中的日期类型（如节假日）不计入均值。"""
+    from 可视化 import compute_month_weekday_means
+
+    matrix = store.matrix(dataset)
+    col = _item_column(matrix, item)
+    selected = matrix.select([matrix.items[col]])
+    if exclude:
+        selected = exclude_days(selected, exclude)
+    table = compute_month_weekday_means(selected)[0]
+    return {
+        'dataset': dataset,
+        'item': item,
+        'exclude': list(exclude),
+        'months': list(range(1, 13)),
+        'weekdays': ['周一', '周二', '周三', '周四', '周五', '周六', '周日'],
+        'mean_sales': [[None if np.isnan(v) else round(float(v), 3) for v in row] for row in table],
+    }
+
+
+def query_acf(store, dataset, item, max_lags, exclude=()):
+    """单个分组在连续日历上的ACF和95%置信区间，exclude 中的日期类型不参与计算。"""
+    from 云南生菜 import calculate_acf, calculate_confidence_bounds
+
+    if max_lags < 1:
+        raise QueryError(f"参数 lags 必须是正整数，当前为 {max_lags}")
+    matrix = store.matrix(dataset)
+    series = matrix.values[:, _item_column(matrix, item)].astype(np.float64)
+    max_lags = min(max_lags, len(series) - 1)
+    skipped = None
+    if exclude:
+        skipped = ~calendar_index(matrix.dates).day_mask(exclude)
+    acf_values = calculate_acf(series, max_lags, skipped)
+    n = len(series) if skipped is None else int((~skipped).sum())
+    return {
+        'dataset': dataset,
+        'item': item,
+        'exclude': list(exclude),
+        'acf': [round(float(v), 6) for v in acf_values],
+        'confidence_bound': float(calculate_confidence_bounds(n)),
+    }
+
+
+def render_chart(store, dataset, item):
+    """
+    绘制单个分组的日销量时间序列图，返回 PNG 字节串。
+    请求在线程池中并发处理，因此直接使用 Figure 对象而不经过 pyplot 的全局状态。
+    """
+    import matplotlib
+    from matplotlib.figure import Figure
+    from plotting import configure_fonts
+
+    configure_fonts(matplotlib.rcParams)
+
+    matrix = store.matrix(dataset)
+    series = matrix.series(matrix.items[_item_column(matrix, item)])
+
+    fig = Figure(figsize=(12, 5))
+    ax = fig.subplots()
+    ax.plot(series.index, series.values, linewidth=1.5, color='#2E86AB')
+    ax.set_title(f'{item} 日销量时间序列', fontsize=14, fontweight='bold')
+    ax.set_xlabel('销售日期')
+    ax.set_ylabel('销量(千克)')
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100)
+    return buffer.getvalue()
+
+
+class SalesService:
+    """
+    本地 asyncio HTTP 服务，以 JSON/PNG 形式提供汇总统计、季节性透视表、ACF 和图表。
+
+    接口:
+    GET /datasets
+    GET /core_stats?dataset=category
+    GET /seasonal_pivot?dataset=category&item=花叶类
+    GET /acf?dataset=sku&item=云南生菜&lags=30
+    GET /acf?dataset=sku&item=云南生菜&exclude=节假日,促销
+    GET /chart.png?dataset=category&item=花叶类
+
+    响应按 (路径, 查询参数, 数据版本) 缓存在进程内的 LRU 中，
+    仪表盘重复刷新时直接从内存返回；数据文件更新后版本号变化，旧缓存自然失效。
+    计算在线程池中执行，不阻塞事件循环。
+
+    参数:
+    store (SalesStore): 数据集。
+    cache_size (int): 响应缓存的最大条目数。
+    """
+
+    def __init__(self, store=None, cache_size=256):
+        self.store = store or SalesStore()
+        self.cache = LRUCache(max_entries=cache_size)
+
+    def handle(self, path, params):
+        """
+        处理一次查询，返回 (状态码, Content-Type, 响应体字节串, 是否命中缓存)。
+        """
+        dataset = params.get('dataset', 'category')
+        item = params.get('item')
+        exclude = self._kinds(params, 'exclude')
+
+        if path == '/datasets':
+            body = {name: {'file': file_name, 'group_col': group_col}
+                    for name, (file_name, group_col) in self.store.datasets.items()}
+            return 200, JSON_TYPE, self._json(body), False
+
+        routes = {
+            '/core_stats': lambda: self._json(query_core_stats(self.store, dataset)),
+            '/seasonal_pivot': lambda: self._json(query_seasonal_pivot(self.store, dataset, item, exclude)),
+            '/acf': lambda: self._json(query_acf(self.store, dataset, item, self._int(params, 'lags', 40),
+                                                 exclude)),
+            '/chart.png': lambda: render_chart(self.store, dataset, item),
+        }
+        if path not in routes:
+            raise QueryError(f"未知的接口 '{path}'", 404)
+
+        content_type = 'image/png' if path.endswith('.png') else JSON_TYPE
+        key = (path, tuple(sorted(params.items())), self.store.version(dataset))
+        body = self.cache.get(key)
+        if body is not None:
+            return 200, content_type, body, True
+
+        body = routes[path]()
+        self.cache.put(key, body)
+        return 200, content_type, body, False
+
+    @staticmethod
+    def _int(params, name, default):
+        try:
+            return int(params.get(name, default))
+        except ValueError:
+            raise QueryError(f"参数 {name} 必须是整数")
+
+    @staticmethod
+    def _kinds(params, name):
+        """解析逗号分隔的日期类型列表，例如 exclude=节假日,促销。"""
+        kinds = tuple(kind for kind in params.get(name, '').split(',') if kind)
+        unknown = [kind for kind in kinds if kind not in KINDS]
+        if unknown:
+            raise QueryError(f"参数 {name} 中存在未知的日期类型: {unknown}，可选 {list(KINDS)}")
+        return kinds
+
+    @staticmethod
+    def _json(payload):
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    async def _respond(self, writer, status, content_type, body, cache_hit=False):
+        headers = [
+            f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}',
+            f'Content-Type: {content_type}',
+            f'Content-Length: {len(body)}',
+            f'X-Cache: {"HIT" if cache_hit else "MISS"}',
+            'Connection: close',
+        ]
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            # 读完请求头，本服务不需要其中的内容
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            if not request_line:
+                return
+
+            parts = request_line.split()
+            if len(parts) < 2:
+                await self._respond(writer, 400, JSON_TYPE, self._json({'error': f'无效的请求行: {request_line}'}))
+                return
+            method, target = parts[:2]
+            if method != 'GET':
+                await self._respond(writer, 405, JSON_TYPE, self._json({'error': '只支持 GET'}))
+                return
+
+            url = urlsplit(target)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            loop = asyncio.get_running_loop()
+            try:
+                status, content_type, body, hit = await loop.run_in_executor(None, self.handle, url.path, params)
+            except QueryError as e:
+                status, content_type, body, hit = e.status, JSON_TYPE, self._json({'error': str(e)}), False
+            except Exception as e:
+                print(f"处理请求 {target} 时出错: {e}")
+                status, content_type, body, hit = 500, JSON_TYPE, self._json({'error': str(e)}), False
+            await self._respond(writer, status, content_type, body, hit)
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8050):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"销售数据服务已启动: http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+
+def main(host='127.0.0.1', port=8050):
+    """启动本地销售数据服务（Ctrl+C 退出）。"""
+    service = SalesService()
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        print("\n服务已停止。")
+
+
+if __name__ == '__main__':
+    main()
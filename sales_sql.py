@@ -0,0 +1,255 @@
+import importlib.util
+import os
+import threading
+
+import pandas as pd
+
+# 注册到 SQL 引擎中的表：表名 -> (文件名, 说明)
+# 源文件会被导入数据库文件，而不是原地查询；默认的 SQLite 引擎单线程执行，多线程需要另行安装 duckdb
+# 每张表只在源文件变化（修改时间或大小）后重新导入，其余时候直接使用数据库文件中的副本
+TABLES = {
+    'category_daily': ('daily_category_sales.xlsx', '品类日销量'),
+    'sku_daily': ('cleaned_daily_sku_sales.xlsx', '单品日销量（清洗后）'),
+    'products': ('附件1.xlsx', '商品信息'),
+    'ledger': ('附件2.xlsx', '销售流水明细'),
+    'wholesale_prices': ('附件3.xlsx', '批发价格'),
+    'loss_rates': ('附件4.xlsx', '品类损耗率'),
+}
+
+# 在表之上定义的视图：附加单品名称和分类名称，查询时不需要自己写连接
+VIEWS = {
+    'sku_prices': ('wholesale_prices', 'products', """
+        SELECT w."日期", w."单品编码", p."单品名称", p."分类编码", p."分类名称", w."批发价格(元/千克)"
+        FROM wholesale_prices AS w JOIN products AS p ON w."单品编码" = p."单品编码"
+    """),
+    'ledger_named': ('ledger', 'products', """
+        SELECT l.*, p."单品名称", p."分类编码", p."分类名称"
+        FROM ledger AS l JOIN products AS p ON l."单品编码" = p."单品编码"
+    """),
+}
+
+# 各表中的日期列：SQLite 中以 'YYYY-MM-DD' 文本保存，可直接使用 date()/strftime()
+DATE_COLUMNS = ('销售日期', '日期')
+
+
+def _read_table(name, path):
+    """按表名读取源文件为 DataFrame。"""
+    if name == 'products':
+        from product_master import load_product_master
+        master = load_product_master(path)
+        return pd.DataFrame({'单品编码': master.codes, '单品名称': master.names,
+                             '分类编码': master.category_codes, '分类名称': master.category_names})
+    if name == 'ledger':
+        from sales_ledger import load_ledger
+        return load_ledger(path)
+    if name == 'loss_rates':
+        df = pd.read_excel(path)
+        rate_col = [col for col in df.columns if str(col).startswith('平均损耗率')][0]
+        return df.rename(columns={'小分类编码': '分类编码', '小分类名称': '分类名称', rate_col: '平均损耗率(%)'})
+    return pd.read_excel(path)
+
+
+class SalesDatabase:
+    """
+    嵌入式 SQL 引擎上的销售数据库：日销量表、附件1~4 注册为表，并定义常用视图。
+
+    各源文件不是原地查询，而是导入为数据库文件中的表：只在修改时间或大小变化后重新导入一次，
+    之后的查询不再读取 Excel。
+    默认使用标准库的 SQLite，单线程执行查询，结果不受是否安装 duckdb 影响。
+    duckdb 不是本项目的依赖，需要自行安装（pip install duckdb）；安装后可用 engine='duckdb'，
+    或用 engine='auto' 在已安装时自动选用，查询在多个线程上并行执行（两种引擎的 SQL 方言略有不同）。
+
+    参数:
+    base_folder (str): 数据文件所在的文件夹。
+    engine (str): 'sqlite'（默认，单线程）、'duckdb'（多线程，需要安装 duckdb）
+                  或 'auto'（已安装 duckdb 时使用 duckdb，否则使用 SQLite）。
+    db_path (str 或 None): 数据库文件路径，默认为 base_folder 下的 sales.sqlite / sales.duckdb；
+                           ':memory:' 表示不落盘。
+    threads (int 或 None): duckdb 的查询线程数，默认使用全部CPU核心。
+    """
+
+    def __init__(self, base_folder='.', engine='sqlite', db_path=None, threads=None):
+        if engine == 'auto':
+            engine = 'duckdb' if importlib.util.find_spec('duckdb') is not None else 'sqlite'
+        if engine not in ('sqlite', 'duckdb'):
+            raise ValueError(f"不支持的 engine: {engine}，可选 'sqlite'、'duckdb' 或 'auto'")
+        self.engine = engine
+        self.base_folder = base_folder
+        if db_path is None:
+            db_path = os.path.join(base_folder, 'sales.sqlite' if engine == 'sqlite' else 'sales.duckdb')
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        if engine == 'sqlite':
+            import sqlite3
+            self._con = sqlite3.connect(db_path, check_same_thread=False)
+        else:
+            import duckdb
+            self._con = duckdb.connect(db_path)
+            self._con.execute(f"SET threads = {int(threads or os.cpu_count() or 1)}")
+        self._execute('CREATE TABLE IF NOT EXISTS _sources (name TEXT PRIMARY KEY, version TEXT)')
+
+    def __repr__(self):
+        return f"SalesDatabase({self.engine}, {self.db_path}, 表: {', '.join(self.tables())})"
+
+    def close(self):
+        self._con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            result = self._con.execute(sql, params)
+            if self.engine == 'sqlite':
+                self._con.commit()
+            return result
+
+    def _version(self, path):
+        stat = os.stat(path)
+        return f'{stat.st_mtime_ns}-{stat.st_size}'
+
+    def _stored_version(self, name):
+        rows = self._execute('SELECT version FROM _sources WHERE name = ?', (name,)).fetchall()
+        return rows[0][0] if rows else None
+
+    def _write_table(self, name, df):
+        df = df.copy()
+        for col in DATE_COLUMNS:
+            if col in df.columns and self.engine == 'sqlite':
+                df[col] = pd.to_datetime(df[col]).dt.strftime('%Y-%m-%d')
+        with self._lock:
+            if self.engine == 'sqlite':
+                df.to_sql(name, self._con, if_exists='replace', index=False)
+                self._con.commit()
+            else:
+                self._con.register('_incoming', df)
+                self._con.execute(f'CREATE OR REPLACE TABLE {name} AS SELECT * FROM _incoming')
+                self._con.unregister('_incoming')
+
+    def refresh(self, names=None):
+        """
+        导入源文件有变化（或尚未导入）的表，并重建依赖它们的视图。
+
+        参数:
+        names (list 或 None): 需要检查的表名，源文件不存在时抛出 FileNotFoundError；
+                              为 None 时检查 TABLES 中的全部表，跳过不存在的源文件。
+
+        返回:
+        list: 本次重新导入的表名。
+        """
+        loaded = []
+        for name in names or TABLES:
+            path = os.path.join(self.base_folder, TABLES[name][0])
+            if not os.path.exists(path):
+                if names is not None:
+                    raise FileNotFoundError(f"表 {name} 的源文件不存在: {path}")
+                continue
+            version = self._version(path)
+            if self._stored_version(name) == version:
+                continue
+            print(f"正在导入 {TABLES[name][1]} ({TABLES[name][0]}) -> 表 {name}")
+            self._write_table(name, _read_table(name, path))
+            self._execute('DELETE FROM _sources WHERE name = ?', (name,))
+            self._execute('INSERT INTO _sources VALUES (?, ?)', (name, version))
+            loaded.append(name)
+
+        available = set(self.tables())
+        for view, (*sources, sql) in VIEWS.items():
+            if set(sources) <= available:
+                self._execute(f'DROP VIEW IF EXISTS {view}')
+                self._execute(f'CREATE VIEW {view} AS {sql}')
+        return loaded
+
+    def tables(self):
+        """已导入的表名。"""
+        rows = self._execute('SELECT name FROM _sources ORDER BY name').fetchall()
+        return [row[0] for row in rows]
+
+    def query(self, sql, params=()):
+        """
+        执行 SQL 查询并返回 DataFrame。
+
+        参数:
+        sql (str): 查询语句，列名含括号等字符时用双引号括起，例如 "销量(千克)"。
+        params (tuple): 语句中 ? 占位符的参数。
+
+        返回:
+        pd.DataFrame: 查询结果。
+        """
+        with self._lock:
+            if self.engine == 'sqlite':
+                # 查询期间连接为只读，表只能通过 refresh 修改
+                self._con.execute('PRAGMA query_only = ON')
+                try:
+                    return pd.read_sql_query(sql, self._con, params=params)
+                finally:
+                    self._con.execute('PRAGMA query_only = OFF')
+            return self._con.execute(sql, params).df()
+
+    def aggregate(self, table, by, values, where=None, params=(), order_by=None):
+        """
+        把 groupby 聚合下推到 SQL 引擎执行，只把聚合后的小表取回 pandas。
+
+        参数:
+        table (str): 表或视图名。
+        by (list): 分组列。
+        values (dict): 输出列名 -> 聚合表达式，例如 {'总销量': 'SUM("销量(千克)")'}。
+        where (str 或 None): 过滤条件。
+        params (tuple): where 中 ? 占位符的参数。
+        order_by (str 或 None): 排序表达式。
+
+        返回:
+        pd.DataFrame: 聚合结果。
+        """
+        keys = ', '.join(f'"{col}"' for col in by)
+        exprs = ', '.join(f'{expr} AS "{name}"' for name, expr in values.items())
+        sql = f'SELECT {keys}, {exprs} FROM {table}'
+        if where:
+            sql += f' WHERE {where}'
+        sql += f' GROUP BY {keys}'
+        if order_by:
+            sql += f' ORDER BY {order_by}'
+        return self.query(sql, params)
+
+
+def open_database(base_folder='.', engine='sqlite', db_path=None):
+    """打开数据库并导入有变化的表。"""
+    database = SalesDatabase(base_folder, engine, db_path)
+    database.refresh()
+    return database
+
+
+if __name__ == '__main__':
+    with open_database() as db:
+        print(db)
+
+        # 示例：2023年第二季度有销售记录不少于20天的单品，按品类取总销量前3名
+        # 日期条件写成范围比较，SQLite 和 duckdb 都能执行
+        top_skus = db.query("""
+            SELECT 分类名称, 单品名称, 销售天数, 总销量
+            FROM (
+                SELECT p."分类名称" AS 分类名称, s."单品名称" AS 单品名称,
+                       COUNT(DISTINCT s."销售日期") AS 销售天数, SUM(s."销量(千克)") AS 总销量,
+                       ROW_NUMBER() OVER (PARTITION BY p."分类名称" ORDER BY SUM(s."销量(千克)") DESC) AS 排名
+                FROM sku_daily AS s
+                JOIN (SELECT DISTINCT "单品名称", "分类名称" FROM products) AS p ON s."单品名称" = p."单品名称"
+                WHERE s."销售日期" >= ? AND s."销售日期" < ? AND s."销量(千克)" > 0
+                GROUP BY p."分类名称", s."单品名称"
+                HAVING COUNT(DISTINCT s."销售日期") >= 20
+            )
+            WHERE 排名 <= 3
+            ORDER BY 分类名称, 排名
+        """, ('2023-04-01', '2023-07-01'))
+        print("\n2023年第二季度销售天数≥20的各品类前3名单品:")
+        print(top_skus.round(2).to_string(index=False))
+
+        monthly = db.aggregate('category_daily', ['分类名称'],
+                               {'日均销量': 'AVG("销量(千克)")', '天数': 'COUNT(*)'},
+                               where='"销售日期" >= ?', params=('2023-01-01',), order_by='"日均销量" DESC')
+        print("\n2023年以来各品类日均销量:")
+        print(monthly.round(2).to_string(index=False))
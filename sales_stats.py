@@ -0,0 +1,278 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import LRUCache, data_hash
+
+# 描述性统计的列，前几列与 pandas agg 的名称一致，便于直接替换原有的 groupby().agg()
+PROFILE_COLUMNS = ['count', 'sum', 'mean', 'std', 'min', 'q25', 'median', 'q75', 'max',
+                   'cv', 'zero_share', 'trend_slope']
+
+# 统计结果按输入数据的哈希保存为 npz，多个脚本（各自独立的进程）读取同一份数据时直接复用；
+# 最多保留 CACHE_MAX_FILES 个文件，超出时删除最久未使用的（数据更新后旧版本的结果会被逐步淘汰）
+CACHE_FOLDER = '.sales_stats_cache'
+CACHE_MAX_FILES = 16
+
+_profile_cache = LRUCache(max_entries=32)
+
+
+def _run_starts(*keys):
+    """返回已排序键数组中每一段相同取值的起始位置。"""
+    n = len(keys[0])
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def _sorted_quantile(values, starts, counts, q):
+    """在组内已升序排列的数组上按线性插值计算分位数（与 pandas 默认口径一致）。"""
+    pos = (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, counts - 1)
+    frac = pos - lo
+    lower = values[starts + lo]
+    upper = values[starts + hi]
+    return lower + frac * (upper - lower)
+
+
+def _is_nested(codes_list):
+    """每个最细层级的分组是否只属于一个上级分组（例如每个单品只属于一个品类）。"""
+    finest = codes_list[-1]
+    pairs = np.unique(np.stack(codes_list), axis=1).shape[1]
+    return pairs == len(np.unique(finest))
+
+
+def _daily_rows(codes_list, values, days):
+    """
+    一次排序得到所有层级的日合计。
+
+    按 (第一层, 日期, 第二层, …) 排序后，任意层级的 (分组, 日期) 都是连续的一段，
+    各层级的日合计都由同一个排序结果 reduceat 得到。
+    要求层级是嵌套的（细层级的每个分组只属于一个上级分组）。
+
+    返回:
+    list: 每个层级一个 (分组编码, 日期, 日合计) 元组。
+    """
+    keys = [codes_list[0], days, *codes_list[1:]]
+    order = np.lexsort(keys[::-1])
+    codes_list = [codes[order] for codes in codes_list]
+    days, values = days[order], values[order]
+
+    rows = []
+    for depth in range(len(codes_list)):
+        starts = _run_starts(codes_list[0], days, *codes_list[1:depth + 1])
+        totals = np.add.reduceat(values, starts) if len(starts) else values[:0]
+        rows.append((codes_list[depth][starts], days[starts], totals))
+    return rows
+
+
+def _profile(codes, values, days, n_groups):
+    """
+    对若干分组计算完整的描述性统计，所有分组按 (分组, 数值) 只排序一次。
+
+    参数:
+    codes (np.ndarray): 每行的分组编码（0..n_groups-1）。
+    values (np.ndarray): 每行的数值（日合计或单次观测）。
+    days (np.ndarray 或 None): 每行的日期（整数天）；为 None 时零销量占比按行计算，趋势斜率为 NaN。
+    n_groups (int): 分组个数。
+
+    返回:
+    dict: 列名 -> 长度为 n_groups 的数组，没有数据的分组为 NaN（count 为0）。
+    """
+    # 组内按数值升序后，分位数、最值都只需按位置取值
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    if days is not None:
+        days = days[order]
+
+    starts = _run_starts(codes)
+    counts = np.diff(np.append(starts, len(codes)))
+    group_ids = codes[starts]
+
+    sums = np.add.reduceat(values, starts)
+    means = sums / counts
+    deviations = values - np.repeat(means, counts)
+    sq_dev = np.add.reduceat(deviations ** 2, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(sq_dev / (counts - 1))
+        cv = std / means
+
+    profile = {
+        'count': counts,
+        'sum': sums,
+        'mean': means,
+        'std': std,
+        'min': values[starts],
+        'q25': _sorted_quantile(values, starts, counts, 0.25),
+        'median': _sorted_quantile(values, starts, counts, 0.5),
+        'q75': _sorted_quantile(values, starts, counts, 0.75),
+        'max': values[starts + counts - 1],
+        'cv': cv,
+    }
+
+    if days is not None:
+        # 零销量天占比：分组活跃区间（首次到末次出现）中没有正销量的天数占比
+        first_day = np.minimum.reduceat(days, starts)
+        last_day = np.maximum.reduceat(days, starts)
+        span = (last_day - first_day + 1).astype(np.float64)
+        positive_days = np.add.reduceat((values > 0).astype(np.float64), starts)
+        profile['zero_share'] = 1.0 - positive_days / span
+
+        # 趋势斜率：日销量对日期的最小二乘斜率（千克/天）
+        t = days.astype(np.float64)
+        t_dev = t - np.repeat(np.add.reduceat(t, starts) / counts, counts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            profile['trend_slope'] = (np.add.reduceat(t_dev * deviations, starts)
+                                      / np.add.reduceat(t_dev ** 2, starts))
+    else:
+        profile['zero_share'] = np.add.reduceat((values == 0).astype(np.float64), starts) / counts
+        profile['trend_slope'] = np.full(len(starts), np.nan)
+
+    result = {}
+    for name, column in profile.items():
+        full = np.zeros(n_groups) if name == 'count' else np.full(n_groups, np.nan)
+        full[group_ids] = column
+        result[name] = full
+    return result
+
+
+def _profile_levels(codes_list, values, days, n_groups):
+    """
+    计算所有层级的统计量：一次按键排序得到各层级的日合计（_daily_rows），
+    再把各层级的分组编码错开后合并，一次按数值排序算出全部统计量。
+
+    参数:
+    codes_list (list): 由粗到细每个层级的分组编码数组。
+    values (np.ndarray): 数值。
+    days (np.ndarray 或 None): 日期（整数天）。
+    n_groups (list): 每个层级的分组个数。
+
+    返回:
+    list: 每个层级一个 dict（列名 -> 数组）。
+    """
+    if days is None:
+        rows = [(codes, None, values) for codes in codes_list]
+    elif _is_nested(codes_list):
+        rows = _daily_rows(codes_list, values, days)
+    else:
+        # 细层级的分组跨多个上级分组时，各层级的 (分组, 日期) 不能由同一次排序连续得到
+        print("提示：分组层级不是嵌套关系，各层级分别排序计算日合计")
+        rows = [_daily_rows([codes], values, days)[0] for codes in codes_list]
+
+    offsets = np.concatenate([[0], np.cumsum(n_groups)])
+    codes = np.concatenate([level_codes + offset for (level_codes, _, _), offset in zip(rows, offsets)])
+    merged_values = np.concatenate([level_values for _, _, level_values in rows])
+    merged_days = None if days is None else np.concatenate([level_days for _, level_days, _ in rows])
+    merged = _profile(codes, merged_values, merged_days, int(offsets[-1]))
+    return [{name: column[offsets[i]:offsets[i + 1]] for name, column in merged.items()}
+            for i in range(len(codes_list))]
+
+
+def _cache_path(cache_folder, key):
+    return os.path.join(cache_folder, f'{key}.npz')
+
+
+def _load_cached(cache_folder, key, levels):
+    path = None if cache_folder is None else _cache_path(cache_folder, key)
+    if path is None or not os.path.exists(path):
+        return None
+    # 更新修改时间，淘汰时按最近使用的顺序保留
+    os.utime(path)
+    with np.load(path, allow_pickle=False) as data:
+        return {level: pd.DataFrame(data[f'{i}_values'], columns=PROFILE_COLUMNS,
+                                    index=pd.Index(data[f'{i}_index'], name=level)).astype({'count': np.int64})
+                for i, level in enumerate(levels)}
+
+
+def _save_cached(cache_folder, key, profiles):
+    if cache_folder is None:
+        return
+    os.makedirs(cache_folder, exist_ok=True)
+    arrays = {}
+    for i, profile in enumerate(profiles.values()):
+        index = profile.index.to_numpy()
+        arrays[f'{i}_index'] = index if index.dtype.kind in 'iuf' else index.astype(str)
+        arrays[f'{i}_values'] = profile.to_numpy(dtype=np.float64)
+    np.savez(_cache_path(cache_folder, key), **arrays)
+
+    paths = [os.path.join(cache_folder, name) for name in os.listdir(cache_folder) if name.endswith('.npz')]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[CACHE_MAX_FILES:]:
+        try:
+            os.remove(path)
+        except OSError:
+            # 其他进程可能同时在清理同一个文件夹
+            pass
+
+
+def describe_hierarchy(df, levels=('分类名称', '单品名称'), value_col='销量(千克)', date_col='销售日期',
+                       cache_folder=CACHE_FOLDER):
+    """
+    对多个嵌套的分组层级（例如品类和单品）同时计算描述性统计：计数、合计、均值、标准差、
+    最值、四分位数、变异系数、零销量天占比和趋势斜率。
+
+    给出日期列时，先把同一分组同一天的记录合并为日合计，统计量均基于日序列；
+    所有层级的日合计来自同一次按 (第一层, 日期, 其余层) 的排序，
+    分位数所需的组内排序也对所有层级合并后只做一次。
+
+    结果先在进程内缓存，再按输入数据的哈希保存到 cache_folder 下的 npz 文件，
+    其他脚本读取相同数据时直接加载，不再重新计算；文件夹中只保留最近使用的 CACHE_MAX_FILES 个文件。
+
+    参数:
+    df (pd.DataFrame): 长表格式的数据。
+    levels (tuple): 由粗到细的分组列名，数据中不存在的列会被跳过。
+    value_col (str): 数值列名。
+    date_col (str 或 None): 日期列名；为 None 时每行视为一次观测，零销量占比按行计算，趋势斜率为 NaN。
+    cache_folder (str 或 None): 磁盘缓存文件夹，为 None 时只使用进程内缓存。
+
+    返回:
+    dict: 分组列名 -> 以分组名称为索引、PROFILE_COLUMNS 为列的统计表。
+    """
+    levels = [level for level in levels if level in df.columns]
+    if not levels:
+        return {}
+    factorized = [pd.factorize(df[level], sort=True) for level in levels]
+    values = pd.to_numeric(df[value_col], errors='coerce').to_numpy(dtype=np.float64)
+    days = None
+    if date_col is not None:
+        days = pd.to_datetime(df[date_col]).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    hash_arrays = [values, days if days is not None else np.empty(0)]
+    for codes, names in factorized:
+        hash_arrays += [codes, np.asarray(names)]
+    key = data_hash(*hash_arrays, np.asarray([*levels, value_col, str(date_col)]))
+
+    profiles = _profile_cache.get(key)
+    if profiles is None:
+        profiles = _load_cached(cache_folder, key, levels)
+    if profiles is None:
+        # 数值为空的行不参与统计；某一层级分组为空的行归入该层级末尾的占位分组，
+        # 只在该层级的结果中去掉，其余层级照常统计，与逐列 groupby().agg() 的口径一致
+        keep = ~np.isnan(values)
+        codes_list = [np.where(codes < 0, len(names), codes)[keep] for codes, names in factorized]
+        results = _profile_levels(codes_list, values[keep], days[keep] if days is not None else None,
+                                  [len(names) + 1 for _, names in factorized])
+        profiles = {}
+        for level, (_, names), result in zip(levels, factorized, results):
+            result = {name: column[:len(names)] for name, column in result.items()}
+            profile = pd.DataFrame(result, index=pd.Index(names, name=level))[PROFILE_COLUMNS]
+            profiles[level] = profile[profile['count'] > 0].astype({'count': np.int64})
+        _save_cached(cache_folder, key, profiles)
+    _profile_cache.put(key, profiles)
+    return {level: profile.copy() for level, profile in profiles.items()}
+
+
+def describe_groups(df, group_col, value_col='销量(千克)', date_col='销售日期', cache_folder=CACHE_FOLDER):
+    """
+    按单个分组列计算描述性统计，参数和返回值的含义同 describe_hierarchy。
+
+    返回:
+    pd.DataFrame: 以分组名称为索引的统计表，列见 PROFILE_COLUMNS。
+    """
+    if group_col not in df.columns:
+        raise KeyError(group_col)
+    return describe_hierarchy(df, (group_col,), value_col, date_col, cache_folder)[group_col]
@@ -0,0 +1,243 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from feature_store import WEEKDAY_NAMES, LRUCache, matrix_hash
+from sales_matrix import load_sales_matrix
+
+# 分解的季节周期（天）；周季节性以星期几为相位
+PERIOD = 7
+
+_decomposition_cache = LRUCache(max_entries=16)
+
+
+def _centered_mean(values, weights, window):
+    """
+    按列计算居中滑动加权均值（累积和实现，所有列一次完成）。
+
+    两端不足一个窗口的位置使用收缩的窗口，权重为0的位置（未出现的日期）不参与均值。
+
+    参数:
+    values (np.ndarray): (日期数, 序列数) 的 float64 数组。
+    weights (np.ndarray): 与 values 同形状的 0/1 权重。
+    window (int): 奇数窗口长度。
+
+    返回:
+    np.ndarray: 与 values 同形状的滑动均值，窗口内没有有效值的位置为 NaN。
+    """
+    n = values.shape[0]
+    half = window // 2
+    zero = np.zeros((1, values.shape[1]))
+    value_sum = np.concatenate([zero, np.cumsum(values * weights, axis=0)])
+    weight_sum = np.concatenate([zero, np.cumsum(weights, axis=0)])
+    lo = np.clip(np.arange(n) - half, 0, n)
+    hi = np.clip(np.arange(n) + half + 1, 0, n)
+    total = value_sum[hi] - value_sum[lo]
+    count = weight_sum[hi] - weight_sum[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _weekday_medians(detrended, phase):
+    """
+    对每个序列计算各相位（星期几）去趋势值的中位数，并中心化使7个值之和为0。
+
+    参数:
+    detrended (np.ndarray): (日期数, 序列数) 的去趋势数组，未出现的日期为 NaN。
+    phase (np.ndarray): 每个日期的星期几（0=周一）。
+
+    返回:
+    np.ndarray: (7, 序列数) 的季节因子。
+    """
+    factors = np.zeros((PERIOD, detrended.shape[1]))
+    with warnings.catch_warnings():
+        # 某个星期几全为 NaN 时 nanmedian 会告警，这些位置随后记为0
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for day in range(PERIOD):
+            factors[day] = np.nanmedian(detrended[phase == day], axis=0)
+    factors = np.nan_to_num(factors)
+    return factors - factors.mean(axis=0, keepdims=True)
+
+
+class Decomposition:
+    """
+    所有序列的 趋势 + 周季节 + 残差 分解结果（加法模型：销量 = 趋势 + 季节 + 残差）。
+
+    属性:
+    dates (pd.DatetimeIndex): 日期轴。
+    items (pd.Index): 序列名称轴。
+    trend (np.ndarray): (日期数, 序列数) 趋势分量，float32。
+    seasonal (np.ndarray): (日期数, 序列数) 季节分量，float32。
+    residual (np.ndarray): (日期数, 序列数) 残差分量，float32；未出现的日期为 NaN。
+    weekday_factors (np.ndarray): (7, 序列数) 各星期几的季节因子，行0为周一。
+    """
+
+    def __init__(self, dates, items, trend, seasonal, residual, weekday_factors):
+        self.dates = pd.DatetimeIndex(dates)
+        self.items = pd.Index(items)
+        self.trend = np.asarray(trend, dtype=np.float32)
+        self.seasonal = np.asarray(seasonal, dtype=np.float32)
+        self.residual = np.asarray(residual, dtype=np.float32)
+        self.weekday_factors = np.asarray(weekday_factors, dtype=np.float64)
+
+    def __repr__(self):
+        return (f"Decomposition({len(self.dates)} 天 × {len(self.items)} 个序列, "
+                f"{self.dates.min().date()} 至 {self.dates.max().date()})")
+
+    def components(self, item):
+        """
+        取出单个序列的三个分量。
+
+        返回:
+        pd.DataFrame: 以日期为索引，列为 趋势、季节、残差。
+        """
+        col = self.items.get_loc(item)
+        return pd.DataFrame({
+            '趋势': self.trend[:, col],
+            '季节': self.seasonal[:, col],
+            '残差': self.residual[:, col],
+        }, index=self.dates)
+
+    def deseasonalized(self):
+        """季节调整后的矩阵（趋势 + 残差），未出现的日期为 NaN。"""
+        return self.trend + self.residual
+
+    def strength(self, min_weeks=4):
+        """
+        各序列的趋势强度和季节强度（0~1，越大分量越显著）：
+        F_T = max(0, 1 - Var(R) / Var(T + R))，F_S = max(0, 1 - Var(R) / Var(S + R))。
+        有效记录不足 min_weeks 周的序列记为 NaN（残差太少时强度没有意义）。
+
+        返回:
+        pd.DataFrame: 以序列名称为索引，列为 趋势强度、季节强度。
+        """
+        with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            resid_var = np.nanvar(self.residual, axis=0)
+            trend_strength = 1 - resid_var / np.nanvar(self.trend + self.residual, axis=0)
+            seasonal_strength = 1 - resid_var / np.nanvar(self.seasonal + self.residual, axis=0)
+        too_short = np.sum(~np.isnan(self.residual), axis=0) < min_weeks * PERIOD
+        trend_strength[too_short] = np.nan
+        seasonal_strength[too_short] = np.nan
+        return pd.DataFrame({
+            '趋势强度': np.clip(trend_strength, 0, 1),
+            '季节强度': np.clip(seasonal_strength, 0, 1),
+        }, index=self.items)
+
+    def weekday_table(self):
+        """各序列的星期几季节因子表（行为序列，列为周一至周日）。"""
+        return pd.DataFrame(self.weekday_factors.T, index=self.items, columns=WEEKDAY_NAMES)
+
+    def save(self, file_path, source_hash=''):
+        """保存为 .npz 文件，source_hash 记录分解所用矩阵的内容哈希。"""
+        np.savez_compressed(
+            file_path,
+            dates=self.dates.to_numpy(dtype='datetime64[ns]').view(np.int64),
+            items=np.asarray(self.items, dtype=str),
+            trend=self.trend,
+            seasonal=self.seasonal,
+            residual=self.residual,
+            weekday_factors=self.weekday_factors,
+            source_hash=np.asarray(source_hash),
+        )
+
+    @classmethod
+    def load(cls, file_path):
+        """从 save 生成的 .npz 文件读取，返回 (Decomposition, source_hash)。"""
+        with np.load(file_path) as data:
+            dates = pd.DatetimeIndex(data['dates'].view('datetime64[ns]'))
+            decomposition = cls(dates, data['items'], data['trend'], data['seasonal'],
+                                data['residual'], data['weekday_factors'])
+            return decomposition, str(data['source_hash'])
+
+
+def decompose(matrix, trend_window=7, iterations=2, use_mask=True):
+    """
+    对矩阵中的所有序列做 STL 风格的加法分解：趋势、周季节和残差。
+
+    每轮迭代先用居中滑动均值估计趋势（第一轮在原始数据上，之后在季节调整后的数据上），
+    再按星期几对去趋势值取中位数得到季节因子；中位数对促销尖峰不敏感。
+    所有序列在同一次累积和和同一组按星期几的中位数运算中完成。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×序列 矩阵（日期轴逐日连续）。
+    trend_window (int): 趋势滑动窗口（天），必须为奇数；取7的倍数时可完全平滑掉周季节。
+    iterations (int): 趋势/季节交替估计的轮数。
+    use_mask (bool): 为 True 时原始数据中不存在的日期不参与趋势和季节估计，其残差为 NaN。
+
+    返回:
+    Decomposition: 分解结果，按矩阵内容和参数缓存。
+    """
+    if trend_window % 2 == 0:
+        raise ValueError(f"trend_window 必须为奇数，当前为 {trend_window}")
+
+    key = (matrix_hash(matrix), trend_window, iterations, use_mask)
+    cached = _decomposition_cache.get(key)
+    if cached is not None:
+        return cached
+
+    values = matrix.values.astype(np.float64)
+    if use_mask and matrix.mask is not None:
+        weights = matrix.mask.astype(np.float64)
+    else:
+        weights = np.ones_like(values)
+    observed = weights > 0
+    phase = matrix.dates.dayofweek.to_numpy()
+
+    seasonal = np.zeros_like(values)
+    factors = np.zeros((PERIOD, values.shape[1]))
+    for _ in range(max(iterations, 1)):
+        trend = _centered_mean(values - seasonal, weights, trend_window)
+        detrended = np.where(observed, values - trend, np.nan)
+        factors = _weekday_medians(detrended, phase)
+        seasonal = factors[phase]
+
+    # 整列都没有记录时趋势为 NaN，这里记为0，残差仍保持 NaN
+    trend = np.nan_to_num(trend)
+    residual = np.where(observed, values - trend - seasonal, np.nan)
+
+    decomposition = Decomposition(matrix.dates, matrix.items, trend, seasonal, residual, factors)
+    _decomposition_cache.put(key, decomposition)
+    return decomposition
+
+
+def load_or_decompose(matrix, file_path, **kwargs):
+    """
+    读取已保存的分解结果；文件不存在或对应的矩阵内容已变化时重新分解并保存。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×序列 矩阵。
+    file_path (str): .npz 文件路径。
+    **kwargs: 传给 decompose 的参数。
+
+    返回:
+    Decomposition: 分解结果。
+    """
+    source_hash = f"{matrix_hash(matrix)}-{sorted(kwargs.items())}"
+    if os.path.exists(file_path):
+        decomposition, saved_hash = Decomposition.load(file_path)
+        if saved_hash == source_hash:
+            print(f"已读取分解结果: {file_path}")
+            return decomposition
+    decomposition = decompose(matrix, **kwargs)
+    decomposition.save(file_path, source_hash)
+    print(f"分解结果已保存到 '{file_path}'")
+    return decomposition
+
+
+if __name__ == '__main__':
+    category_matrix = load_sales_matrix('daily_category_sales.xlsx', '分类名称')
+    category_decomposition = load_or_decompose(category_matrix, 'category_decomposition.npz')
+    print(category_decomposition)
+    print("\n各品类的趋势强度和季节强度:")
+    print(category_decomposition.strength().round(3))
+    print("\n各品类的星期几季节因子（千克）:")
+    print(category_decomposition.weekday_table().round(2))
+
+    sku_matrix = load_sales_matrix('cleaned_daily_sku_sales.xlsx', '单品名称')
+    sku_decomposition = load_or_decompose(sku_matrix, 'sku_decomposition.npz')
+    print(sku_decomposition)
+    print("\n季节强度最高的10个单品:")
+    print(sku_decomposition.strength().dropna().sort_values('季节强度', ascending=False).head(10).round(3))
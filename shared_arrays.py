@@ -0,0 +1,231 @@
+import json
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from sales_matrix import SalesMatrix
+
+# 工作进程中已挂载的共享数据，由 _init_worker 设置，get_worker_data 读取
+_worker_state = {}
+
+# 3.13 之前挂载时需要临时替换 resource_tracker.register（见 _attach_block），
+# 本模块中创建和挂载共享内存都持有这把锁，其他线程不会在替换期间创建内存块而漏掉登记
+_tracker_lock = threading.Lock()
+
+
+def _attach_block(name):
+    """
+    按名称挂载已存在的共享内存块。
+    挂载方不负责删除共享内存，因此不向 resource_tracker 登记，
+    避免工作进程退出时把发布方仍在使用的内存块提前清理掉。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 之前没有 track 参数。fork 出的工作进程与发布方共用同一个
+        # resource_tracker，挂载后再取消登记会连发布方的登记一起删掉，
+        # 因此在挂载期间临时跳过登记（持有 _tracker_lock，替换只影响本次挂载）
+        with _tracker_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                return shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+
+def _encode_metadata(matrix, dictionaries):
+    """把坐标轴标签和名称/编码字典序列化为 JSON 字节串。"""
+    metadata = {
+        'items': [str(item) if not isinstance(item, (int, np.integer)) else int(item)
+                  for item in matrix.items],
+        'dictionaries': {
+            name: {str(key): value for key, value in mapping.items()}
+            for name, mapping in (dictionaries or {}).items()
+        },
+    }
+    return json.dumps(metadata, ensure_ascii=False).encode('utf-8')
+
+
+class SharedSalesMatrix:
+    """
+    把 SalesMatrix 及名称/编码字典发布到共享内存或内存映射的 .npy 文件中。
+
+    发布方持有本对象，工作进程只拿到 handle（一个很小的可 pickle 的字典），
+    通过 attach_sales_matrix(handle) 按名称零拷贝挂载，
+    因此进程池扇出时内存中只有一份销量矩阵。
+
+    参数:
+    matrix (SalesMatrix): 需要发布的矩阵。
+    dictionaries (dict 或 None): 需要一起发布的字典，例如 {'单品名称': {编码: 名称}}。
+                                字典的键会被转换为字符串。
+    backend (str): 'shm' 使用 multiprocessing.shared_memory，'npy' 使用内存映射文件。
+    folder (str 或 None): backend='npy' 时 .npy 文件所在目录，默认使用临时目录。
+
+    用法:
+    with SharedSalesMatrix(matrix, {'单品名称': names}) as handle:
+        with ProcessPoolExecutor(initializer=..., initargs=(handle,)) as executor:
+            ...
+    """
+
+    def __init__(self, matrix, dictionaries=None, backend='shm', folder=None):
+        if backend not in ('shm', 'npy'):
+            raise ValueError(f"不支持的 backend: {backend}，可选 'shm' 或 'npy'")
+        self.backend = backend
+        self._blocks = []
+        self._files = []
+        self._owns_folder = False
+
+        metadata = np.frombuffer(_encode_metadata(matrix, dictionaries), dtype=np.uint8)
+        mask = matrix.mask if matrix.mask is not None else np.ones(matrix.shape, dtype=bool)
+        arrays = {
+            'values': np.ascontiguousarray(matrix.values, dtype=np.float32),
+            'mask': np.ascontiguousarray(mask, dtype=bool),
+            'dates': matrix.dates.to_numpy(dtype='datetime64[ns]').view(np.int64),
+            'metadata': metadata,
+        }
+
+        if backend == 'npy' and folder is None:
+            folder = tempfile.mkdtemp(prefix='sales_matrix_')
+            self._owns_folder = True
+        self.folder = folder
+
+        prefix = uuid.uuid4().hex[:12]
+        self.handle = {'backend': backend, 'arrays': {}}
+        try:
+            for key, array in arrays.items():
+                self.handle['arrays'][key] = self._publish(f'{prefix}_{key}', array)
+        except BaseException:
+            # 构造失败时 __exit__ 不会执行，先释放已经创建的内存块和文件再抛出
+            self.close()
+            raise
+
+    def _publish(self, name, array):
+        spec = {'shape': array.shape, 'dtype': array.dtype.str}
+        if self.backend == 'shm':
+            # 共享内存块的大小不能为0
+            with _tracker_lock:
+                block = shared_memory.SharedMemory(name=name, create=True, size=max(array.nbytes, 1))
+            # 创建后立即登记，写入失败时 close 也能释放
+            self._blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            spec['name'] = block.name
+        else:
+            path = os.path.join(self.folder, f'{name}.npy')
+            self._files.append(path)
+            np.save(path, array)
+            spec['path'] = path
+        return spec
+
+    def close(self):
+        """释放发布的共享内存块或删除 .npy 文件。所有工作进程退出后调用。"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        for path in self._files:
+            if os.path.exists(path):
+                os.remove(path)
+        self._files = []
+        if self._owns_folder and os.path.isdir(self.folder):
+            os.rmdir(self.folder)
+            self._owns_folder = False
+
+    def __enter__(self):
+        return self.handle
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class AttachedSalesMatrix:
+    """
+    工作进程中挂载的共享矩阵。
+
+    属性:
+    matrix (SalesMatrix): 直接引用共享内存的只读矩阵（values 和 mask 不复制）。
+    dictionaries (dict): 与矩阵一起发布的名称/编码字典。
+
+    调用 close() 之后不能再使用 matrix 及从中切出的视图。
+    """
+
+    def __init__(self, handle):
+        self._blocks = []
+        arrays = {}
+        for key, spec in handle['arrays'].items():
+            arrays[key] = self._attach(handle['backend'], spec)
+
+        metadata = json.loads(arrays.pop('metadata').tobytes().decode('utf-8'))
+        dates = pd.DatetimeIndex(arrays['dates'].view('datetime64[ns]'))
+        self.matrix = SalesMatrix(arrays['values'], dates, metadata['items'], arrays['mask'])
+        self.dictionaries = metadata['dictionaries']
+
+    def _attach(self, backend, spec):
+        if backend == 'shm':
+            block = _attach_block(spec['name'])
+            self._blocks.append(block)
+            array = np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=block.buf)
+            array.flags.writeable = False
+            return array
+        return np.load(spec['path'], mmap_mode='r')
+
+    def close(self):
+        """解除挂载。共享内存由发布方负责删除，这里只关闭本进程的映射。"""
+        self.matrix = None
+        self.dictionaries = None
+        for block in self._blocks:
+            block.close()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def attach_sales_matrix(handle):
+    """按 handle 挂载共享矩阵，返回 AttachedSalesMatrix（可用作上下文管理器）。"""
+    return AttachedSalesMatrix(handle)
+
+
+def _init_worker(handle):
+    """进程池初始化函数：每个工作进程只挂载一次共享数据。"""
+    _worker_state['attached'] = attach_sales_matrix(handle)
+
+
+def get_worker_data():
+    """
+    在工作进程中获取已挂载的矩阵和字典。
+
+    返回:
+    tuple: (SalesMatrix, dict)。
+    """
+    attached = _worker_state.get('attached')
+    if attached is None:
+        raise RuntimeError("当前进程没有挂载共享矩阵，请通过 shared_process_pool 创建进程池")
+    return attached.matrix, attached.dictionaries
+
+
+def shared_process_pool(handle, max_workers=None):
+    """
+    创建一个在每个工作进程中自动挂载共享矩阵的进程池。
+
+    任务函数中调用 get_worker_data() 取得矩阵，提交任务时只需传列号、单品名等小参数。
+
+    参数:
+    handle (dict): SharedSalesMatrix 的 handle。
+    max_workers (int 或 None): 进程数。
+
+    返回:
+    ProcessPoolExecutor: 进程池。
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(handle,))
@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+
+from cross_correlation import correlation_matrix
+from sales_matrix import load_sales_matrix
+
+def _relative_profile(values, phase, n_phases):
+    """
+    按相位（星期几或月份）计算所有序列的平均销量，再除以序列的总体均值。
+
+    参数:
+    values (np.ndarray): (日期数, 序列数) 的数组，未出现的日期为 NaN。
+    phase (np.ndarray): 每个日期的相位编号。
+    n_phases (int): 相位个数。
+
+    返回:
+    np.ndarray: (n_phases, 序列数) 的相对水平，1 表示与均值持平；没有数据的相位记为1。
+    """
+    observed = ~np.isnan(values)
+    filled = np.where(observed, values, 0.0)
+    sums = np.zeros((n_phases, values.shape[1]))
+    counts = np.zeros((n_phases, values.shape[1]))
+    np.add.at(sums, phase, filled)
+    np.add.at(counts, phase, observed)
+    overall = filled.sum(axis=0) / np.maximum(observed.sum(axis=0), 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        profile = (sums / counts) / overall
+    return np.where(np.isfinite(profile), profile, 1.0)
+
+
+def profile_features(matrix, min_days=56, use_mask=True):
+    """
+    为矩阵中的每个序列构建归一化的形状特征：星期几形状（7维）和月份季节形状（12维）。
+
+    两组形状都是相对于序列自身均值的比例，与销量大小无关，
+    因此大单品和小单品只要周内/季节节奏相同就会落在同一簇。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×单品 矩阵。
+    min_days (int): 有记录天数少于该值的单品不参与聚类。
+    use_mask (bool): 是否只用原始数据中出现过的日期计算均值。
+
+    返回:
+    tuple: (features, eligible)，features 为 (单品数, 19) 的数组（已减去1），
+           eligible 为参与聚类的布尔标记。
+    """
+    values = matrix.masked_values() if use_mask else matrix.values
+    values = values.astype(np.float64)
+    weekday = _relative_profile(values, matrix.dates.dayofweek.to_numpy(), 7)
+    month = _relative_profile(values, matrix.dates.month.to_numpy() - 1, 12)
+    features = np.vstack([weekday, month]).T - 1.0
+
+    observed_days = np.sum(~np.isnan(values), axis=0)
+    eligible = (observed_days >= min_days) & (np.nansum(values, axis=0) > 0)
+    return features, eligible
+
+
+def _squared_distances(points, centers):
+    """所有点到所有中心的平方欧氏距离，(点数, 中心数)，一次矩阵乘法完成。"""
+    d2 = (points ** 2).sum(axis=1)[:, None] - 2 * points @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(d2, 0)
+
+
+def kmeans(features, k, n_init=10, max_iter=100, seed=None):
+    """
+    向量化的 k-means（k-means++ 初始化，多次初始化取惯性最小的结果）。
+
+    参数:
+    features (np.ndarray): (点数, 维数) 的特征。
+    k (int): 簇数。
+    n_init (int): 初始化次数。
+    max_iter (int): 每次的最大迭代次数。
+    seed (int 或 None): 随机数种子。
+
+    返回:
+    tuple: (labels, centers, inertia)。
+    """
+    rng = np.random.default_rng(seed)
+    n = len(features)
+    k = min(k, n)
+    best = None
+    for _ in range(n_init):
+        centers = features[[rng.integers(n)]]
+        for _ in range(1, k):
+            d2 = _squared_distances(features, centers).min(axis=1)
+            probs = d2 / d2.sum() if d2.sum() > 0 else np.full(n, 1 / n)
+            centers = np.vstack([centers, features[rng.choice(n, p=probs)]])
+
+        labels = np.full(n, -1)
+        for _ in range(max_iter):
+            new_labels = _squared_distances(features, centers).argmin(axis=1)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            # 按簇求和后除以簇大小，得到所有中心；空簇保留原中心
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, features)
+            nonempty = counts > 0
+            centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+        inertia = _squared_distances(features, centers)[np.arange(n), labels].sum()
+        if best is None or inertia < best[2]:
+            best = (labels, centers, inertia)
+    return best
+
+
+def correlation_distance(matrix, freq='W', use_mask=True):
+    """
+    序列之间的相关距离 1 - r（默认在周销量上计算，降低日度噪声）。
+
+    返回:
+    np.ndarray: (序列数, 序列数) 的距离矩阵，取值 0~2。
+    """
+    if freq is not None:
+        matrix = matrix.resample(freq)
+    # 浮点误差可能使 r 略大于1，这里截断到 [0, 2]
+    return np.clip(1.0 - correlation_matrix(matrix, use_mask), 0.0, 2.0)
+
+
+def kmedoids(distance, k, max_iter=100, seed=None):
+    """
+    在预先计算的距离矩阵上做 k-medoids（交替执行：按最近中心点分配、在簇内重选中心点）。
+
+    初始中心点按 k-means++ 的方式以距离为概率依次抽取。
+
+    参数:
+    distance (np.ndarray): (点数, 点数) 的对称距离矩阵。
+    k (int): 簇数。
+    max_iter (int): 最大迭代次数。
+    seed (int 或 None): 随机数种子。
+
+    返回:
+    tuple: (labels, medoids, cost)，medoids 为各簇中心点的位置。
+    """
+    rng = np.random.default_rng(seed)
+    n = len(distance)
+    k = min(k, n)
+    medoids = [int(rng.integers(n))]
+    for _ in range(1, k):
+        nearest = distance[:, medoids].min(axis=1)
+        probs = nearest / nearest.sum() if nearest.sum() > 0 else np.full(n, 1 / n)
+        medoids.append(int(rng.choice(n, p=probs)))
+    medoids = np.array(medoids)
+
+    for _ in range(max_iter):
+        labels = distance[:, medoids].argmin(axis=1)
+        new_medoids = medoids.copy()
+        for cluster in range(k):
+            members = np.flatnonzero(labels == cluster)
+            if len(members) > 0:
+                within = distance[np.ix_(members, members)].sum(axis=0)
+                new_medoids[cluster] = members[within.argmin()]
+        if np.array_equal(new_medoids, medoids):
+            break
+        medoids = new_medoids
+
+    labels = distance[:, medoids].argmin(axis=1)
+    cost = distance[np.arange(n), medoids[labels]].sum()
+    return labels, medoids, cost
+
+
+class ClusterResult:
+    """
+    单品聚类结果。
+
+    属性:
+    items (pd.Index): 单品名称轴。
+    labels (np.ndarray): 每个单品的簇编号，不参与聚类的单品为 -1。
+    representatives (np.ndarray): 每个簇的代表单品在 items 中的位置。
+    distance (np.ndarray): 每个单品到所在簇中心（k-means）或中心点（k-medoids）的距离，不参与的为 NaN。
+    method (str): 'kmeans' 或 'kmedoids'。
+    """
+
+    def __init__(self, items, labels, representatives, distance, method):
+        self.items = pd.Index(items)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.representatives = np.asarray(representatives, dtype=np.int64)
+        self.distance = np.asarray(distance, dtype=np.float64)
+        self.method = method
+
+    def __repr__(self):
+        clustered = int((self.labels >= 0).sum())
+        return (f"ClusterResult({self.method}, {len(self.representatives)} 个簇, "
+                f"{clustered}/{len(self.items)} 个单品参与聚类)")
+
+    def sizes(self):
+        """各簇的单品数。"""
+        return pd.Series(np.bincount(self.labels[self.labels >= 0], minlength=len(self.representatives)),
+                         name='单品数').rename_axis('簇')
+
+    def to_frame(self):
+        """
+        每个单品的簇编号和代表标记。
+
+        返回:
+        pd.DataFrame: 列为 单品名称、簇、到中心距离、是否代表，按簇和距离排序。
+        """
+        is_rep = np.zeros(len(self.items), dtype=bool)
+        is_rep[self.representatives] = True
+        frame = pd.DataFrame({
+            '单品名称': self.items,
+            '簇': self.labels,
+            '到中心距离': self.distance,
+            '是否代表': is_rep,
+        })
+        return frame.sort_values(['簇', '到中心距离'], kind='stable').reset_index(drop=True)
+
+    def representatives_frame(self):
+        """各簇的代表单品和簇大小。"""
+        return pd.DataFrame({
+            '簇': np.arange(len(self.representatives)),
+            '代表单品': self.items[self.representatives],
+            '单品数': self.sizes().to_numpy(),
+        })
+
+
+def cluster_skus(matrix, k=12, method='kmeans', min_days=56, seed=0):
+    """
+    对矩阵中的所有单品聚类，并为每个簇选出一个代表单品。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×单品 矩阵。
+    k (int): 簇数（默认12，与每个品类取前2名的代表样本数相同）。
+    method (str): 'kmeans' 在星期几/月份形状特征上聚类，代表为离簇中心最近的单品；
+                  'kmedoids' 在周销量的相关距离矩阵上聚类，代表为簇的中心点。
+    min_days (int): 有记录天数少于该值的单品不参与聚类。
+    seed (int): 随机数种子。
+
+    返回:
+    ClusterResult: 聚类结果。
+    """
+    features, eligible = profile_features(matrix, min_days)
+    positions = np.flatnonzero(eligible)
+    labels = np.full(len(matrix.items), -1)
+    distance = np.full(len(matrix.items), np.nan)
+
+    if method == 'kmeans':
+        points = features[positions]
+        # 各维标准化，避免波动更大的月份形状主导距离
+        scale = points.std(axis=0)
+        points = points / np.where(scale > 0, scale, 1.0)
+        sub_labels, centers, _ = kmeans(points, k, seed=seed)
+        sub_distance = np.sqrt(_squared_distances(points, centers)[np.arange(len(points)), sub_labels])
+        representatives = np.array([
+            positions[np.flatnonzero(sub_labels == c)[sub_distance[sub_labels == c].argmin()]]
+            for c in range(len(centers)) if (sub_labels == c).any()
+        ])
+        # 空簇被去掉后重新编号，使簇编号与 representatives 对齐
+        _, sub_labels = np.unique(sub_labels, return_inverse=True)
+    elif method == 'kmedoids':
+        distance_matrix = correlation_distance(matrix.select(matrix.items[positions]))
+        sub_labels, medoids, _ = kmedoids(distance_matrix, k, seed=seed)
+        sub_distance = distance_matrix[np.arange(len(positions)), medoids[sub_labels]]
+        representatives = positions[medoids]
+    else:
+        raise ValueError(f"不支持的 method: {method}，可选 'kmeans' 或 'kmedoids'")
+
+    labels[positions] = sub_labels
+    distance[positions] = sub_distance
+    return ClusterResult(matrix.items, labels, representatives, distance, method)
+
+
+if __name__ == '__main__':
+    sku_matrix = load_sales_matrix('cleaned_daily_sku_sales.xlsx', '单品名称')
+
+    results = {method: cluster_skus(sku_matrix, k=12, method=method) for method in ('kmeans', 'kmedoids')}
+    with pd.ExcelWriter('sku_clusters.xlsx') as writer:
+        for method, result in results.items():
+            print(f"\n{result}")
+            print(result.representatives_frame().to_string(index=False))
+            result.to_frame().to_excel(writer, sheet_name=method, index=False)
+    print("\n单品聚类结果已保存到 'sku_clusters.xlsx'。")
@@ -0,0 +1,392 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from sales_matrix import load_sales_matrix
+
+# ADF 检验（含常数项、无趋势）的临界值：MacKinnon (2010) 有限样本响应面系数，
+# 临界值 = b0 + b1/T + b2/T² + b3/T³
+ADF_CRITICAL_COEFS = {
+    '1%': (-3.43035, -6.5393, -16.786, -79.433),
+    '5%': (-2.86154, -2.8903, -4.234, -40.04),
+    '10%': (-2.56677, -1.5384, -2.809, 0.0),
+}
+# ADF p 值：MacKinnon (1994) 近似，统计量小于 ADF_TAU_STAR 时用小 p 值多项式
+ADF_TAU_STAR, ADF_TAU_MIN, ADF_TAU_MAX = -1.61, -18.83, 2.74
+ADF_SMALL_P = (2.1659, 1.4412, 0.038269)
+ADF_LARGE_P = (1.7339, 0.93202, -0.12745, -0.010368)
+
+# KPSS 水平平稳检验的渐近临界值（Kwiatkowski 等, 1992），p 值在表内线性插值
+KPSS_CRITICAL = np.array([0.347, 0.463, 0.574, 0.739])
+KPSS_PVALUES = np.array([0.10, 0.05, 0.025, 0.01])
+
+
+def _normal_cdf(x):
+    x = np.asarray(x, dtype=np.float64)
+    return 0.5 * np.vectorize(math.erfc, otypes=[np.float64])(-x / math.sqrt(2))
+
+
+def chi2_sf(x, df):
+    """
+    自由度为整数 df 的卡方分布上尾概率（闭式级数，对数空间累加避免溢出）。
+
+    参数:
+    x (np.ndarray): 统计量。
+    df (int): 自由度。
+
+    返回:
+    np.ndarray: P(χ² > x)。
+    """
+    half = np.maximum(np.asarray(x, dtype=np.float64), 1e-300) / 2
+    log_half = np.log(half)
+    if df % 2 == 0:
+        # e^{-x/2} Σ_{i<df/2} (x/2)^i / i!
+        log_term = -half
+        total = np.exp(log_term)
+        for i in range(1, df // 2):
+            log_term = log_term + log_half - math.log(i)
+            total = total + np.exp(log_term)
+    else:
+        # erfc(√(x/2)) + e^{-x/2} Σ_{i=1}^{(df-1)/2} (x/2)^{i-1/2} / Γ(i+1/2)
+        total = np.vectorize(math.erfc, otypes=[np.float64])(np.sqrt(half))
+        log_term = -half + 0.5 * log_half - math.lgamma(1.5)
+        for i in range(1, (df + 1) // 2):
+            if i > 1:
+                log_term = log_term + log_half - math.log(i - 0.5)
+            total = total + np.exp(log_term)
+    return np.clip(total, 0.0, 1.0)
+
+
+def adf_pvalue(stat):
+    """ADF 统计量（含常数项）的近似 p 值。"""
+    stat = np.asarray(stat, dtype=np.float64)
+    small = np.polyval(ADF_SMALL_P[::-1], stat)
+    large = np.polyval(ADF_LARGE_P[::-1], stat)
+    p = _normal_cdf(np.where(stat <= ADF_TAU_STAR, small, large))
+    p = np.where(stat > ADF_TAU_MAX, 1.0, np.where(stat < ADF_TAU_MIN, 0.0, p))
+    return np.where(np.isnan(stat), np.nan, p)
+
+
+def adf_critical_value(nobs, level='5%'):
+    """给定回归样本数时 ADF 检验的有限样本临界值。"""
+    inv = 1.0 / np.asarray(nobs, dtype=np.float64)
+    return np.polyval(ADF_CRITICAL_COEFS[level][::-1], inv)
+
+
+def kpss_pvalue(stat):
+    """KPSS 统计量的 p 值，超出临界值表的部分截断在 0.01 或 0.10。"""
+    stat = np.asarray(stat, dtype=np.float64)
+    p = np.interp(stat, KPSS_CRITICAL, KPSS_PVALUES)
+    return np.where(np.isnan(stat), np.nan, p)
+
+
+def active_spans(matrix):
+    """
+    每个序列的有效区间 [开始, 结束)：从第一次出现到最后一次出现（mask 为 None 时为整个日期轴）。
+
+    区间内没有记录的日期按销量0参与检验，区间外（上市前、下架后）的日期不参与。
+
+    返回:
+    tuple: (starts, ends)，int64 数组。
+    """
+    n_dates, n_items = matrix.shape
+    if matrix.mask is None:
+        return np.zeros(n_items, dtype=np.int64), np.full(n_items, n_dates, dtype=np.int64)
+    observed = matrix.mask.any(axis=0)
+    starts = np.where(observed, matrix.mask.argmax(axis=0), 0)
+    ends = np.where(observed, n_dates - matrix.mask[::-1].argmax(axis=0), 0)
+    return starts.astype(np.int64), ends.astype(np.int64)
+
+
+def autocovariance_sums(centered):
+    """
+    所有序列所有滞后的 Σ e_t·e_{t+k}（未除以样本数），FFT 一次算出。
+
+    参数:
+    centered (np.ndarray): (日期数, 序列数) 的去均值序列，有效区间外为0。
+
+    返回:
+    np.ndarray: (日期数, 序列数) 的数组，第 k 行为滞后 k 的乘积和。
+    """
+    n = centered.shape[0]
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(centered, n=size, axis=0)
+    return np.fft.irfft(spectrum * spectrum.conj(), n=size, axis=0)[:n]
+
+
+def bartlett_bounds(acf, n_obs, alpha=0.05):
+    """
+    Bartlett 修正的 ACF 置信界：Var(r_k) = (1 + 2Σ_{j<k} r_j²) / n。
+
+    与固定的 ±1.96/√n 不同，前面的滞后相关越强，后面滞后的置信界越宽，
+    周期性序列不会因为低阶相关而被误判出大量“显著”滞后。
+
+    参数:
+    acf (np.ndarray): (滞后数+1, 序列数) 的 ACF，第0行为1。
+    n_obs (np.ndarray): 各序列的样本数。
+    alpha (float): 显著性水平（双侧）。
+
+    返回:
+    np.ndarray: 与 acf 同形状的置信界半宽，第0行为0。
+    """
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    variance = np.ones_like(acf) / n_obs
+    variance[0] = 0.0
+    variance[2:] *= 1 + 2 * np.cumsum(acf[1:-1] ** 2, axis=0)
+    return z * np.sqrt(variance)
+
+
+def ljung_box(acf, n_obs, lag):
+    """
+    Ljung-Box 组合检验：Q = n(n+2) Σ_{k=1}^{h} r_k² / (n-k)，原假设为前 h 阶无自相关。
+
+    返回:
+    tuple: (Q, p 值)，均为各序列一个值的数组。
+    """
+    k = np.arange(1, lag + 1)[:, None]
+    q = n_obs * (n_obs + 2) * np.sum(acf[1:lag + 1] ** 2 / (n_obs - k), axis=0)
+    return q, chi2_sf(q, lag)
+
+
+def kpss_test(centered, sums, n_obs):
+    """
+    KPSS 水平平稳检验（原假设为平稳），长期方差用 Bartlett 核，带宽按 Hobijn 等 (2004) 自动选择。
+
+    所需的各阶自协方差直接取自 autocovariance_sums 的结果。
+
+    返回:
+    tuple: (统计量, 使用的滞后阶数)。
+    """
+    n_items = centered.shape[1]
+    # 自动带宽：先用 n^{2/9} 阶自协方差估计谱的曲率
+    cov_lags = np.power(n_obs, 2 / 9).astype(np.int64)
+    s0 = sums[0] / n_obs
+    s1 = np.zeros(n_items)
+    for i in range(1, int(cov_lags.max()) + 1):
+        use = i <= cov_lags
+        term = np.where(use, sums[min(i, len(sums) - 1)] / (n_obs / 2), 0.0)
+        s0 = s0 + term
+        s1 = s1 + i * term
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gamma_hat = 1.1447 * np.power((s1 / s0) ** 2, 1 / 3)
+    lags = np.nan_to_num(gamma_hat * np.power(n_obs, 1 / 3)).astype(np.int64)
+    lags = np.clip(lags, 0, n_obs - 1)
+
+    # 长期方差 = γ0 + 2 Σ_{i≤l} (1 - i/(l+1)) γi，按各序列自己的带宽加权
+    max_lag = int(lags.max())
+    i = np.arange(1, max_lag + 1)[:, None]
+    weights = np.where(i <= lags, 1 - i / (lags + 1), 0.0)
+    long_run = (sums[0] + 2 * np.sum(weights * sums[1:max_lag + 1], axis=0)) / n_obs
+
+    eta = np.sum(np.cumsum(centered, axis=0) ** 2, axis=0) / n_obs ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stat = eta / long_run
+    return stat, lags
+
+
+def _adf_normal_equations(levels, starts, ends, lags):
+    """
+    ADF 回归 Δy_t = c + γ·y_{t-1} + Σ_{i≤lags} β_i·Δy_{t-i} 的正规方程，所有序列一次构建。
+
+    滞后差分矩阵只构建一次，列顺序为 [常数, y_{t-1}, Δy_{t-1}, …, Δy_{t-lags}]，
+    因此较低阶数的回归直接取左上角的子矩阵，不需要重新构建。
+
+    参数:
+    levels (np.ndarray): (日期数, 序列数) 的原始序列。
+    starts / ends (np.ndarray): 各序列的有效区间。
+    lags (int): 最高滞后阶数，回归样本为区间内第 lags+2 个日期起的所有日期。
+
+    返回:
+    tuple: (XtX, Xty, yty, nobs)，形状分别为 (序列数, k, k)、(序列数, k)、(序列数,)、(序列数,)。
+    """
+    n_dates, n_items = levels.shape
+    diffs = np.zeros_like(levels)
+    diffs[1:] = levels[1:] - levels[:-1]
+
+    k = lags + 2
+    design = np.zeros((n_dates, k, n_items))
+    design[:, 0] = 1.0
+    design[1:, 1] = levels[:-1]
+    for i in range(1, lags + 1):
+        design[i:, i + 1] = diffs[:-i]
+
+    t = np.arange(n_dates)[:, None]
+    weight = ((t >= starts + lags + 1) & (t < ends)).astype(np.float64)
+    weighted = design * weight[:, None, :]
+    xtx = np.einsum('tim,tjm->mij', weighted, design)
+    xty = np.einsum('tim,tm->mi', weighted, diffs)
+    yty = np.einsum('tm,tm->m', weight, diffs ** 2)
+    return xtx, xty, yty, weight.sum(axis=0)
+
+
+def _ols_rss(xtx, xty, yty):
+    """由正规方程批量求回归系数和残差平方和（伪逆，常数序列等奇异情形不报错）。"""
+    inverse = np.linalg.pinv(xtx)
+    beta = np.einsum('mij,mj->mi', inverse, xty)
+    rss = yty - np.einsum('mi,mi->m', beta, xty)
+    return beta, np.maximum(rss, 0.0), inverse
+
+
+def adf_test(levels, starts, ends):
+    """
+    增广 Dickey-Fuller 单位根检验（含常数项，原假设为存在单位根），所有序列批量计算。
+
+    与 statsmodels.adfuller 的默认口径一致：最高阶数 ⌈12(n/100)^{1/4}⌉，在同一样本上按 AIC
+    选择滞后阶数，再用选出的阶数在尽可能长的样本上重新回归。最高阶数相同的序列共用一个滞后矩阵。
+
+    返回:
+    tuple: (统计量, 选用的滞后阶数, 回归样本数)。
+    """
+    n_obs = ends - starts
+    max_lags = np.minimum(np.ceil(12 * (n_obs / 100) ** 0.25), n_obs // 2 - 2).astype(np.int64)
+    best = np.zeros(len(n_obs), dtype=np.int64)
+    for max_lag in np.unique(max_lags):
+        cols = np.flatnonzero(max_lags == max_lag)
+        xtx, xty, yty, nobs = _adf_normal_equations(levels[:, cols], starts[cols], ends[cols], int(max_lag))
+        aic = np.empty((max_lag + 1, len(cols)))
+        for lag in range(max_lag + 1):
+            k = lag + 2
+            _, rss, _ = _ols_rss(xtx[:, :k, :k], xty[:, :k], yty)
+            with np.errstate(divide='ignore'):
+                aic[lag] = nobs * np.log(rss / nobs) + 2 * k
+        best[cols] = np.argmin(aic, axis=0)
+
+    stats = np.full(len(n_obs), np.nan)
+    nobs_used = np.zeros(len(n_obs))
+    for lag in np.unique(best):
+        cols = np.flatnonzero(best == lag)
+        xtx, xty, yty, nobs = _adf_normal_equations(levels[:, cols], starts[cols], ends[cols], int(lag))
+        beta, rss, inverse = _ols_rss(xtx, xty, yty)
+        sigma2 = rss / (nobs - (lag + 2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats[cols] = beta[:, 1] / np.sqrt(sigma2 * inverse[:, 1, 1])
+        nobs_used[cols] = nobs
+    return stats, best, nobs_used
+
+
+def run_series_tests(matrix, alpha=0.05, acf_lags=30, lb_lags=(7, 14, 30), seasonal_lag=7,
+                     min_days=60):
+    """
+    对矩阵中的所有序列批量做白噪声和平稳性检验，输出一行一个序列的整洁表。
+
+    各序列在有效区间上去均值后，用 FFT 一次求出所有滞后的自协方差，
+    ACF、Bartlett 置信界、Ljung-Box 和 KPSS 长期方差都从这张表中取值；
+    ADF 的滞后差分矩阵按最高阶数分组构建一次，所有候选阶数共用。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×序列 矩阵。
+    alpha (float): 显著性水平。
+    acf_lags (int): 统计显著 ACF 滞后时考察的最高阶数。
+    lb_lags (tuple): Ljung-Box 检验的阶数。
+    seasonal_lag (int): 单独列出的季节滞后（周循环为7）。
+    min_days (int): 有效区间短于该天数的序列不做检验（对应各列为缺失）。
+
+    返回:
+    pd.DataFrame: 每个序列一行，包含样本区间、ADF、KPSS、各阶 Ljung-Box、ACF 显著性和平稳性结论。
+    """
+    starts, ends = active_spans(matrix)
+    n_obs = (ends - starts).astype(np.float64)
+    levels = matrix.values.astype(np.float64)
+    t = np.arange(matrix.shape[0])[:, None]
+    inside = (t >= starts) & (t < ends)
+    means = np.where(inside, levels, 0.0).sum(axis=0) / np.maximum(n_obs, 1)
+    centered = np.where(inside, levels - means, 0.0)
+    eligible = (n_obs >= min_days) & (np.sum(centered ** 2, axis=0) > 0)
+
+    cols = np.flatnonzero(eligible)
+    n = n_obs[cols]
+    sums = autocovariance_sums(centered[:, cols])
+    acf = sums[:max(acf_lags, max(lb_lags), seasonal_lag) + 1] / sums[0]
+    bounds = bartlett_bounds(acf, n, alpha)
+    significant = np.abs(acf) > bounds
+
+    frame = pd.DataFrame({
+        '序列': matrix.items,
+        '样本天数': (ends - starts),
+        '开始日期': matrix.dates[np.minimum(starts, len(matrix.dates) - 1)],
+        '结束日期': matrix.dates[np.maximum(ends - 1, 0)],
+    })
+
+    def column(values):
+        full = np.full(len(matrix.items), np.nan)
+        full[cols] = values
+        return full
+
+    adf_stat, adf_lag, adf_nobs = adf_test(levels[:, cols], starts[cols], ends[cols])
+    frame['ADF统计量'] = column(adf_stat)
+    frame['ADF滞后阶数'] = column(adf_lag)
+    frame['ADF_p值'] = column(adf_pvalue(adf_stat))
+    frame['ADF临界值5%'] = column(adf_critical_value(adf_nobs))
+
+    kpss_stat, kpss_lag = kpss_test(centered[:, cols], sums, n)
+    frame['KPSS统计量'] = column(kpss_stat)
+    frame['KPSS滞后阶数'] = column(kpss_lag)
+    frame['KPSS_p值'] = column(kpss_pvalue(kpss_stat))
+
+    lb_pvalues = []
+    for lag in lb_lags:
+        q, p = ljung_box(acf, n, lag)
+        frame[f'LB({lag})统计量'] = column(q)
+        frame[f'LB({lag})_p值'] = column(p)
+        lb_pvalues.append(p)
+
+    frame[f'ACF({seasonal_lag})'] = column(acf[seasonal_lag])
+    frame[f'ACF({seasonal_lag})置信界'] = column(bounds[seasonal_lag])
+    frame[f'显著ACF滞后数(1-{acf_lags})'] = column(significant[1:acf_lags + 1].sum(axis=0))
+
+    adf_reject = frame['ADF_p值'] < alpha
+    kpss_reject = frame['KPSS_p值'] < alpha
+    conclusion = np.select(
+        [frame['ADF统计量'].isna(), adf_reject & ~kpss_reject, ~adf_reject & kpss_reject, adf_reject & kpss_reject],
+        ['样本不足', '平稳', '单位根', '检验冲突'],
+        default='证据不足',
+    )
+    frame['平稳性结论'] = conclusion
+    # 差分阶数以 ADF 为准：检验冲突（常见于均值突变或强周期）时不建议盲目差分
+    frame['建议差分阶数'] = np.where(frame['ADF统计量'].isna(), np.nan, np.where(adf_reject, 0, 1))
+    white = np.all(np.vstack(lb_pvalues) >= alpha, axis=0)
+    frame['白噪声'] = pd.array(column(white), dtype='boolean')
+    return frame
+
+
+def run_all_tests(category_matrix=None, sku_matrix=None, **kwargs):
+    """
+    对品类和单品序列分别检验，合并为一张带 层级 列的表。
+
+    参数:
+    category_matrix / sku_matrix (SalesMatrix 或 None): 为 None 的层级跳过。
+    **kwargs: 传给 run_series_tests 的参数。
+
+    返回:
+    pd.DataFrame: 合并后的检验结果表。
+    """
+    frames = []
+    for level, matrix in (('品类', category_matrix), ('单品', sku_matrix)):
+        if matrix is not None:
+            frames.append(run_series_tests(matrix, **kwargs).assign(层级=level))
+    result = pd.concat(frames, ignore_index=True)
+    return result[['层级', *result.columns.drop('层级')]]
+
+
+if __name__ == '__main__':
+    import time
+
+    category_matrix = load_sales_matrix('daily_category_sales.xlsx', '分类名称')
+    sku_matrix = load_sales_matrix('cleaned_daily_sku_sales.xlsx', '单品名称')
+
+    start = time.perf_counter()
+    results = run_all_tests(category_matrix, sku_matrix)
+    print(f"已检验 {len(results)} 个序列，耗时 {time.perf_counter() - start:.2f} 秒")
+
+    print("\n品类序列检验结果:")
+    columns = ['序列', '样本天数', 'ADF统计量', 'ADF_p值', 'KPSS统计量', 'KPSS_p值',
+               'LB(7)_p值', 'ACF(7)', 'ACF(7)置信界', '平稳性结论', '白噪声']
+    print(results.loc[results['层级'] == '品类', columns].round(4).to_string(index=False))
+
+    print("\n单品序列的平稳性结论分布:")
+    print(results.loc[results['层级'] == '单品', '平稳性结论'].value_counts().to_string())
+
+    results.to_excel('stationarity_tests.xlsx', index=False)
+    print("\n检验结果已保存到 'stationarity_tests.xlsx'。")
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomaly_detection import AnomalyStream, detect_anomalies, replace_anomalies_by_group
+from sales_matrix import build_sales_matrix
+
+
+def _matrix(seed, n_days=120, items=('a', 'b', 'c', 'd', 'e')):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2023-01-04', periods=n_days, freq='D')
+    rows = []
+    for item in items:
+        weekly = rng.uniform(2, 10, 7)
+        for date in dates:
+            # 约10%的天没有记录，检验缺失值的处理
+            if rng.random() < 0.1:
+                continue
+            value = weekly[date.dayofweek] + rng.normal(0, 1)
+            if rng.random() < 0.03:
+                value *= 6
+            rows.append((date, item, max(value, 0.0)))
+    df = pd.DataFrame(rows, columns=['销售日期', '单品名称', '销量(千克)'])
+    return build_sales_matrix(df, '单品名称')
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_stream_matches_batch(seed):
+    matrix = _matrix(seed)
+    batch = detect_anomalies(matrix)
+    assert batch['flag'].any()
+
+    stream = AnomalyStream(matrix.items)
+    values = np.where(matrix.mask, matrix.values.astype(np.float64), np.nan)
+    for i, date in enumerate(matrix.dates):
+        result = stream.update(date, values[i])
+        np.testing.assert_array_equal(result['flag'], batch['flag'][i])
+        np.testing.assert_allclose(result['score'], batch['score'][i], rtol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(result['baseline'], batch['baseline'][i], rtol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(result['replacement'], batch['replacement'][i], rtol=1e-6)
+
+
+def test_stream_rejects_wrong_length():
+    stream = AnomalyStream(['a', 'b'])
+    with pytest.raises(ValueError):
+        stream.update('2023-01-01', [1.0])
+
+
+def _spiky_frame():
+    dates = pd.date_range('2023-01-02', periods=70, freq='D')
+    df = pd.DataFrame({'销售日期': dates, '单品名称': 'a', '销量(千克)': 5.0 + (np.arange(70) % 3) * 0.2})
+    # 最后一天有两条记录，合计远高于前几周同一星期几的销量
+    extra = pd.DataFrame({'销售日期': [dates[-1]], '单品名称': ['a'], '销量(千克)': [45.0]})
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def test_replace_splits_baseline_across_duplicate_rows():
+    df = _spiky_frame()
+    out = replace_anomalies_by_group(df, '单品名称', '销量(千克)')
+    last_day = out[out['销售日期'] == df['销售日期'].max()]
+    assert len(out) == len(df)
+    assert last_day['是否异常'].all()
+
+    baseline = detect_anomalies(build_sales_matrix(df, '单品名称'))['baseline'][-1, 0]
+    assert last_day['销量(千克)'].sum() == pytest.approx(baseline)
+    # 按各行占当日合计的比例分摊
+    np.testing.assert_allclose(last_day['销量(千克)'] / last_day['销量(千克)'].sum(),
+                               last_day['原始销量'] / last_day['原始销量'].sum())
+
+
+def test_replace_keeps_rows_missing_from_matrix():
+    df = _spiky_frame()
+    df.loc[len(df)] = [pd.NaT, 'a', 99.0]
+    df.loc[len(df)] = [df['销售日期'].iloc[-2], None, 77.0]
+    out = replace_anomalies_by_group(df, '单品名称', '销量(千克)')
+    tail = out.tail(2)
+    assert not tail['是否异常'].any()
+    assert tail['异常得分'].isna().all()
+    np.testing.assert_array_equal(tail['销量(千克)'], [99.0, 77.0])
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from changepoints import _segment_costs, binary_segmentation, pelt
+
+
+def _brute_force(x, penalty, min_size):
+    """O(n²) 的最优分段动态规划，返回 (各段起点, 含惩罚的总代价)。"""
+    n = len(x)
+    csum = np.concatenate([[0.0], np.cumsum(x)])
+    csum2 = np.concatenate([[0.0], np.cumsum(x ** 2)])
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    for t in range(min_size, n + 1):
+        starts = np.array([0] + list(range(min_size, t - min_size + 1)))
+        values = best[starts] + _segment_costs(csum, csum2, starts, t) + penalty
+        best[t] = values.min()
+        last[t] = starts[values.argmin()]
+    boundaries = []
+    t = n
+    while t > 0:
+        t = last[t]
+        if t > 0:
+            boundaries.append(t)
+    return np.array(boundaries[::-1]), best[n]
+
+
+def _penalised_cost(x, boundaries, penalty):
+    csum = np.concatenate([[0.0], np.cumsum(x)])
+    csum2 = np.concatenate([[0.0], np.cumsum(x ** 2)])
+    edges = np.concatenate([[0], boundaries, [len(x)]]).astype(np.int64)
+    cost = sum(_segment_costs(csum, csum2, np.array([s]), e)[0] for s, e in zip(edges[:-1], edges[1:]))
+    return cost + penalty * len(boundaries)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_pelt_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    min_size = int(rng.integers(1, 10))
+    n = int(rng.integers(min_size, 80))
+    levels = rng.normal(0, 3, size=4)
+    x = levels[rng.integers(0, 4, size=n)] + rng.normal(size=n)
+    x = np.sort(x) if seed % 5 == 0 else x
+    penalty = float(rng.uniform(0.5, 3) * np.log(n))
+
+    boundaries = pelt(x, penalty, min_size)
+    _, expected_cost = _brute_force(x, penalty, min_size)
+    assert _penalised_cost(x, boundaries, penalty) == pytest.approx(expected_cost, abs=1e-8)
+    if len(boundaries):
+        edges = np.concatenate([[0], boundaries, [n]])
+        assert np.diff(edges).min() >= min_size
+
+
+def test_pelt_short_series_without_split():
+    # n=11、min_size=4 时任何切分都不如不切分
+    rng = np.random.default_rng(3)
+    x = rng.normal(size=11)
+    penalty = 2 * np.log(11)
+    expected, _ = _brute_force(x, penalty, 4)
+    assert list(pelt(x, penalty, 4)) == list(expected)
+
+
+def test_binary_segmentation_finds_single_shift():
+    x = np.concatenate([np.zeros(30), np.full(30, 5.0)]) + np.random.default_rng(0).normal(0, 0.1, 60)
+    assert list(binary_segmentation(x, penalty=10, min_size=5)) == [30]
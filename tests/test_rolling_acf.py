@@ -0,0 +1,55 @@
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling_acf import rolling_acf
+from sales_matrix import build_sales_matrix
+
+calculate_acf = importlib.import_module('云南生菜').calculate_acf
+
+
+def _matrix(seed, n_days=200):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2023-01-01', periods=n_days, freq='D')
+    t = np.arange(n_days)
+    series = {
+        'weekly': 5 + 3 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 1, n_days),
+        'trend': 0.05 * t + rng.gamma(2.0, 1.0, n_days),
+        'noise': rng.gamma(1.5, 2.0, n_days),
+    }
+    df = pd.DataFrame([(date, item, values[i]) for item, values in series.items()
+                       for i, date in enumerate(dates)],
+                      columns=['销售日期', '单品名称', '销量(千克)'])
+    return build_sales_matrix(df, '单品名称')
+
+
+@pytest.mark.parametrize('window, step, max_lags', [(90, 7, 28), (30, 1, 10), (60, 13, 21)])
+def test_matches_calculate_acf_per_window(window, step, max_lags):
+    matrix = _matrix(window)
+    result = rolling_acf(matrix, window=window, step=step, max_lags=max_lags)
+    starts = np.arange(0, matrix.shape[0] - window + 1, step)
+    assert len(result.dates) == len(starts)
+    assert result.dates.equals(matrix.dates[starts + window - 1])
+
+    values = matrix.values.astype(np.float64)
+    for w, start in enumerate(starts):
+        for j in range(len(matrix.items)):
+            expected = calculate_acf(values[start:start + window, j], max_lags)
+            np.testing.assert_allclose(result.acf[w, :, j], expected, atol=1e-5)
+
+
+def test_constant_window_is_nan():
+    dates = pd.date_range('2023-01-01', periods=60, freq='D')
+    df = pd.DataFrame({'销售日期': dates, '单品名称': 'flat', '销量(千克)': 2.0})
+    result = rolling_acf(build_sales_matrix(df, '单品名称'), window=30, step=10, max_lags=5)
+    assert np.isnan(result.acf[:, 1:]).all()
+
+
+def test_rejects_bad_window():
+    matrix = _matrix(0, n_days=50)
+    with pytest.raises(ValueError):
+        rolling_acf(matrix, window=80)
+    with pytest.raises(ValueError):
+        rolling_acf(matrix, window=20, max_lags=20)
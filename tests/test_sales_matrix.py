@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from sales_matrix import build_sales_matrix
+
+
+def _random_frame(seed, n=500):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        '销售日期': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 40, n), unit='D'),
+        '单品名称': rng.choice(['a', 'b', 'c', 'd'], n),
+        '销量(千克)': rng.gamma(2.0, 3.0, n),
+    })
+
+
+def test_matches_pandas_pivot():
+    df = _random_frame(0)
+    matrix = build_sales_matrix(df, '单品名称')
+    calendar = pd.date_range(df['销售日期'].min(), df['销售日期'].max(), freq='D')
+    pivot = (df.pivot_table(index='销售日期', columns='单品名称', values='销量(千克)', aggfunc='sum')
+             .reindex(calendar))
+    np.testing.assert_allclose(matrix.values, pivot.fillna(0).to_numpy(), rtol=1e-5)
+    np.testing.assert_array_equal(matrix.mask, pivot.notna().to_numpy())
+    assert list(matrix.items) == list(pivot.columns)
+    assert matrix.dates.equals(calendar)
+
+
+def test_single_series_when_item_col_is_none():
+    df = _random_frame(1)
+    matrix = build_sales_matrix(df, None)
+    expected = df.groupby('销售日期')['销量(千克)'].sum()
+    assert matrix.shape[1] == 1
+    np.testing.assert_allclose(matrix.series(matrix.items[0]).loc[expected.index], expected, rtol=1e-5)
+
+
+def test_rows_with_missing_keys_are_dropped():
+    df = pd.DataFrame({
+        '销售日期': ['2023-07-01', '2023-07-02', '2023-07-02', 'bad-date'],
+        '单品名称': ['a', None, 'b', 'a'],
+        '销量(千克)': [1.0, 5.0, 2.0, 9.0],
+    })
+    matrix = build_sales_matrix(df, '单品名称')
+    assert list(matrix.items) == ['a', 'b']
+    np.testing.assert_allclose(matrix.values, [[1.0, 0.0], [0.0, 2.0]])
+    assert matrix.values.sum() == 3.0
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sales_stats
+from sales_stats import PROFILE_COLUMNS, describe_groups, describe_hierarchy
+
+
+def _ledger(seed=0, n=600):
+    rng = np.random.default_rng(seed)
+    categories = {f'sku{i}': f'cat{i % 3}' for i in range(8)}
+    skus = rng.choice(list(categories), n)
+    return pd.DataFrame({
+        '销售日期': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 40, n), unit='D'),
+        '单品名称': skus,
+        '分类名称': [categories[sku] for sku in skus],
+        '销量(千克)': np.round(rng.gamma(2.0, 1.5, n), 3) * (rng.random(n) > 0.1),
+    })
+
+
+def _expected(df, group_col):
+    daily = df.groupby([group_col, '销售日期'])['销量(千克)'].sum().reset_index()
+    grouped = daily.groupby(group_col)['销量(千克)']
+    expected = grouped.agg(['count', 'sum', 'mean', 'std', 'min', 'median', 'max'])
+    expected['q25'] = grouped.quantile(0.25)
+    expected['q75'] = grouped.quantile(0.75)
+    expected['cv'] = expected['std'] / expected['mean']
+    days = (daily['销售日期'] - daily['销售日期'].min()).dt.days
+    slopes = {}
+    for name, part in daily.assign(t=days).groupby(group_col):
+        slopes[name] = np.polyfit(part['t'], part['销量(千克)'], 1)[0]
+    expected['trend_slope'] = pd.Series(slopes)
+    return expected
+
+
+@pytest.mark.parametrize('group_col', ['单品名称', '分类名称'])
+def test_describe_hierarchy_matches_pandas(group_col):
+    df = _ledger()
+    profiles = describe_hierarchy(df, cache_folder=None)
+    assert list(profiles) == ['分类名称', '单品名称']
+    result = profiles[group_col]
+    assert list(result.columns) == PROFILE_COLUMNS
+    expected = _expected(df, group_col)
+    for col in expected.columns:
+        np.testing.assert_allclose(result[col], expected.loc[result.index, col], rtol=1e-9, atol=1e-12)
+    pd.testing.assert_frame_equal(describe_groups(df, group_col, cache_folder=None), result)
+
+
+def test_missing_parent_keeps_child_rows():
+    df = _ledger(1)
+    df.loc[df['单品名称'] == 'sku0', '分类名称'] = None
+    profiles = describe_hierarchy(df, cache_folder=None)
+    assert 'sku0' in profiles['单品名称'].index
+    assert profiles['单品名称']['sum'].sum() == pytest.approx(df['销量(千克)'].sum())
+
+
+def test_non_nested_levels_fall_back():
+    df = _ledger(2)
+    df['分类名称'] = np.where(np.arange(len(df)) % 2, 'odd', 'even')
+    profiles = describe_hierarchy(df, cache_folder=None)
+    expected = _expected(df, '单品名称')
+    np.testing.assert_allclose(profiles['单品名称']['sum'], expected['sum'])
+
+
+def test_rows_without_dates():
+    df = _ledger(3)
+    result = describe_groups(df, '单品名称', date_col=None, cache_folder=None)
+    grouped = df.groupby('单品名称')['销量(千克)']
+    np.testing.assert_allclose(result['mean'], grouped.mean())
+    np.testing.assert_allclose(result['zero_share'], grouped.apply(lambda s: (s == 0).mean()))
+    assert result['trend_slope'].isna().all()
+
+
+def test_disk_cache_is_reused(tmp_path, monkeypatch):
+    df = _ledger(4)
+    first = describe_hierarchy(df, cache_folder=str(tmp_path))
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+
+    # 清空进程内缓存并禁止重新计算，模拟另一个进程读取同一份数据
+    sales_stats._profile_cache.clear()
+    monkeypatch.setattr(sales_stats, '_profile_levels', None)
+    second = describe_hierarchy(df, cache_folder=str(tmp_path))
+    for level in first:
+        pd.testing.assert_frame_equal(second[level], first[level], check_index_type=False)
+
+
+def test_disk_cache_keeps_newest_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(sales_stats, 'CACHE_MAX_FILES', 3)
+    for seed in range(6):
+        describe_hierarchy(_ledger(10 + seed), cache_folder=str(tmp_path))
+    assert len(list(tmp_path.glob('*.npz'))) == 3
+    # 最近写入的结果仍在磁盘上
+    sales_stats._profile_cache.clear()
+    monkeypatch.setattr(sales_stats, '_profile_levels', None)
+    describe_hierarchy(_ledger(15), cache_folder=str(tmp_path))
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import shared_arrays
+from sales_matrix import build_sales_matrix
+from shared_arrays import SharedSalesMatrix, attach_sales_matrix
+
+
+def _matrix():
+    dates = pd.date_range('2023-01-01', periods=30, freq='D')
+    df = pd.DataFrame({'销售日期': dates.repeat(2), '单品名称': ['a', 'b'] * 30, '销量(千克)': np.arange(60.0)})
+    return build_sales_matrix(df, '单品名称')
+
+
+@pytest.mark.parametrize('backend', ['shm', 'npy'])
+def test_round_trip(backend):
+    matrix = _matrix()
+    with SharedSalesMatrix(matrix, {'单品名称': {1: 'a'}}, backend=backend) as handle:
+        with attach_sales_matrix(handle) as attached:
+            np.testing.assert_array_equal(attached.matrix.values, matrix.values)
+            assert list(attached.matrix.items) == list(matrix.items)
+            assert attached.dictionaries == {'单品名称': {'1': 'a'}}
+
+
+@pytest.mark.parametrize('backend', ['shm', 'npy'])
+def test_failed_publish_releases_created_arrays(backend, monkeypatch):
+    created = []
+    publish = SharedSalesMatrix._publish
+
+    def failing_publish(self, name, array):
+        if len(created) == 2:
+            raise OSError('模拟创建失败')
+        spec = publish(self, name, array)
+        created.append(spec)
+        return spec
+
+    monkeypatch.setattr(SharedSalesMatrix, '_publish', failing_publish)
+    with pytest.raises(OSError):
+        SharedSalesMatrix(_matrix(), backend=backend)
+
+    assert len(created) == 2
+    for spec in created:
+        if backend == 'shm':
+            with pytest.raises(FileNotFoundError):
+                shared_arrays._attach_block(spec['name'])
+        else:
+            assert not os.path.exists(spec['path'])
+            assert not os.path.exists(os.path.dirname(spec['path']))
@@ -0,0 +1,104 @@
+import math
+
+import numpy as np
+import pytest
+
+from stationarity_tests import (_adf_normal_equations, _ols_rss, autocovariance_sums, bartlett_bounds, chi2_sf,
+                                kpss_test, ljung_box)
+
+
+@pytest.mark.parametrize('x', [0.0, 0.3, 1.0, 2.5, 7.0, 20.0])
+def test_chi2_sf_closed_forms(x):
+    # df=1: erfc(√(x/2))；df=2: e^{-x/2}；df=3: erfc(√(x/2)) + √(2x/π)·e^{-x/2}；df=4: e^{-x/2}(1 + x/2)
+    assert chi2_sf(x, 1) == pytest.approx(math.erfc(math.sqrt(x / 2)), abs=1e-12)
+    assert chi2_sf(x, 2) == pytest.approx(math.exp(-x / 2), abs=1e-12)
+    assert chi2_sf(x, 3) == pytest.approx(math.erfc(math.sqrt(x / 2)) + math.sqrt(2 * x / math.pi) * math.exp(-x / 2),
+                                          abs=1e-12)
+    assert chi2_sf(x, 4) == pytest.approx(math.exp(-x / 2) * (1 + x / 2), abs=1e-12)
+
+
+@pytest.mark.parametrize('df, critical', [(1, 3.841459), (7, 14.067140), (14, 23.684791), (30, 43.772972)])
+def test_chi2_sf_at_five_percent_critical_values(df, critical):
+    assert chi2_sf(critical, df) == pytest.approx(0.05, abs=1e-6)
+
+
+def test_chi2_sf_is_vectorized_and_bounded():
+    p = chi2_sf(np.array([0.0, 1e-8, 5.0, 1e4]), 30)
+    assert p[0] == pytest.approx(1.0) and p[-1] == 0.0
+    assert np.all(np.diff(p) <= 0)
+
+
+@pytest.mark.parametrize('alpha', [0.01, 0.05, 0.1, 0.2])
+def test_bartlett_bounds_accept_any_alpha(alpha):
+    acf = np.array([[1.0], [0.5], [0.2], [0.1]])
+    bounds = bartlett_bounds(acf, np.array([100.0]), alpha)
+    z = {0.01: 2.575829, 0.05: 1.959964, 0.1: 1.644854, 0.2: 1.281552}[alpha]
+    assert bounds[1, 0] == pytest.approx(z / 10, rel=1e-6)
+    assert bounds[2, 0] == pytest.approx(z * math.sqrt((1 + 2 * 0.25) / 100), rel=1e-6)
+
+
+def test_ljung_box_white_noise_is_not_rejected():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(2000, 1))
+    x -= x.mean()
+    acf = np.array([[np.sum(x[:len(x) - k] * x[k:]) / np.sum(x ** 2)] for k in range(11)])
+    q, p = ljung_box(acf, np.array([2000.0]), 10)
+    assert p[0] > 0.01
+
+
+def _spans(seed, n_dates=150, n_items=6):
+    rng = np.random.default_rng(seed)
+    levels = np.cumsum(rng.normal(size=(n_dates, n_items)), axis=0) + rng.normal(0, 0.5, (n_dates, n_items))
+    starts = rng.integers(0, 40, n_items)
+    ends = n_dates - rng.integers(0, 40, n_items)
+    return levels, starts, ends
+
+
+@pytest.mark.parametrize('lags', [0, 1, 4])
+def test_adf_normal_equations_match_lstsq(lags):
+    levels, starts, ends = _spans(lags)
+    xtx, xty, yty, nobs = _adf_normal_equations(levels, starts, ends, lags)
+    beta, rss, _ = _ols_rss(xtx, xty, yty)
+    for j in range(levels.shape[1]):
+        # 区间外的值不应进入回归
+        y_full = levels[:, j].copy()
+        y_full[:starts[j]] = 1e6
+        y_full[ends[j]:] = -1e6
+        y = levels[starts[j]:ends[j], j]
+        dy = np.diff(y)
+        rows = np.arange(lags, len(dy))
+        x = np.column_stack([np.ones(len(rows)), y[rows], *[dy[rows - i] for i in range(1, lags + 1)]])
+        expected, residuals, _, _ = np.linalg.lstsq(x, dy[rows], rcond=None)
+        assert nobs[j] == len(rows)
+        np.testing.assert_allclose(beta[j], expected, rtol=1e-6, atol=1e-8)
+        assert rss[j] == pytest.approx(residuals[0], rel=1e-6)
+
+
+def _kpss_reference(e):
+    """逐个序列按 KPSS 的定义计算统计量和 Hobijn 等 (2004) 的自动带宽。"""
+    n = len(e)
+    s0, s1 = np.sum(e ** 2) / n, 0.0
+    for i in range(1, int(n ** (2 / 9)) + 1):
+        term = np.dot(e[i:], e[:n - i]) / (n / 2)
+        s0 += term
+        s1 += i * term
+    lags = min(int(1.1447 * ((s1 / s0) ** 2) ** (1 / 3) * n ** (1 / 3)), n - 1)
+    long_run = np.sum(e ** 2)
+    for i in range(1, lags + 1):
+        long_run += 2 * (1 - i / (lags + 1)) * np.dot(e[i:], e[:n - i])
+    return np.sum(np.cumsum(e) ** 2) / n ** 2 / (long_run / n), lags
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_kpss_statistic_and_bandwidth(seed):
+    levels, starts, ends = _spans(seed)
+    t = np.arange(len(levels))[:, None]
+    inside = (t >= starts) & (t < ends)
+    n_obs = (ends - starts).astype(np.float64)
+    means = np.where(inside, levels, 0.0).sum(axis=0) / n_obs
+    centered = np.where(inside, levels - means, 0.0)
+    stat, lags = kpss_test(centered, autocovariance_sums(centered), n_obs)
+    for j in range(levels.shape[1]):
+        expected_stat, expected_lags = _kpss_reference(centered[starts[j]:ends[j], j])
+        assert lags[j] == expected_lags
+        assert stat[j] == pytest.approx(expected_stat, rel=1e-8)
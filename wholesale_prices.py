@@ -0,0 +1,283 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_store import LRUCache, rolling_features
+from sales_matrix import SalesMatrix, build_sales_matrix
+
+# 附件3：各单品每日的批发价格
+WHOLESALE_PRICE_FILE = '附件3.xlsx'
+PRICE_COL = '批发价格(元/千克)'
+
+_price_cache = LRUCache(max_entries=4)
+
+
+def forward_fill(values, mask):
+    """
+    沿日期轴对所有列一次性前向填充。
+
+    每个位置取该列在此之前（含当天）最后一次有记录的行号，再按行号取值；
+    第一次有记录之前的位置为 NaN。
+
+    参数:
+    values (np.ndarray): (日期数, 列数) 的数组。
+    mask (np.ndarray): 同形状的布尔数组，True 表示当天有记录。
+
+    返回:
+    np.ndarray: 填充后的 float32 数组。
+    """
+    rows = np.where(mask, np.arange(len(values))[:, None], -1)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[np.maximum(rows, 0), np.arange(values.shape[1])].astype(np.float32)
+    filled[rows < 0] = np.nan
+    return filled
+
+
+def _full_windows(valid, window):
+    """标记窗口内 window 天全部有效的位置（窗口以当天结尾），窗口未满的前 window-1 行为 False。"""
+    counts = np.concatenate([np.zeros((1, valid.shape[1]), dtype=np.int64), np.cumsum(valid, axis=0)])
+    full = np.zeros(valid.shape, dtype=bool)
+    full[window - 1:] = counts[window:] - counts[:-window] == window
+    return full
+
+
+class PriceMatrix:
+    """
+    稠密的 日期×单品编码 批发价格矩阵（附件3）。
+
+    没有报价的日期沿用最近一次报价（前向填充），observed 记录哪些位置是当天的真实报价。
+
+    属性:
+    dates (pd.DatetimeIndex): 连续的日历日期轴。
+    codes (pd.Index): 单品编码轴（int64，升序）。
+    prices (np.ndarray): (日期数, 单品数) 的 float32 价格，首次报价之前为 NaN。
+    observed (np.ndarray): 与 prices 同形状的布尔数组。
+    """
+
+    def __init__(self, dates, codes, prices, observed):
+        self.dates = pd.DatetimeIndex(dates)
+        self.codes = pd.Index(np.asarray(codes, dtype=np.int64))
+        self.prices = np.asarray(prices, dtype=np.float32)
+        self.observed = np.asarray(observed, dtype=bool)
+        self.prices.flags.writeable = False
+
+    @classmethod
+    def from_frame(cls, df, date_col='日期', code_col='单品编码', price_col=PRICE_COL):
+        """由长表格式的批发价格构建（同一天同一单品只应有一条报价）。"""
+        matrix = build_sales_matrix(df, code_col, price_col, date_col)
+        return cls(matrix.dates, matrix.items, forward_fill(matrix.values, matrix.mask), matrix.mask)
+
+    @property
+    def shape(self):
+        return self.prices.shape
+
+    def __repr__(self):
+        return (f"PriceMatrix({len(self.dates)} 天 × {len(self.codes)} 个单品, "
+                f"{self.dates.min().date()} 至 {self.dates.max().date()})")
+
+    def series(self, code):
+        """取出单个单品的批发价格序列（前向填充后）。"""
+        return pd.Series(self.prices[:, self.codes.get_loc(code)], index=self.dates, name=code)
+
+    def last_quote_dates(self):
+        """各单品最后一次真实报价的日期，从未报价的为 NaT。"""
+        has_quote = self.observed.any(axis=0)
+        last = len(self.dates) - 1 - np.argmax(self.observed[::-1], axis=0)
+        result = pd.Series(self.dates[last], index=self.codes, name='最后报价日期')
+        result[~has_quote] = pd.NaT
+        return result
+
+    def recent_mean(self, window=7):
+        """各单品最近 window 天真实报价的均值，期间没有报价的为 NaN。"""
+        recent = np.where(self.observed[-window:], self.prices[-window:], np.nan)
+        counts = self.observed[-window:].sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(recent, axis=0) / counts
+        return pd.Series(np.where(counts > 0, mean, np.nan), index=self.codes, name=PRICE_COL)
+
+    def log_returns(self):
+        """逐日对数收益率，首次报价之前及首日为 NaN。"""
+        log_prices = np.log(self.prices.astype(np.float64))
+        returns = np.full(log_prices.shape, np.nan)
+        returns[1:] = np.diff(log_prices, axis=0)
+        return returns
+
+    def volatility(self, window=28):
+        """
+        所有单品的滑动波动率：窗口内对数收益率的标准差（累积和实现，一次完成）。
+
+        返回:
+        np.ndarray: (日期数, 单品数) 的 float64 数组，窗口未满或尚未上市的位置为 NaN。
+        """
+        returns = self.log_returns()
+        listed = ~np.isnan(returns)
+        features = rolling_features(SalesMatrix(np.nan_to_num(returns), self.dates, self.codes),
+                                    window=window, lags=())
+        volatility = np.array(features['rolling_std'])
+        # 窗口内存在尚未上市的日期时不给出波动率
+        volatility[~_full_windows(listed, window)] = np.nan
+        return volatility
+
+    def trend(self, window=28):
+        """
+        所有单品的滑动趋势：窗口内对数价格对时间的最小二乘斜率（约等于日均涨幅）。
+
+        用 Σy 和 Σt·y 的累积和一次算出所有窗口，斜率 = (Σt·y - t̄·Σy) / Σ(t - t̄)²。
+
+        返回:
+        np.ndarray: (日期数, 单品数) 的 float64 数组，窗口未满或含未上市日期的位置为 NaN。
+        """
+        log_prices = np.log(self.prices.astype(np.float64))
+        listed = ~np.isnan(log_prices)
+        # 未上市的位置记为0参与累积和，否则 NaN 会污染之后所有窗口；这些窗口最后再置为 NaN
+        log_prices = np.nan_to_num(log_prices)
+        n = len(log_prices)
+        t = np.arange(n, dtype=np.float64)[:, None]
+        zero = np.zeros((1, log_prices.shape[1]))
+        sum_y = np.concatenate([zero, np.cumsum(log_prices, axis=0)])
+        sum_ty = np.concatenate([zero, np.cumsum(t * log_prices, axis=0)])
+
+        slope = np.full(log_prices.shape, np.nan)
+        end = np.arange(window, n + 1)
+        window_y = sum_y[end] - sum_y[end - window]
+        window_ty = sum_ty[end] - sum_ty[end - window]
+        t_mean = (end - (window + 1) / 2)[:, None]
+        s_tt = window * (window ** 2 - 1) / 12
+        slope[window - 1:] = (window_ty - t_mean * window_y) / s_tt
+        slope[~_full_windows(listed, window)] = np.nan
+        return slope
+
+    def summary(self, window=28):
+        """各单品最新的价格、波动率和趋势。"""
+        return pd.DataFrame({
+            '最新价格': self.prices[-1],
+            '最后报价日期': self.last_quote_dates(),
+            f'{window}日波动率': self.volatility(window)[-1],
+            f'{window}日趋势': self.trend(window)[-1],
+        }, index=self.codes)
+
+    def forecast(self, horizon=7, alpha=0.3, beta=0.1, phi=0.9, z=1.96, volatility_window=28):
+        """
+        对所有单品同时做阻尼趋势 Holt 指数平滑预测（对数价格）。
+
+        沿日期轴只循环一次，每一步对所有单品做向量运算；
+        单品在首次报价当天以该价格初始化水平、趋势为0。
+        区间为 水平 ± z·σ·√h，σ 为最近 volatility_window 天对数收益率的标准差。
+
+        参数:
+        horizon (int): 预测天数。
+        alpha / beta (float): 水平和趋势的平滑系数。
+        phi (float): 趋势阻尼系数，越小越快回到水平。
+        z (float): 区间的正态分位数。
+
+        返回:
+        PriceForecast: 预测结果。
+        """
+        log_prices = np.log(self.prices.astype(np.float64))
+        level = np.full(log_prices.shape[1], np.nan)
+        slope = np.zeros(log_prices.shape[1])
+        for y in log_prices:
+            start = np.isnan(level) & ~np.isnan(y)
+            level[start] = y[start]
+            previous = level.copy()
+            level = np.where(start, level, alpha * y + (1 - alpha) * (level + phi * slope))
+            slope = np.where(start, 0.0, beta * (level - previous) + (1 - beta) * phi * slope)
+            slope = np.nan_to_num(slope)
+
+        steps = np.arange(1, horizon + 1)
+        damping = np.cumsum(phi ** steps)[:, None]
+        point = level[None, :] + damping * slope[None, :]
+
+        sigma = np.nan_to_num(self.volatility(volatility_window)[-1])
+        spread = z * sigma[None, :] * np.sqrt(steps)[:, None]
+
+        dates = pd.date_range(self.dates.max() + pd.Timedelta(days=1), periods=horizon, freq='D')
+        return PriceForecast(dates, self.codes, np.exp(point), np.exp(point - spread), np.exp(point + spread))
+
+
+class PriceForecast:
+    """
+    所有单品的批发价格预测，数组形状均为 (预测天数, 单品数)。
+
+    属性:
+    dates (pd.DatetimeIndex): 预测日期轴。
+    codes (pd.Index): 单品编码轴。
+    point / lower / upper (np.ndarray): 预测值和区间上下限（元/千克）。
+    """
+
+    def __init__(self, dates, codes, point, lower, upper):
+        self.dates = pd.DatetimeIndex(dates)
+        self.codes = pd.Index(codes)
+        self.point = np.asarray(point, dtype=np.float32)
+        self.lower = np.asarray(lower, dtype=np.float32)
+        self.upper = np.asarray(upper, dtype=np.float32)
+
+    def __repr__(self):
+        return f"PriceForecast({len(self.dates)} 天 × {len(self.codes)} 个单品, 自 {self.dates.min().date()})"
+
+    def mean_cost(self):
+        """各单品在预测期内的平均预测批发价格。"""
+        return pd.Series(self.point.mean(axis=0), index=self.codes, name=PRICE_COL)
+
+    def to_frame(self):
+        """
+        展开为长表。
+
+        返回:
+        pd.DataFrame: 列为 日期、单品编码、预测批发价格、下限、上限。
+        """
+        n_dates, n_codes = self.point.shape
+        return pd.DataFrame({
+            '日期': np.repeat(self.dates, n_codes),
+            '单品编码': np.tile(self.codes.to_numpy(), n_dates),
+            '预测批发价格': self.point.ravel(),
+            '下限': self.lower.ravel(),
+            '上限': self.upper.ravel(),
+        })
+
+
+def load_price_matrix(file_path=WHOLESALE_PRICE_FILE):
+    """
+    读取附件3并构建 PriceMatrix，按文件路径、修改时间和大小缓存。
+
+    参数:
+    file_path (str): 附件3的路径。
+
+    返回:
+    PriceMatrix: 批发价格矩阵。
+    """
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    prices = _price_cache.get(key)
+    if prices is None:
+        df = pd.read_excel(file_path, dtype={'单品编码': np.int64})
+        if df.duplicated(['日期', '单品编码']).any():
+            raise ValueError(f"{file_path} 中存在同一天同一单品的重复报价")
+        prices = PriceMatrix.from_frame(df)
+        _price_cache.put(key, prices)
+        print(f"已加载 {file_path}: {prices.shape[0]} 天 × {prices.shape[1]} 个单品，"
+              f"前向填充的 (日期, 单品) 组合 {int((~prices.observed & ~np.isnan(prices.prices)).sum())} 个")
+    return prices
+
+
+if __name__ == '__main__':
+    import time
+
+    from product_master import load_product_master
+
+    master = load_product_master()
+    price_matrix = load_price_matrix()
+    print(price_matrix)
+
+    summary = master.attach_names(price_matrix.summary().rename_axis('单品编码').reset_index())
+    print("\n近28天波动率最高的10个单品:")
+    print(summary.sort_values('28日波动率', ascending=False).head(10).round(4).to_string(index=False))
+
+    start = time.perf_counter()
+    price_forecast = price_matrix.forecast(horizon=7)
+    print(f"\n{price_forecast}，耗时 {time.perf_counter() - start:.3f} 秒")
+    forecast_table = master.attach_names(price_forecast.to_frame())
+    forecast_table.to_excel('wholesale_price_forecast.xlsx', index=False)
+    print("下周批发价格预测已保存到 'wholesale_price_forecast.xlsx'")
+    print(forecast_table.head(10).round(2).to_string(index=False))
@@ -1,15 +1,16 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
 import os
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体,以正确显示图表中的中文标签
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
+from sales_matrix import SalesMatrix, build_sales_matrix
+from feature_store import calendar_features, rolling_feature_series
+from holiday_calendar import calendar_index
+# matplotlib/seaborn 只在绘图函数中按需导入（中文字体在首次导入时设置），
+# 只做数值分析时不加载绘图依赖
+from plotting import CorrelogramGridTemplate, get_pyplot, get_seaborn, get_template
 
 def create_output_folder(folder_name="云南生菜ACF_PACF分析"):
     """创建输出文件夹"""
@@ -18,16 +19,23 @@ def create_output_folder(folder_name="云南生菜ACF_PACF分析"):
         print(f"已创建文件夹: {folder_name}")
     return folder_name
 
-def calculate_acf(data, max_lags=40):
+def calculate_acf(data, max_lags=40, exclude=None):
     """
     手动计算自相关函数(ACF)
+    exclude 为与 data 等长的布尔数组（例如节假日标记），为 True 的日期不参与计算
     """
     n = len(data)
     data = np.array(data)
     
     # 去中心化
-    mean_val = np.mean(data)
-    data_centered = data - mean_val
+    if exclude is None:
+        mean_val = np.mean(data)
+        data_centered = data - mean_val
+    else:
+        # 均值只用保留的日期估计，剔除的日期去中心化后置为0，不进入任何乘积和
+        exclude = np.asarray(exclude, dtype=bool)
+        mean_val = np.mean(data[~exclude])
+        data_centered = np.where(exclude, 0.0, data - mean_val)
     
     # 计算自相关
     acf_result = []
@@ -52,10 +60,10 @@ def calculate_acf(data, max_lags=40):
     
     return np.array(acf_result)
 
-def calculate_pacf(data, max_lags=40):
+def calculate_pacf(data, max_lags=40, exclude=None):
     """
     手动计算偏自相关函数(PACF)
-    使用Yule-Walker方程求解
+    使用Yule-Walker方程求解，exclude 的含义同 calculate_acf
     """
     n = len(data)
     data = np.array(data)
@@ -65,7 +73,7 @@ def calculate_pacf(data, max_lags=40):
     data_centered = data - mean_val
     
     # 先计算ACF
-    acf_vals = calculate_acf(data, max_lags)
+    acf_vals = calculate_acf(data, max_lags, exclude)
     
     pacf_result = [1.0]  # PACF在lag=0时总是1
     
@@ -105,6 +113,7 @@ def plot_acf_manual(data, max_lags=40, title="自相关函数 (ACF)", ax=None):
     """
     手动绘制ACF图
     """
+    plt = get_pyplot()
     if ax is None:
         fig, ax = plt.subplots(figsize=(10, 6))
     
@@ -134,6 +143,7 @@ def plot_pacf_manual(data, max_lags=40, title="偏自相关函数 (PACF)", ax=No
     """
     手动绘制PACF图
     """
+    plt = get_pyplot()
     if ax is None:
         fig, ax = plt.subplots(figsize=(10, 6))
     
@@ -191,21 +201,16 @@ def load_and_prepare_data(file_path):
             print("错误: 找不到销量列")
             return None
         
-        # 转换日期格式
-        df[date_col] = pd.to_datetime(df[date_col])
-        
-        # 按日期排序
-        df = df.sort_values(date_col)
-        
-        # 设置日期为索引
-        df.set_index(date_col, inplace=True)
-        
-        # 提取销量数据
-        sales_data = df[sales_col].dropna()
+        # 转换为连续日历上的稠密序列：缺失的日期显式补0，
+        # 保证ACF/PACF中的滞后期对应真实的天数而不是行号
+        df = df.dropna(subset=[sales_col])
+        matrix = build_sales_matrix(df, None, sales_col, date_col)
+        sales_data = matrix.series(matrix.items[0])
+        missing_days = int((~matrix.mask).sum())
         
         print(f"\n数据基本信息:")
         print(f"数据期间: {sales_data.index.min()} 到 {sales_data.index.max()}")
-        print(f"总天数: {len(sales_data)} 天")
+        print(f"总天数: {len(sales_data)} 天（其中补0的缺失日期 {missing_days} 天）")
         print(f"销量统计:")
         print(sales_data.describe())
         
@@ -219,6 +224,7 @@ def plot_time_series(sales_data, output_folder):
     """
     绘制原始时间序列图
     """
+    plt = get_pyplot()
     plt.figure(figsize=(15, 6))
     
     plt.plot(sales_data.index, sales_data.values, 
@@ -232,7 +238,8 @@ def plot_time_series(sales_data, output_folder):
     
     # 添加移动平均线
     if len(sales_data) >= 7:
-        ma_7 = sales_data.rolling(window=7, center=True).mean()
+        series_matrix = SalesMatrix.from_series(sales_data)
+        ma_7 = rolling_feature_series(series_matrix, series_matrix.items[0], window=7, center=True)
         plt.plot(sales_data.index, ma_7, 
                 color='red', linewidth=2, alpha=0.8, label='7日移动平均')
         plt.legend()
@@ -250,7 +257,10 @@ def plot_time_series(sales_data, output_folder):
 def analyze_acf_pacf_comprehensive(sales_data, output_folder):
     """
     综合ACF/PACF分析 - 观察不同周期
+    ACF/PACF 只按最长的周期计算一次，各周期的子图取其前若干个滞后期；
+    4×2 网格使用可复用的图形模板，重复调用时只更新数据，不重新创建坐标轴
     """
+    plt = get_pyplot()
     # 定义不同的分析周期
     analysis_periods = {
         '短期周期 (2周)': 14,      # 观察周循环
@@ -259,47 +269,26 @@ def analyze_acf_pacf_comprehensive(sales_data, output_folder):
         '年度周期': min(180, len(sales_data)//3)  # 观察年度模式，但不超过数据长度的1/3
     }
     
-    fig, axes = plt.subplots(4, 2, figsize=(16, 20))
-    fig.suptitle('云南生菜销量 ACF/PACF 周期性分析', fontsize=18, fontweight='bold', y=0.98)
+    # 第k阶的ACF/PACF与最大滞后期无关，因此按最长周期计算一次即可
+    n = len(sales_data)
+    max_lags = min(max(analysis_periods.values()), n - 1)
+    acf_all = calculate_acf(sales_data.values, max_lags)
+    pacf_all = calculate_pacf(sales_data.values, max_lags)
     
-    for i, (period_name, lags) in enumerate(analysis_periods.items()):
-        if lags >= len(sales_data):
-            lags = len(sales_data) - 1
-            
-        # 绘制ACF
-        acf_vals = plot_acf_manual(sales_data.values, max_lags=lags, 
-                                  title=f'{period_name} - 自相关函数 (ACF)', ax=axes[i, 0])
-        
-        # 标记重要的周期点
-        if lags >= 7:
-            axes[i, 0].axvline(x=7, color='orange', linestyle=':', alpha=0.8, linewidth=2, label='周循环(7天)')
-        if lags >= 30:
-            axes[i, 0].axvline(x=30, color='green', linestyle=':', alpha=0.8, linewidth=2, label='月循环(30天)')
-        if lags >= 90:
-            axes[i, 0].axvline(x=90, color='purple', linestyle=':', alpha=0.8, linewidth=2, label='季度循环(90天)')
-        
-        axes[i, 0].legend()
-        
-        # 绘制PACF
-        pacf_vals = plot_pacf_manual(sales_data.values, max_lags=lags, 
-                                    title=f'{period_name} - 偏自相关函数 (PACF)', ax=axes[i, 1])
-        
-        # 标记重要的周期点
-        if lags >= 7:
-            axes[i, 1].axvline(x=7, color='orange', linestyle=':', alpha=0.8, linewidth=2, label='周循环(7天)')
-        if lags >= 30:
-            axes[i, 1].axvline(x=30, color='green', linestyle=':', alpha=0.8, linewidth=2, label='月循环(30天)')
-        if lags >= 90:
-            axes[i, 1].axvline(x=90, color='purple', linestyle=':', alpha=0.8, linewidth=2, label='季度循环(90天)')
-            
-        axes[i, 1].legend()
+    rows = []
+    for period_name, lags in analysis_periods.items():
+        lags = min(lags, n - 1)
+        rows.append((f'{period_name} - 自相关函数 (ACF)', acf_all[:lags + 1],
+                     f'{period_name} - 偏自相关函数 (PACF)', pacf_all[:lags + 1]))
     
-    plt.tight_layout()
+    # 绘制ACF/PACF网格，并标记周循环、月循环和季度循环
+    template = get_template(CorrelogramGridTemplate, n_rows=len(rows), figsize=(16, 20))
+    template.update('云南生菜销量 ACF/PACF 周期性分析', rows, calculate_confidence_bounds(n))
     
     # 保存图片
     filename = "云南生菜ACF_PACF综合分析.png"
     filepath = os.path.join(output_folder, filename)
-    plt.savefig(filepath, dpi=300, bbox_inches='tight')
+    template.save(filepath, dpi=300)
     print(f"已保存: {filepath}")
     
     plt.show()
@@ -308,12 +297,12 @@ def analyze_weekly_patterns(sales_data, output_folder):
     """
     专门分析周期性模式
     """
+    plt = get_pyplot()
+    sns = get_seaborn()
     # 添加时间特征
-    df_analysis = pd.DataFrame(index=sales_data.index)
-    df_analysis['销量'] = sales_data.values
-    df_analysis['星期几'] = sales_data.index.dayofweek  # 0=周一, 6=周日
-    df_analysis['月份'] = sales_data.index.month
-    df_analysis['日期'] = sales_data.index.day
+    df_analysis = calendar_features(sales_data.index)[['星期几', '月份', '日期']]  # 星期几: 0=周一, 6=周日
+    df_analysis.index = sales_data.index
+    df_analysis.insert(0, '销量', sales_data.values)
     
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
     fig.suptitle('云南生菜销量周期性模式分析', fontsize=16, fontweight='bold')
@@ -366,9 +355,29 @@ def analyze_weekly_patterns(sales_data, output_folder):
     
     plt.show()
 
-def numerical_acf_pacf_analysis(sales_data):
+def analyze_rolling_acf(sales_data, output_folder, window=90, step=7, max_lags=28):
+    """
+    滚动窗口ACF分析 - 观察周循环随时间增强还是减弱
+    窗口滑动时增量更新滞后乘积和，输出 滞后×时间 热力条和7阶ACF的变化
+    """
+    from rolling_acf import rolling_acf, save_acf_strips
+    
+    result = rolling_acf(SalesMatrix.from_series(sales_data.rename('云南生菜')), window, step, max_lags)
+    save_acf_strips(result, output_folder, dpi=300)
+    print(f"已保存: {os.path.join(output_folder, '云南生菜_滚动ACF.png')}")
+    
+    weekly = result.lag_series(7)['云南生菜']
+    trend = result.trend(7).loc['云南生菜']
+    print(f"窗口 {window} 天、步长 {step} 天，共 {len(weekly)} 个窗口")
+    print(f"7阶ACF: 首窗口 {trend['首窗口ACF(7)']:.4f}, 末窗口 {trend['末窗口ACF(7)']:.4f}, "
+          f"范围 {trend['最小ACF(7)']:.4f} ~ {trend['最大ACF(7)']:.4f}, 每90天变化 {trend['每90天变化']:+.4f}")
+    print(f"7阶ACF最强的窗口结束于 {weekly.idxmax().date()}，最弱的窗口结束于 {weekly.idxmin().date()}")
+    return result
+
+def numerical_acf_pacf_analysis(sales_data, exclude=None):
     """
     数值化的ACF/PACF分析，输出关键统计信息
+    exclude 为与 sales_data 对齐的布尔数组，为 True 的日期（如节假日）不参与计算
     """
     print("\n" + "="*60)
     print("数值化 ACF/PACF 分析结果")
@@ -376,11 +385,11 @@ def numerical_acf_pacf_analysis(sales_data):
     
     # 计算ACF和PACF值
     max_lags = min(30, len(sales_data)//4)
-    acf_values = calculate_acf(sales_data.values, max_lags)
-    pacf_values = calculate_pacf(sales_data.values, max_lags)
+    acf_values = calculate_acf(sales_data.values, max_lags, exclude)
+    pacf_values = calculate_pacf(sales_data.values, max_lags, exclude)
     
-    # 计算置信区间
-    n = len(sales_data)
+    # 计算置信区间（只计入参与计算的日期）
+    n = len(sales_data) if exclude is None else int(np.sum(~np.asarray(exclude)))
     conf_bound = calculate_confidence_bounds(n)
     
     # 寻找显著的滞后期
@@ -468,10 +477,20 @@ def main():
     print("\n3. 执行周期性模式分析...")
     analyze_weekly_patterns(sales_data, output_folder)
     
-    # 5. 数值化分析
-    print("\n4. 执行数值化ACF/PACF分析...")
+    # 5. 滚动窗口ACF，观察周循环的强弱是否随时间变化
+    print("\n4. 执行滚动窗口ACF分析...")
+    analyze_rolling_acf(sales_data, output_folder)
+    
+    # 6. 数值化分析
+    print("\n5. 执行数值化ACF/PACF分析...")
     numerical_acf_pacf_analysis(sales_data)
     
+    # 7. 剔除法定节假日和促销日后再做一次，对比节假日高峰对周循环的影响
+    print("\n6. 剔除节假日和促销日后的数值化ACF/PACF分析...")
+    special_days = ~calendar_index(sales_data.index).day_mask(exclude=('节假日', '促销'))
+    print(f"剔除的日期数: {int(special_days.sum())}")
+    numerical_acf_pacf_analysis(sales_data, exclude=special_days)
+    
     print(f"\n分析完成！所有图表已保存到文件夹: {output_folder}")
     print("\n" + "="*60)
     print("📊 ACF/PACF 图表解读指南:")
@@ -1,102 +1,164 @@
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_sales_heatmaps():
+from sales_matrix import build_sales_matrix
+from feature_store import calendar_features
+from holiday_calendar import exclude_days
+from plotting import HeatmapTemplate, get_pyplot, get_template
+
+WEEKDAY_LABELS = ['星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日']
+
+
+def compute_month_weekday_means(matrix):
+    """
+    一次 groupby 计算所有实体的 月份×星期几 平均日销量。
+
+    参数:
+    matrix (SalesMatrix): 稠密的 日期×实体（品类或单品）矩阵。
+
+    返回:
+    np.ndarray: 形状为 (实体数, 12, 7) 的数组，[i, m-1, d] 为第 i 个实体在 m 月、
+                星期 d（0=星期一）的平均日销量，没有记录的组合为 NaN。
+    """
+    features = calendar_features(matrix.dates)
+    # 提取月份 (1-12) 和星期几 (0=星期一, 6=星期日)
+    months = features['月份'].to_numpy()
+    weekdays = features['星期几'].to_numpy()
+
+    # 只统计有原始记录的日期，与按行求均值的口径保持一致
+    sales = pd.DataFrame(matrix.masked_values())
+    means = sales.groupby([months, weekdays]).mean()
+
+    # 补齐所有 12×7 组合，保证 reshape 后的位置与月份/星期一一对应
+    full_index = pd.MultiIndex.from_product([range(1, 13), range(7)])
+    means = means.reindex(full_index)
+    return means.to_numpy(dtype=np.float64).reshape(12, 7, -1).transpose(2, 0, 1)
+
+
+def _render_heatmap(entity, table, output_filename, dpi, annot, entity_label):
+    """
+    渲染并保存单个实体的热力图（在工作进程中执行）。
+
+    参数:
+    entity (str): 实体名称。
+    table (np.ndarray): 形状为 (12, 7) 的 月份×星期几 平均销量，整行为 NaN 的月份不绘制。
+    output_filename (str): 输出文件路径。
+    dpi (int): 输出分辨率。
+    annot (bool): 是否在单元格上标注数值。
+    entity_label (str): 实体类型名称，用于日志（例如 '品类' 或 '单品'）。
+
+    返回:
+    str 或 None: 成功时返回输出文件路径。
     """
-    从 daily_category_sales.xlsx 数据生成各品类销量热力图。
+    if np.isnan(table).all():
+        print(f"{entity_label} '{entity}' 没有可用数据，已跳过。")
+        return None
+
+    # 绘图依赖在工作进程中首次渲染时才导入，使用非交互式后端，并设置中文字体
+    get_pyplot('Agg')
+
+    # 与原来的 pivot_table 一致，没有任何记录的月份不画出来（只显示有数据的月份行）
+    months = np.flatnonzero(~np.isnan(table).all(axis=1)) + 1
+    table = table[months - 1]
+
+    # 每个进程对每种月份组合只创建一次热力图模板（坐标轴、色阶条、标注），
+    # 之后每个实体只更新单元格数值、色阶范围、标注文字和标题；
+    # 有完整历史的实体都是 12×7，共用同一个模板
+    template = get_template(
+        HeatmapTemplate,
+        row_labels=tuple(f'{month}月' for month in months),
+        col_labels=tuple(WEEKDAY_LABELS),
+        annot=annot,
+        cbar_label='平均销量 (千克)',
+        xlabel='星期几',
+        ylabel='月份',
+        figsize=(12, 8),
+    )
+    template.update(table, f'{entity} 月份与星期几日销量热力图')
+
+    # 定义输出文件名并保存为PNG
+    try:
+        template.save(output_filename, dpi=dpi)
+        print(f"已成功保存热力图: {output_filename}")
+    except Exception as e:
+        print(f"保存文件 '{output_filename}' 时出错: {e}")
+        output_filename = None
+
+    return output_filename
+
+
+def generate_sales_heatmaps(file_path='daily_category_sales.xlsx', group_col='分类名称',
+                            output_folder='.', dpi=300, annot=True, max_workers=None, exclude=None):
+    """
+    生成各品类（或各单品）的销量热力图。
     热力图展示了不同月份和星期几的平均日销量。
+
+    所有实体的透视表由一次 groupby 得到的 (实体×月份×星期几) 数组切片而来，
+    渲染在进程池中并行完成，每个工作进程只接收自己那张 12×7 的小表。
+
+    参数:
+    file_path (str): 日销量Excel文件路径。
+    group_col (str): 实体列名，'分类名称' 生成品类热力图，'单品名称' 生成单品热力图。
+    output_folder (str): 保存图片的文件夹。
+    dpi (int): 输出分辨率。
+    annot (bool): 是否在单元格上标注数值。
+    max_workers (int 或 None): 渲染进程数，None 表示使用全部CPU核心，1 表示串行渲染。
+    exclude (tuple 或 None): 不计入均值的日期类型，例如 ('节假日', '促销')，
+                             避免春节等节假日高峰混入普通星期几的均值；
+                             此时文件名带 '_剔除节假日促销' 这样的后缀，不覆盖未剔除的热力图。
+
+    返回:
+    list: 成功保存的图片路径。
     """
     # --- 1. 数据加载和准备 ---
-    file_path = 'daily_category_sales.xlsx'
     if not os.path.exists(file_path):
         print(f"错误：找不到文件 '{file_path}'。请确保文件在当前目录中。")
-        return
+        return []
 
     df = pd.read_excel(file_path)
+    entity_label = '品类' if group_col == '分类名称' else '单品'
+
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+        print(f"已创建文件夹: {output_folder}")
 
     # --- 2. 数据预处理 ---
-    # 将销售日期列转换为日期时间格式
-    df['销售日期'] = pd.to_datetime(df['销售日期'])
-    # 提取月份 (1-12)
-    df['月份'] = df['销售日期'].dt.month
-    # 提取星期几 (0=星期一, 6=星期日)
-    df['星期几'] = df['销售日期'].dt.dayofweek
-
-    # --- 3. 设置可视化环境 ---
-    # 配置字体以支持中文显示
-    plt.rcParams['font.sans-serif'] = ['SimHei']
-    plt.rcParams['axes.unicode_minus'] = False  # 正常显示负号
-
-    # 获取所有独特的分类名称
-    categories = df['分类名称'].unique()
-
-    # --- 4. 为每个分类生成并保存热力图 ---
-    for category in categories:
-        print(f"正在为品类 '{category}' 生成热力图...")
-
-        # 筛选特定品类的数据
-        df_category = df[df['分类名称'] == category]
-
-        # 创建数据透视表：索引为月份，列为星期几，值为日销量的平均值
-        try:
-            pivot_table = df_category.pivot_table(
-                values='销量(千克)',
-                index='月份',
-                columns='星期几',
-                aggfunc='mean'
-            )
-            # 确保星期几的顺序是从0到6
-            pivot_table = pivot_table.reindex(columns=range(7))
-        except Exception as e:
-            print(f"为品类 '{category}' 创建数据透视表时出错: {e}")
-            continue
-
-        # --- 5. 可视化 ---
-        plt.figure(figsize=(12, 8))
-        
-        # 计算数据的动态范围以优化色阶
-        # 使用 np.nanmin 和 np.nanmax 来处理可能的NaN值
-        vmin = np.nanmin(pivot_table.values)
-        vmax = np.nanmax(pivot_table.values)
-
-        # 使用seaborn创建热力图
-        ax = sns.heatmap(
-            pivot_table,
-            annot=True,          # 在单元格上标注数值
-            fmt=".1f",           # 数值格式，保留一位小数
-            linewidths=.5,       # 单元格之间的分隔线宽度
-            cmap='coolwarm',     # 使用'coolwarm'色阶
-            vmin=vmin,           # 设置色阶的最小值
-            vmax=vmax,           # 设置色阶的最大值
-            cbar_kws={'label': '平均销量 (千克)'} # 色阶条标签
-        )
-
-        # 设置标题和坐标轴标签
-        ax.set_title(f'{category} 月份与星期几日销量热力图', fontsize=18)
-        ax.set_xlabel('星期几', fontsize=12)
-        ax.set_ylabel('月份', fontsize=12)
-
-        # 自定义坐标轴刻度标签
-        ax.set_xticklabels(['星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日'], rotation=0)
-        # 获取存在的月份并生成标签
-        y_labels = [f'{month}月' for month in pivot_table.index]
-        ax.set_yticklabels(y_labels, rotation=0)
-
-        # --- 6. 输出 ---
-        # 定义输出文件名并保存为高质量PNG
-        output_filename = f'{category}_热力图.png'
-        try:
-            plt.savefig(output_filename, dpi=300, bbox_inches='tight')
-            print(f"已成功保存热力图: {output_filename}")
-        except Exception as e:
-            print(f"保存文件 '{output_filename}' 时出错: {e}")
-        
-        plt.close() # 关闭当前图表以释放内存
-
-    print("\n所有品类的热力图已生成完毕。")
+    # 转换为稠密的 日期×实体 矩阵，并一次性计算所有实体的 月份×星期几 均值
+    matrix = build_sales_matrix(df, group_col)
+    suffix = ''
+    if exclude:
+        matrix = exclude_days(matrix, exclude)
+        suffix = f"_剔除{''.join(exclude)}"
+        print(f"已剔除日期类型: {'、'.join(exclude)}")
+    means = compute_month_weekday_means(matrix)
+
+    # --- 3. 为每个实体生成并保存热力图 ---
+    tasks = []
+    for i, entity in enumerate(matrix.items):
+        safe_name = str(entity).replace('/', '_').replace('\\', '_')
+        output_filename = os.path.join(output_folder, f'{safe_name}_热力图{suffix}.png')
+        tasks.append((entity, means[i], output_filename, dpi, annot, entity_label))
+
+    print(f"正在为 {len(tasks)} 个{entity_label}生成热力图...")
+    if max_workers == 1:
+        saved = [_render_heatmap(*task) for task in tasks]
+    else:
+        # 主进程只负责计算透视表，不需要导入 matplotlib；工作进程只负责绘图
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            saved = list(executor.map(_render_heatmap, *zip(*tasks)))
+
+    saved = [path for path in saved if path is not None]
+    print(f"\n所有{entity_label}的热力图已生成完毕，共 {len(saved)} 张。")
+    return saved
+
 
 if __name__ == '__main__':
-    generate_sales_heatmaps()
\ No newline at end of file
+    generate_sales_heatmaps()
+    # 单品级别的热力图数量较多，单独放在一个文件夹中
+    generate_sales_heatmaps('cleaned_daily_sku_sales.xlsx', '单品名称', output_folder='单品热力图', dpi=150)
+
+    # 另外输出剔除法定节假日和促销日后的品类热力图（文件名带后缀），
+    # 节假日高峰不计入普通星期几的均值
+    generate_sales_heatmaps(exclude=('节假日', '促销'))
@@ -19,8 +19,12 @@ df['单品名称'] = df['单品名称'].apply(clean_sku_name)
 # 3. 填充“销量(千克)”字段的空值和负数
 # 首先用0填充NaN值
 df['销量(千克)'] = df['销量(千克)'].fillna(0)
-# 然后将负数替换为0
-df.loc[df['销量(千克)'] < 0, '销量(千克)'] = 0
+# 然后将负数替换为0。数据预处理.py 新生成的文件已把退货拆到“退货量(千克)”列，销量不会为负；
+# 但仓库中附带的旧版文件没有该列，销量是扣除退货后的净值，仍可能为负
+negative = df['销量(千克)'] < 0
+if negative.any():
+    print(f"警告：{int(negative.sum())} 行销量为负（输入文件{'有' if '退货量(千克)' in df.columns else '没有'}“退货量(千克)”列），已替换为0")
+df.loc[negative, '销量(千克)'] = 0
 
 # 可选：按日期和清理后的单品名称合并，并加总销量
 # 如果需要合并相同单品在同一天的销量，可以取消下面的代码注释
@@ -1,83 +1,61 @@
-# import pandas as pd
-#
-# # 假设你已经将附件1和附件2保存为XLSX文件，文件名分别为 '附件1.xlsx' 和 '附件2.xlsx'
-# # 如果文件格式不同，请相应修改 pd.read_excel 等
-#
-# # 加载附件1（商品信息）和附件2（销售流水明细）的数据
-# df_goods_info = pd.read_excel('附件1.xlsx')
-# df_sales_details = pd.read_excel('附件2.xlsx')
-#
-# # 确保用于合并的列名在两个数据框中完全一致，这里是'单品编码'
-# # 如果不一致，可以使用 df.rename(columns={'旧列名': '新列名'}, inplace=True) 进行修改
-# # 这里假设列名已经一致
-#
-# # 将两个数据框基于'单品编码'列进行合并
-# # how='left' 表示以df_sales_details为主，保留其所有记录，并匹配df_goods_info中的信息
-# merged_df = pd.merge(df_sales_details, df_goods_info, on='单品编码', how='left')
-#
-# # 将合并后的数据保存到一个新的XLSX文件，例如 'merged_data.xlsx'
-# # index=False 避免将数据框的索引写入文件
-# merged_df.to_excel('merged_data.xlsx', index=False)
-#
-# print("数据合并完成，并已保存到 'merged_data.xlsx' 文件中。")
+from intraday_profile import INTRADAY_LEDGER_COLUMNS, build_intraday_cube
+from markup_analysis import MARKUP_COL, attach_markup, daily_markup_distribution
+from product_master import load_product_master
+from sales_ledger import SALES_COMPONENTS, aggregate_sales, load_ledger
 
-# import pandas as pd
-#
-# # 读取合并后的数据文件
-# try:
-#     df = pd.read_excel('merged_data.xlsx')
-# except FileNotFoundError:
-#     print("错误：文件 'merged_data.xlsx' 不存在。请确保该文件位于当前工作目录下。")
-#     exit()
-#
-# # 确保“销售日期”列是日期格式，并提取出日期部分（不包含时间）
-# df['销售日期'] = pd.to_datetime(df['销售日期']).dt.date
-#
-# # 确保“销量(千克)”列是数值类型
-# df['销量(千克)'] = pd.to_numeric(df['销量(千克)'])
-#
-# # 按天汇总单品销量
-# # 分组键为“销售日期”和“单品编码”
-# daily_sku_sales = df.groupby(['销售日期', '单品编码'])['销量(千克)'].sum().reset_index()
-# print("按天汇总的单品销量（部分）：")
-# print(daily_sku_sales.head())
-#
-# # 将结果保存到新的 Excel 文件
-# daily_sku_sales.to_excel('daily_sku_sales.xlsx', index=False)
-# print("\n单品日销量数据已保存到 'daily_sku_sales.xlsx'。")
-#
-# # 按天汇总品类销量
-# # 分组键为“销售日期”和“分类名称”
-# daily_category_sales = df.groupby(['销售日期', '分类名称'])['销量(千克)'].sum().reset_index()
-# print("\n按天汇总的品类销量（部分）：")
-# print(daily_category_sales.head())
-#
-# # 将结果保存到新的 Excel 文件
-# daily_category_sales.to_excel('daily_category_sales.xlsx', index=False)
-# print("\n品类日销量数据已保存到 'daily_category_sales.xlsx'。")
-#
-# print("\n所有汇总操作已完成。")
-import pandas as pd
-
-# 读取合并后的数据文件
+# 附件1（商品信息）只加载一次，得到以整数单品编码为索引的主数据；
+# 附件2（销售流水明细）只保留日期、扫码时间、单品编码、销量、销售单价、销售类型和是否打折，不再与附件1合并成宽表 merged_data.xlsx，
+# 单品名称和分类名称在输出前才附加到汇总后的小表上
 try:
-    df = pd.read_excel('merged_data.xlsx')
-except FileNotFoundError:
-    print("错误：文件 'merged_data.xlsx' 不存在。请确保该文件位于当前工作目录下。")
+    master = load_product_master('附件1.xlsx')
+    ledger = load_ledger('附件2.xlsx', columns=INTRADAY_LEDGER_COLUMNS)
+except FileNotFoundError as e:
+    print(f"错误：{e}。请确保附件1和附件2位于当前工作目录下。")
     exit()
 
-# 确保“销售日期”列是日期格式，并提取出日期部分（不包含时间）
-df['销售日期'] = pd.to_datetime(df['销售日期']).dt.date
+# 按（日期, 单品编码）的稠密下标从附件3查出每条流水的批发价格，计算加成率（销售单价 / 批发价格 - 1）
+ledger = attach_markup(ledger)
 
-# 确保“销量(千克)”列是数值类型
-df['销量(千克)'] = pd.to_numeric(df['销量(千克)'])
+# 按天汇总单品的销量、退货量、打折销量和销售/批发金额，分组键为“销售日期”和整数“单品编码”；
+# 退货单独成列，销量不再被退货冲减为负数，数据清洗时不需要再把负销量改为0
+daily_sku_sales = aggregate_sales(ledger, level='sku', extra_cols=['批发金额'])
 
-# 按天汇总单品销量，分组键为“销售日期”和“单品名称”
-daily_sku_sales = df.groupby(['销售日期', '单品名称'])['销量(千克)'].sum().reset_index()
+# 附加单品名称后，按“销售日期”和“单品名称”汇总；加成率由汇总后的金额计算（按销量加权）
+daily_sku_sales = master.attach_names(daily_sku_sales, category_col=None)
+daily_sku_sales = (daily_sku_sales
+                   .groupby(['销售日期', '单品名称'])[[*SALES_COMPONENTS, '批发金额']]
+                   .sum()
+                   .reset_index())
+daily_sku_sales[MARKUP_COL] = daily_sku_sales['销售金额'] / daily_sku_sales['批发金额'].where(
+    daily_sku_sales['批发金额'] > 0) - 1
+daily_sku_sales = daily_sku_sales[['销售日期', '单品名称', *SALES_COMPONENTS, MARKUP_COL]]
 
 print("按天汇总的单品销量（部分）：")
 print(daily_sku_sales.head())
 
 # 将结果保存到新的 Excel 文件
 daily_sku_sales.to_excel('daily_sku_sales_by_name.xlsx', index=False)
-print("\n单品日销量数据（按单品名称）已保存到 'daily_sku_sales_by_name.xlsx'。")
\ No newline at end of file
+print("\n单品日销量数据（按单品名称）已保存到 'daily_sku_sales_by_name.xlsx'。")
+
+# 按天汇总品类销量，分组键为“销售日期”和整数“分类编码”；
+# 加成率分布（综合加成率和分位数）按相同的整数键并列在销量旁边
+daily_category_sales = aggregate_sales(ledger, master, level='category')
+category_markup = daily_markup_distribution(ledger, master, level='category')
+daily_category_sales = daily_category_sales.merge(category_markup, on=['销售日期', '分类编码'], how='left')
+daily_category_sales['分类名称'] = daily_category_sales['分类编码'].map(master.category_name_map())
+markup_cols = [col for col in category_markup.columns if col.startswith(MARKUP_COL)]
+daily_category_sales = daily_category_sales[['销售日期', '分类名称', *SALES_COMPONENTS, *markup_cols]]
+
+print("\n按天汇总的品类销量（部分）：")
+print(daily_category_sales.head())
+
+# 其他脚本以 daily_category_sales.xlsx（销售日期、分类名称、销量）为输入，
+# 这里带退货、打折和加成率分布的明细表另存为新文件，不覆盖该输入文件
+daily_category_sales.to_excel('daily_category_sales_detail.xlsx', index=False)
+print("\n品类日销量明细数据已保存到 'daily_category_sales_detail.xlsx'。")
+
+# 同一份流水按扫码时间汇总为 日期×时段×实体 的日内销量数组，日内曲线和热力图直接读取，不再重新扫描附件2
+for level, output in (('category', 'intraday_category.npz'), ('sku', 'intraday_sku.npz')):
+    cube = build_intraday_cube(ledger, master, level=level)
+    cube.save(output)
+    print(f"\n{cube} 已保存到 '{output}'。")